@@ -1,7 +1,7 @@
 from cpkit import require_admin
 from fastapi import APIRouter, Security
 
-from . import ip_pool, servers
+from . import ip_pool, playbook_timings, servers
 
 router = APIRouter(
     prefix="/admin",
@@ -10,3 +10,4 @@ router = APIRouter(
 
 router.include_router(servers.router)
 router.include_router(ip_pool.router)
+router.include_router(playbook_timings.router)
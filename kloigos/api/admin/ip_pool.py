@@ -1,13 +1,16 @@
 from cpkit import get_audit_actor
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 
 from ...dep import get_admin_service
 from ...models import (
     ComputeUnitOperationError,
+    InvalidCursorError,
     IpPoolAddressInDB,
     IpPoolInsertRequest,
+    IpPoolInsertResponse,
 )
-from ...services.admin import AdminService
+from ...services.admin import AsyncAdminService
+from ..responses import json_response
 
 router = APIRouter(
     prefix="/ip_pool",
@@ -21,39 +24,52 @@ async def list_ip_pool_addresses(
     status: str | None = None,
     allocation_id: str | None = None,
     current_host: str | None = None,
-    service: AdminService = Depends(get_admin_service),
-) -> list[IpPoolAddressInDB]:
-    return service.list_ip_pool_addresses(
-        ip_address=ip_address,
-        status=status,
-        allocation_id=allocation_id,
-        current_host=current_host,
-    )
+    limit: int | None = Query(None, ge=1, le=1000),
+    cursor: str | None = None,
+    service: AsyncAdminService = Depends(get_admin_service),
+) -> Response:
+    try:
+        addresses, next_cursor = await service.list_ip_pool_addresses(
+            ip_address=ip_address,
+            status=status,
+            allocation_id=allocation_id,
+            current_host=current_host,
+            limit=limit,
+            cursor=cursor,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(400, str(exc)) from exc
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_response(addresses, headers)
 
 
-@router.post("/", response_model=list[IpPoolAddressInDB])
+@router.post("/", response_model=IpPoolInsertResponse)
 async def insert_ip_pool_addresses(
     req: IpPoolInsertRequest,
     actor_id: str = Depends(get_audit_actor),
-    service: AdminService = Depends(get_admin_service),
-) -> list[IpPoolAddressInDB]:
-    try:
-        return service.insert_ip_pool_addresses(actor_id, req)
-    except ComputeUnitOperationError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=str(exc),
-        ) from exc
+    service: AsyncAdminService = Depends(get_admin_service),
+) -> IpPoolInsertResponse:
+    """
+    Add addresses to the pool from explicit `ip_addresses` and/or `cidrs`.
+
+    CIDR ranges expand to their usable hosts. Everything is inserted in one
+    statement; addresses already in the pool are returned in `conflicts`
+    and the rest in `inserted`.
+
+    Example body:
+    - {"cidrs": ["10.10.0.0/20"], "ip_addresses": ["192.168.1.201"]}
+    """
+    return await service.insert_ip_pool_addresses(actor_id, req)
 
 
 @router.delete("/{ip_address}")
 async def delete_ip_pool_address(
     ip_address: str,
     actor_id: str = Depends(get_audit_actor),
-    service: AdminService = Depends(get_admin_service),
+    service: AsyncAdminService = Depends(get_admin_service),
 ) -> Response:
     try:
-        deleted = service.delete_ip_pool_address(actor_id, ip_address)
+        deleted = await service.delete_ip_pool_address(actor_id, ip_address)
     except ComputeUnitOperationError as exc:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -0,0 +1,66 @@
+import datetime as dt
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from ...dep import get_admin_service
+from ...models import JobTimings, Playbook, TaskTimingSummary
+from ...services.admin import AsyncAdminService
+
+router = APIRouter(
+    prefix="/playbook_timings",
+    tags=["playbook_timings"],
+)
+
+
+@router.get("/", response_model=list[TaskTimingSummary])
+async def list_task_timing_summary(
+    since: dt.datetime | None = None,
+    until: dt.datetime | None = None,
+    playbook: Playbook | None = None,
+    host: str | None = None,
+    by_host: bool = False,
+    limit: int | None = Query(50, ge=1, le=1000),
+    service: AsyncAdminService = Depends(get_admin_service),
+) -> list[TaskTimingSummary]:
+    """
+    Return the slowest playbook tasks across all jobs in a time window.
+
+    Task results are grouped by playbook, play (`phase`) and task name, and by
+    host too with `by_host=true`. Each row has the run count, p50/p95/max
+    duration and `total_ms`, the time the task took summed over all runs; rows
+    are ordered by `total_ms`, so the top rows are where playbook time goes.
+
+    The window is `[since, until)` on task start time, rounded out to whole
+    UTC days since the report reads daily rollups; p50/p95 are estimated
+    from their duration histograms. Without `since` it covers the last
+    KLOIGOS_TASK_TIMINGS_REPORT_DEFAULT_HOURS hours (7 days by default).
+    """
+    return await service.list_task_timing_summary(
+        since=since,
+        until=until,
+        playbook=playbook.value if playbook is not None else None,
+        host=host,
+        by_host=by_host,
+        limit=limit,
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobTimings)
+async def get_job_timings(
+    job_id: int,
+    service: AsyncAdminService = Depends(get_admin_service),
+) -> JobTimings:
+    """
+    Return where a remote job's playbook time went.
+
+    `phases` lists the job's plays in run order with their wall time; `tasks`
+    lists every task result per host, as recorded by the
+    `kloigos_task_timings` Ansible callback. Skipped tasks are not recorded.
+    """
+    timings = await service.get_job_timings(job_id)
+    if timings is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No playbook timings were recorded for job {job_id}.",
+        )
+    return timings
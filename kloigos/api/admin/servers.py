@@ -10,7 +10,7 @@ from ...models import (
     ServerNotFoundError,
     ServerStateError,
 )
-from ...services.admin import AdminService
+from ...services.admin import AsyncAdminService
 
 router = APIRouter(
     prefix="/servers",
@@ -21,7 +21,7 @@ router = APIRouter(
 @router.get("/", response_model=list[ServerInDB])
 async def list_servers(
     hostname: str | None = None,
-    service: AdminService = Depends(get_admin_service),
+    service: AsyncAdminService = Depends(get_admin_service),
 ) -> list[ServerInDB]:
     """
     Return physical servers, optionally filtered by hostname.
@@ -30,7 +30,7 @@ async def list_servers(
     `/compute_units/?hostname=<hostname>` to list the compute units hosted on a
     server.
     """
-    return service.list_servers(hostname)
+    return await service.list_servers(hostname)
 
 
 @router.post(
@@ -41,7 +41,7 @@ async def list_servers(
 async def init_server(
     sir: ServerInitRequest,
     actor_id: str = Depends(get_audit_actor),
-    service: AdminService = Depends(get_admin_service),
+    service: AsyncAdminService = Depends(get_admin_service),
 ) -> JobID:
     """
     Register a physical server and schedule bootstrap for its compute units.
@@ -66,17 +66,17 @@ async def init_server(
     }
     ```
     """
-    return service.init_server(actor_id, sir)
+    return await service.init_server(actor_id, sir)
 
 
 @router.put("/", response_model=JobID)
 async def decommission_server(
     sdr: ServerDecommRequest,
     actor_id: str = Depends(get_audit_actor),
-    service: AdminService = Depends(get_admin_service),
+    service: AsyncAdminService = Depends(get_admin_service),
 ) -> JobID:
     try:
-        return service.decommission_server(actor_id, sdr)
+        return await service.decommission_server(actor_id, sdr)
     except ServerNotFoundError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -101,10 +101,10 @@ async def decommission_server(
 async def delete_server(
     hostname: str,
     actor_id: str = Depends(get_audit_actor),
-    service: AdminService = Depends(get_admin_service),
+    service: AsyncAdminService = Depends(get_admin_service),
 ) -> Response:
     try:
-        service.delete_server(actor_id, hostname)
+        await service.delete_server(actor_id, hostname)
     except ServerNotFoundError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
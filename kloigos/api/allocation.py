@@ -1,15 +1,21 @@
+from typing import Literal
+
 from cpkit import get_audit_actor, require_readonly, require_user
 from cpkit.jobs.types import JobID
 from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
+    Response,
     Security,
     status,
 )
 
 from ..dep import get_allocation_service
 from ..models import (
+    AllocationBatchCreateRequest,
+    AllocationBatchCreateResponse,
     AllocationCreateRequest,
     AllocationCreateResponse,
     AllocationInDB,
@@ -17,10 +23,12 @@ from ..models import (
     ComputeUnitNotFoundError,
     ComputeUnitOperationError,
     ComputeUnitStateError,
+    InvalidCursorError,
     NoFreeComputeUnitError,
     NoFreeIpAddressError,
 )
-from ..services.allocation import AllocationService
+from ..services.allocation import AsyncAllocationService
+from .responses import json_response, ndjson_response
 
 router = APIRouter(
     prefix="/allocations",
@@ -40,17 +48,49 @@ async def list_allocations(
     current_host: str | None = None,
     ip_address: str | None = None,
     status: str | None = None,
-    service: AllocationService = Depends(get_allocation_service),
-) -> list[AllocationInDB]:
-    """List allocations with floating IP and current login user, optionally filtered."""
-    return service.list_allocations(
-        allocation_id=allocation_id,
-        login_user=login_user,
-        compute_id=compute_id,
-        current_host=current_host,
-        ip_address=ip_address,
-        status=status,
-    )
+    limit: int | None = Query(None, ge=1, le=1000),
+    cursor: str | None = None,
+    format: Literal["json", "ndjson"] = "json",
+    service: AsyncAllocationService = Depends(get_allocation_service),
+) -> Response:
+    """
+    List allocations with floating IP and current login user, optionally filtered.
+
+    With `limit`, results are paged newest first. When more rows remain, the
+    `X-Next-Cursor` response header holds the `cursor` for the next page.
+
+    `format=ndjson` streams every matching allocation, one JSON object per
+    line, and cannot be combined with `limit` or `cursor`.
+    """
+    if format == "ndjson":
+        if limit is not None or cursor is not None:
+            raise HTTPException(400, "format=ndjson does not support limit or cursor.")
+        return ndjson_response(
+            service.stream_allocations(
+                allocation_id=allocation_id,
+                login_user=login_user,
+                compute_id=compute_id,
+                current_host=current_host,
+                ip_address=ip_address,
+                status=status,
+            )
+        )
+
+    try:
+        allocations, next_cursor = await service.list_allocations(
+            allocation_id=allocation_id,
+            login_user=login_user,
+            compute_id=compute_id,
+            current_host=current_host,
+            ip_address=ip_address,
+            status=status,
+            limit=limit,
+            cursor=cursor,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(400, str(exc)) from exc
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_response(allocations, headers)
 
 
 @router.post(
@@ -61,31 +101,69 @@ async def list_allocations(
 async def allocate(
     req: AllocationCreateRequest,
     actor_id: str = Depends(get_audit_actor),
-    service: AllocationService = Depends(get_allocation_service),
+    service: AsyncAllocationService = Depends(get_allocation_service),
 ) -> AllocationCreateResponse:
     """Create an allocation and queue compute-unit setup as a cpkit job."""
     try:
-        return service.allocate(actor_id, req)
-    except NoFreeComputeUnitError:
-        raise HTTPException(460, "No free Compute Unit found to match your request")
-    except NoFreeIpAddressError:
-        raise HTTPException(460, "No free IP address found to match your request")
-    except ComputeUnitOperationError as exc:
-        message = str(exc)
-        if "already in use" in message or "already exists" in message:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=message,
-            ) from exc
-        if message.startswith("login_user "):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=message,
-            ) from exc
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        return await service.allocate(actor_id, req)
+    except (
+        NoFreeComputeUnitError,
+        NoFreeIpAddressError,
+        ComputeUnitOperationError,
+    ) as exc:
+        raise _allocate_http_error(exc) from exc
+
+
+@router.post(
+    "/batch",
+    response_model=AllocationBatchCreateResponse,
+    dependencies=[Security(require_user)],
+)
+async def allocate_batch(
+    req: AllocationBatchCreateRequest,
+    actor_id: str = Depends(get_audit_actor),
+    service: AsyncAllocationService = Depends(get_allocation_service),
+) -> AllocationBatchCreateResponse:
+    """
+    Create several allocations at once, e.g. for all nodes of a cluster.
+
+    Every entry follows the rules of `POST /allocations`. All compute units
+    and IPs are reserved in one transaction, so either every allocation is
+    reserved or none is. Setup is queued as one job per target host, and each
+    returned allocation carries the `job_id` that tracks it. If a job cannot
+    be queued, the allocations of the hosts not yet queued are discarded and
+    the error lists the ones that were queued and kept.
+    """
+    try:
+        return await service.allocate_batch(actor_id, req)
+    except (
+        NoFreeComputeUnitError,
+        NoFreeIpAddressError,
+        ComputeUnitOperationError,
+    ) as exc:
+        raise _allocate_http_error(exc) from exc
+
+
+def _allocate_http_error(exc: Exception) -> HTTPException:
+    if isinstance(exc, NoFreeComputeUnitError):
+        return HTTPException(460, "No free Compute Unit found to match your request")
+    if isinstance(exc, NoFreeIpAddressError):
+        return HTTPException(460, "No free IP address found to match your request")
+    message = str(exc)
+    if "already in use" in message or "already exists" in message:
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
             detail=message,
-        ) from exc
+        )
+    if message.startswith("login_user "):
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=message,
+        )
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=message,
+    )
 
 
 @router.get(
@@ -95,11 +173,11 @@ async def allocate(
 )
 async def get_allocation(
     allocation_id: str,
-    service: AllocationService = Depends(get_allocation_service),
+    service: AsyncAllocationService = Depends(get_allocation_service),
 ) -> AllocationInDB:
     """Fetch one allocation by durable allocation id, including current login user."""
     try:
-        return service.get_allocation(allocation_id)
+        return await service.get_allocation(allocation_id)
     except ComputeUnitNotFoundError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -115,11 +193,11 @@ async def get_allocation(
 async def deallocate_allocation(
     allocation_id: str,
     actor_id: str = Depends(get_audit_actor),
-    service: AllocationService = Depends(get_allocation_service),
+    service: AsyncAllocationService = Depends(get_allocation_service),
 ) -> JobID:
     """Queue a cpkit job to deallocate the compute unit backing an allocation."""
     try:
-        return service.deallocate(actor_id, allocation_id)
+        return await service.deallocate(actor_id, allocation_id)
     except ComputeUnitNotFoundError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -146,11 +224,11 @@ async def scale_allocation(
     allocation_id: str,
     req: AllocationScaleRequest,
     actor_id: str = Depends(get_audit_actor),
-    service: AllocationService = Depends(get_allocation_service),
+    service: AsyncAllocationService = Depends(get_allocation_service),
 ) -> JobID:
     """Queue a cpkit job to scale an allocation onto another compute unit."""
     try:
-        return service.scale(actor_id, allocation_id, req)
+        return await service.scale(actor_id, allocation_id, req)
     except ComputeUnitNotFoundError as exc:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
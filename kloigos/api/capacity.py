@@ -0,0 +1,38 @@
+from cpkit import require_readonly
+from fastapi import APIRouter, Depends, Security
+
+from ..dep import get_compute_unit_service
+from ..models import CapacitySummary
+from ..services.compute_unit import AsyncComputeUnitService
+
+router = APIRouter(
+    prefix="/capacity",
+    tags=["capacity"],
+    dependencies=[Security(require_readonly)],
+)
+
+
+@router.get("/", response_model=list[CapacitySummary])
+async def get_capacity(
+    region: str | None = None,
+    zone: str | None = None,
+    cpu_count: int | None = None,
+    runtime_profile: str | None = None,
+    service: AsyncComputeUnitService = Depends(get_compute_unit_service),
+) -> list[CapacitySummary]:
+    """
+    Return compute unit counts per region, zone, cpu_count and runtime profile.
+
+    `free` counts every FREE compute unit; `placeable_free` only those on READY,
+    HEALTHY servers, i.e. what a new allocation can actually land on.
+    `allocated` covers ALLOCATING, ALLOCATED and DEALLOCATING units, `failed`
+    the ALLOCATION_FAIL and DEALLOCATION_FAIL ones.
+
+    Counts come from counters maintained alongside every compute unit status
+    change, so this stays cheap regardless of inventory size.
+
+    Example:
+    - /capacity
+    - /capacity?region=us-east-1&cpu_count=4
+    """
+    return await service.get_capacity(region, zone, cpu_count, runtime_profile)
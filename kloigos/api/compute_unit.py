@@ -1,9 +1,12 @@
+from typing import Literal
+
 from cpkit import require_readonly
-from fastapi import APIRouter, Depends, Security
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Security
 
 from ..dep import get_compute_unit_service
-from ..models import ComputeUnitOverview
-from ..services.compute_unit import ComputeUnitService
+from ..models import ComputeUnitOverview, InvalidCursorError
+from ..services.compute_unit import AsyncComputeUnitService
+from .responses import json_response, ndjson_response
 
 router = APIRouter(
     prefix="/compute_units",
@@ -21,8 +24,11 @@ async def list_compute_units(
     cpu_count: int | None = None,
     deployment_id: str | None = None,
     status: str | None = None,
-    service: ComputeUnitService = Depends(get_compute_unit_service),
-) -> list[ComputeUnitOverview]:
+    limit: int | None = Query(None, ge=1, le=1000),
+    cursor: str | None = None,
+    format: Literal["json", "ndjson"] = "json",
+    service: AsyncComputeUnitService = Depends(get_compute_unit_service),
+) -> Response:
     """
     Return compute units, optionally filtered by id, host, region, size, tags, or status.
 
@@ -33,14 +39,37 @@ async def list_compute_units(
     - /compute_units
     - /compute_units?deployment_id=web_app_v1
     - /compute_units?status=FREE
+    - /compute_units?limit=500&cursor=<X-Next-Cursor of the previous page>
+    - /compute_units?format=ndjson (stream every row, one JSON object per line)
     """
+    if format == "ndjson":
+        if limit is not None or cursor is not None:
+            raise HTTPException(400, "format=ndjson does not support limit or cursor.")
+        return ndjson_response(
+            service.stream_compute_units(
+                compute_id,
+                hostname,
+                region,
+                zone,
+                cpu_count,
+                deployment_id,
+                status,
+            )
+        )
 
-    return service.list_compute_units(
-        compute_id,
-        hostname,
-        region,
-        zone,
-        cpu_count,
-        deployment_id,
-        status,
-    )
+    try:
+        compute_units, next_cursor = await service.list_compute_units(
+            compute_id,
+            hostname,
+            region,
+            zone,
+            cpu_count,
+            deployment_id,
+            status,
+            limit=limit,
+            cursor=cursor,
+        )
+    except InvalidCursorError as exc:
+        raise HTTPException(400, str(exc)) from exc
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return json_response(compute_units, headers)
@@ -0,0 +1,46 @@
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows per response chunk; small enough that the first bytes go out quickly.
+NDJSON_CHUNK_ROWS = 500
+
+
+def json_response(
+    rows: list[dict[str, Any]],
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """Encode repository rows to a JSON response in a single pass.
+
+    Returning a Response skips response_model validation, so `rows` must
+    already have the route's response_model shape; the route keeps
+    `response_model` for the OpenAPI schema. pydantic_core encodes values the
+    same way the models would.
+    """
+    return Response(
+        content=to_json(rows),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+async def _ndjson_chunks(rows: AsyncIterable[BaseModel]) -> AsyncIterator[str]:
+    chunk = []
+    async for row in rows:
+        chunk.append(row.model_dump_json())
+        if len(chunk) >= NDJSON_CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def ndjson_response(rows: AsyncIterable[BaseModel]) -> StreamingResponse:
+    """Stream rows as newline-delimited JSON, one object per line."""
+    return StreamingResponse(_ndjson_chunks(rows), media_type=NDJSON_MEDIA_TYPE)
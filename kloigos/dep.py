@@ -1,18 +1,61 @@
+import asyncio
+import os
+
 from cpkit import get_repo
 from fastapi import Depends
+from psycopg_pool import AsyncConnectionPool
+
+from .repos import AsyncRepo
+from .services.admin import AsyncAdminService
+from .services.allocation import AsyncAllocationService
+from .services.compute_unit import AsyncComputeUnitService
+
+KLOIGOS_ASYNC_POOL_MAX_SIZE = int(os.getenv("KLOIGOS_ASYNC_POOL_MAX_SIZE", "10"))
+
+_async_repo: AsyncRepo | None = None
+_async_repo_lock = asyncio.Lock()
+
+
+async def get_async_repo() -> AsyncRepo:
+    """Return the process-wide async repo, opening its pool on first use."""
+    global _async_repo
+    if _async_repo is None:
+        async with _async_repo_lock:
+            if _async_repo is None:
+                pool = AsyncConnectionPool(
+                    os.environ["KLOIGOS_DB_URL"],
+                    min_size=1,
+                    max_size=KLOIGOS_ASYNC_POOL_MAX_SIZE,
+                    kwargs={"autocommit": True},
+                    open=False,
+                )
+                await pool.open()
+                _async_repo = AsyncRepo(pool)
+    return _async_repo
+
 
-from .services.admin import AdminService
-from .services.allocation import AllocationService
-from .services.compute_unit import ComputeUnitService
+async def close_async_repo() -> None:
+    global _async_repo
+    if _async_repo is not None:
+        await _async_repo.pool.close()
+        _async_repo = None
 
 
-def get_allocation_service(repo=Depends(get_repo)) -> AllocationService:
-    return AllocationService(repo)
+def get_allocation_service(
+    repo=Depends(get_repo),
+    async_repo: AsyncRepo = Depends(get_async_repo),
+) -> AsyncAllocationService:
+    return AsyncAllocationService(repo, async_repo)
 
 
-def get_compute_unit_service(repo=Depends(get_repo)) -> ComputeUnitService:
-    return ComputeUnitService(repo)
+def get_compute_unit_service(
+    async_repo: AsyncRepo = Depends(get_async_repo),
+) -> AsyncComputeUnitService:
+    return AsyncComputeUnitService(async_repo)
 
 
-def get_admin_service(repo=Depends(get_repo)) -> AdminService:
-    return AdminService(repo)
+def get_admin_service(
+    repo=Depends(get_repo),
+    async_repo: AsyncRepo = Depends(get_async_repo),
+) -> AsyncAdminService:
+    return AsyncAdminService(repo, async_repo)
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from importlib.resources import files
 from pathlib import Path
 
@@ -9,8 +10,10 @@ from cpkit import (
 )
 
 from . import KLOIGOS_DB_URL
-from .api import admin, allocation, compute_unit
+from .api import admin, allocation, capacity, compute_unit
+from .dep import close_async_repo
 from .models import (
+    AllocationBatchCreateCommand,
     AllocationCreateCommand,
     AllocationDeallocateCommand,
     AllocationScaleCommand,
@@ -24,6 +27,7 @@ from .workers.health import run_server_health_check
 from .workers.remote import (
     run_allocation_scale,
     run_compute_unit_allocate,
+    run_compute_unit_allocate_batch,
     run_compute_unit_deallocate,
     run_server_decommission,
     run_server_init,
@@ -37,6 +41,7 @@ def _package_path(relative_path: str) -> Path:
 cpkit_bundle = create_cpkit_bundle(
     command_models={
         QueueCommand.ALLOCATION_CREATE: AllocationCreateCommand,
+        QueueCommand.ALLOCATION_CREATE_BATCH: AllocationBatchCreateCommand,
         QueueCommand.ALLOCATION_DELETE: AllocationDeallocateCommand,
         QueueCommand.ALLOCATION_SCALE: AllocationScaleCommand,
         QueueCommand.SERVER_INIT: ServerInitRequest,
@@ -45,6 +50,7 @@ cpkit_bundle = create_cpkit_bundle(
     },
     command_handlers={
         QueueCommand.ALLOCATION_CREATE: run_compute_unit_allocate,
+        QueueCommand.ALLOCATION_CREATE_BATCH: run_compute_unit_allocate_batch,
         QueueCommand.ALLOCATION_DELETE: run_compute_unit_deallocate,
         QueueCommand.ALLOCATION_SCALE: run_allocation_scale,
         QueueCommand.SERVER_INIT: run_server_init,
@@ -62,6 +68,7 @@ app = create_cpkit_app(
     routers=(
         admin.router,
         allocation.router,
+        capacity.router,
         compute_unit.router,
     ),
     recurring_messages=(
@@ -77,3 +84,19 @@ app = create_cpkit_app(
     app_static_directory=_package_path("webapp"),
     default_journald_identifier="kloigos",
 )
+
+_cpkit_lifespan = app.router.lifespan_context
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    # Starlette skips shutdown event handlers once the app has a lifespan, so
+    # the async pool is closed when cpkit's lifespan exits.
+    async with _cpkit_lifespan(app) as state:
+        try:
+            yield state
+        finally:
+            await close_async_repo()
+
+
+app.router.lifespan_context = _lifespan
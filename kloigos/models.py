@@ -1,6 +1,7 @@
 import base64
 import binascii
 import datetime as dt
+import ipaddress
 from enum import StrEnum, auto
 from typing import Any
 
@@ -40,6 +41,10 @@ class ServerStateError(Exception):
     pass
 
 
+class InvalidCursorError(Exception):
+    pass
+
+
 def _cpu_ids_for_range(cpu_range: str) -> set[int]:
     raw_range = cpu_range.strip()
     if not raw_range:
@@ -86,6 +91,7 @@ class Event(AutoNameStrEnum):
     ALLOCATION_SCALE_FAILED = auto()
     IP_POOL_INSERT = auto()
     IP_POOL_DELETE = auto()
+    SERVER_HEALTH_CHECK_DONE = auto()
 
 
 class Playbook(AutoNameStrEnum):
@@ -100,6 +106,7 @@ class Playbook(AutoNameStrEnum):
 
 class QueueCommand(AutoNameStrEnum):
     ALLOCATION_CREATE = auto()
+    ALLOCATION_CREATE_BATCH = auto()
     ALLOCATION_DELETE = auto()
     ALLOCATION_SCALE = auto()
     SERVER_INIT = auto()
@@ -130,6 +137,24 @@ class AllocationStatus(AutoNameStrEnum):
     DEALLOCATION_FAIL = auto()
 
 
+class ScaleTransferMode(AutoNameStrEnum):
+    # target pulls from source, falling back to CONTROLLER on failure
+    DIRECT = auto()
+    # DIRECT, but mnt is streamed from an LVM snapshot at block level first
+    BLOCK = auto()
+    # source to controller scratch, then controller to target
+    CONTROLLER = auto()
+
+
+class PlacementStrategy(AutoNameStrEnum):
+    # fullest host first, using as few hosts as possible
+    PACK = auto()
+    # one of the least-loaded hosts, at random
+    SPREAD = auto()
+    # least-loaded zone first, then one of its least-loaded hosts
+    ZONE_BALANCED = auto()
+
+
 class IpAddressStatus(AutoNameStrEnum):
     FREE = auto()
     RESERVED = auto()
@@ -206,6 +231,13 @@ def _validate_ssh_public_key(value: str) -> str:
     return text
 
 
+def _validate_ip_address(value: str) -> str:
+    try:
+        return str(ipaddress.ip_address(str(value or "").strip()))
+    except ValueError as exc:
+        raise ValueError(f"{value!r} is not a valid IP address.") from exc
+
+
 class ComputeUnitInDB(BaseModel):
     compute_id: str
     hostname: str
@@ -217,6 +249,7 @@ class ComputeUnitInDB(BaseModel):
     allocation_id: str | None = None
     started_at: dt.datetime | None = None
     tags: dict[str, Any] | None = None
+    numa_node_count: int | None = None
 
 
 class InitComputeUnit(BaseModel):
@@ -233,7 +266,11 @@ class InitComputeUnit(BaseModel):
             "cpu_count": self.cpu_count,
         }
 
-    def as_compute_unit(self, hostname: str) -> ComputeUnitInDB:
+    def as_compute_unit(
+        self,
+        hostname: str,
+        numa_node_count: int | None = None,
+    ) -> ComputeUnitInDB:
         return ComputeUnitInDB(
             compute_id="",  # generated by the database
             hostname=hostname,
@@ -242,6 +279,7 @@ class InitComputeUnit(BaseModel):
             cpu_count=self.cpu_count,
             cpu_set=self.cpu_set,
             status=ComputeUnitStatus.FREE,
+            numa_node_count=numa_node_count,
         )
 
 
@@ -251,6 +289,21 @@ class ComputeUnitOverview(ComputeUnitInDB):
     server_admin_user: str
     region: str
     zone: str
+    # True when cpu_set sits on one NUMA node, so the allocation's memory is
+    # node-local; None when the server's topology was not recorded.
+    numa_local: bool | None = None
+
+
+class CapacitySummary(BaseModel):
+    region: str
+    zone: str
+    cpu_count: int
+    runtime_profile: str
+    free: int
+    placeable_free: int
+    allocated: int
+    failed: int
+    unavailable: int
 
 
 class AllocationCreateRequest(BaseModel):
@@ -261,6 +314,8 @@ class AllocationCreateRequest(BaseModel):
     cpu_count: int | None = None
     region: str | None = None
     zone: str | None = None
+    numa_local: bool = False
+    placement_strategy: PlacementStrategy | None = None
     tags: dict[str, Any] | None = None
     ssh_public_key: str
 
@@ -274,6 +329,9 @@ class AllocationCreateCommand(BaseModel):
     allocation_id: str
     compute_id: str
     ssh_public_key: str
+    # created_at of the reserved allocation row; batch jobs skip allocations
+    # that no longer match it, i.e. were discarded (and maybe reserved again)
+    reserved_at: dt.datetime | None = None
 
 
 class AllocationCreateResponse(BaseModel):
@@ -281,6 +339,35 @@ class AllocationCreateResponse(BaseModel):
     job_id: int
 
 
+# Upper bound on allocations reserved by one batch request.
+ALLOCATION_BATCH_MAX_SIZE = 256
+
+
+class AllocationBatchCreateRequest(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    allocations: list[AllocationCreateRequest] = Field(
+        min_length=1,
+        max_length=ALLOCATION_BATCH_MAX_SIZE,
+    )
+
+
+class AllocationBatchCreateCommand(BaseModel):
+    allocations: list[AllocationCreateCommand] = Field(min_length=1)
+
+
+class AllocationBatchItem(BaseModel):
+    allocation_id: str
+    compute_id: str
+    hostname: str
+    ip_address: str
+    job_id: int
+
+
+class AllocationBatchCreateResponse(BaseModel):
+    allocations: list[AllocationBatchItem]
+
+
 class ServerHealthCheckCommand(BaseModel):
     pass
 
@@ -296,6 +383,10 @@ class AllocationScaleRequest(BaseModel):
     cpu_count: int = Field(gt=0)
     region: str | None = None
     zone: str | None = None
+    numa_local: bool = False
+    placement_strategy: PlacementStrategy | None = None
+    transfer_mode: ScaleTransferMode = ScaleTransferMode.DIRECT
+    iterative_precopy: bool = False
 
 
 class AllocationScaleCommand(AllocationScaleRequest):
@@ -331,8 +422,62 @@ class IpPoolAddressInDB(BaseModel):
     updated_at: dt.datetime | None = None
 
 
+# Upper bound on addresses expanded from one insert request (a /16).
+IP_POOL_INSERT_MAX_ADDRESSES = 65536
+
+
 class IpPoolInsertRequest(BaseModel):
-    ip_addresses: list[str] = Field(min_length=1)
+    ip_addresses: list[str] = Field(default_factory=list)
+    cidrs: list[str] = Field(default_factory=list)
+
+    @field_validator("ip_addresses")
+    @classmethod
+    def validate_ip_addresses(cls, value: list[str]) -> list[str]:
+        return [_validate_ip_address(ip_address) for ip_address in value]
+
+    @field_validator("cidrs")
+    @classmethod
+    def validate_cidrs(cls, value: list[str]) -> list[str]:
+        cidrs = []
+        for cidr in value:
+            try:
+                network = ipaddress.ip_network(str(cidr or "").strip(), strict=False)
+            except ValueError as exc:
+                raise ValueError(f"{cidr!r} is not a valid CIDR range.") from exc
+            cidrs.append(str(network))
+        return cidrs
+
+    @model_validator(mode="after")
+    def validate_addresses(self):
+        if not self.ip_addresses and not self.cidrs:
+            raise ValueError("ip_addresses or cidrs must contain at least one entry.")
+
+        total = len(self.ip_addresses) + sum(
+            ipaddress.ip_network(cidr).num_addresses for cidr in self.cidrs
+        )
+        if total > IP_POOL_INSERT_MAX_ADDRESSES:
+            raise ValueError(
+                f"Request expands to more than {IP_POOL_INSERT_MAX_ADDRESSES} addresses."
+            )
+        return self
+
+    def expand(self) -> list[str]:
+        """Return the requested addresses, de-duplicated, in request order.
+
+        CIDR ranges contribute their usable hosts: the network and broadcast
+        addresses of IPv4 ranges wider than /31 are skipped.
+        """
+        addresses = dict.fromkeys(self.ip_addresses)
+        for cidr in self.cidrs:
+            addresses.update(
+                dict.fromkeys(str(host) for host in ipaddress.ip_network(cidr).hosts())
+            )
+        return list(addresses)
+
+
+class IpPoolInsertResponse(BaseModel):
+    inserted: list[IpPoolAddressInDB]
+    conflicts: list[str]
 
 
 class BaseServer(BaseModel):
@@ -365,6 +510,7 @@ class ServerInDB(BaseServer):
     last_health_check_at: dt.datetime | None = None
     last_health_error: str | None = None
     last_healthy_at: dt.datetime | None = None
+    cpu_topology: dict[str, Any] | None = None
 
 
 class AlertInDB(BaseModel):
@@ -381,6 +527,43 @@ class AlertInDB(BaseModel):
     details: dict[str, Any] | None = None
 
 
+class JobTaskTiming(BaseModel):
+    seq: int
+    phase: str
+    task: str
+    host: str
+    status: str
+    started_at: dt.datetime
+    duration_ms: int
+
+
+class JobPhaseTiming(BaseModel):
+    phase: str
+    started_at: dt.datetime
+    duration_ms: int
+    task_count: int
+
+
+class JobTimings(BaseModel):
+    job_id: int
+    playbook: str
+    duration_ms: int
+    phases: list[JobPhaseTiming]
+    tasks: list[JobTaskTiming]
+
+
+class TaskTimingSummary(BaseModel):
+    playbook: str
+    phase: str
+    task: str
+    host: str | None = None
+    runs: int
+    p50_ms: float
+    p95_ms: float
+    max_ms: int
+    total_ms: int
+
+
 class ServerComputeUnitInitSpec(BaseModel):
     ordinal: int = Field(gt=0)
     cpu_range: str
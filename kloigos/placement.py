@@ -0,0 +1,145 @@
+"""Placement strategies for compute unit claims.
+
+A claim happens in two steps. First, the strategy ranks the servers that
+pass the claim filter and have free units of the requested size, and keeps
+the best PLACEMENT_CANDIDATE_HOSTS of them. Host and zone load come from
+capacity_counters, which compute unit writes keep current, so scoring reads
+one small row per (host, size, status) instead of counting compute units.
+Second, the claim takes a free unit on those hosts. It reads them through the
+hostname-leading placement index and orders by NUMA locality first, then by
+host rank, then by ordinal. The compute unit work is therefore bounded by the
+candidate hosts, not by the fleet.
+
+SPREAD and ZONE_BALANCED shuffle hosts of equal rank among the candidates.
+Concurrent claims read the same committed counters, so without the shuffle
+they would all pick the same host and queue on its capacity_counters rows.
+PACK stays deterministic: it is meant to fill one host, so concurrent PACK
+claims serialize on that host's counter rows.
+
+KLOIGOS_PLACEMENT_STRATEGY picks the default; requests may override it.
+"""
+
+import os
+
+from .models import ComputeUnitStatus, PlacementStrategy
+
+PLACEMENT_STRATEGY = PlacementStrategy(
+    os.getenv("KLOIGOS_PLACEMENT_STRATEGY", PlacementStrategy.SPREAD.value).upper()
+)
+
+# Best-ranked hosts a claim picks a compute unit from.
+PLACEMENT_CANDIDATE_HOSTS = int(os.getenv("KLOIGOS_PLACEMENT_CANDIDATE_HOSTS", "8"))
+
+_FREE = f"'{ComputeUnitStatus.FREE.value}'"
+
+_USED_STATUSES = ", ".join(
+    f"'{status.value}'"
+    for status in (
+        ComputeUnitStatus.ALLOCATING,
+        ComputeUnitStatus.ALLOCATED,
+        ComputeUnitStatus.DEALLOCATING,
+    )
+)
+
+# Per-zone used CPUs. Joined to the hosts as `zl`.
+_ZONE_LOAD = """
+    zone_load AS (
+        SELECT s.region, s.zone, sum(hl.used_cpus) AS used_cpus
+        FROM host_load hl JOIN servers s
+            ON hl.hostname = s.hostname
+        GROUP BY s.region, s.zone
+    )"""
+
+_ORDER_BY = {
+    # Fill the host with the fewest free CPUs first, so allocations land on
+    # as few hosts as possible and whole hosts stay free for large requests.
+    PlacementStrategy.PACK: "hl.free_cpus, hl.used_cpus DESC",
+    # Least-loaded host first, limiting how many allocations share a host.
+    PlacementStrategy.SPREAD: "hl.used_cpus, hl.free_cpus DESC",
+    # Least-loaded zone first, then the least-loaded host in it.
+    PlacementStrategy.ZONE_BALANCED: "zl.used_cpus, hl.used_cpus, hl.free_cpus DESC",
+}
+
+# Rank of a candidate host; lower is claimed first.
+_RANK = {
+    PlacementStrategy.PACK: "row_number() OVER (ORDER BY {order_by}, s.hostname)",
+    PlacementStrategy.SPREAD: "random()",
+    PlacementStrategy.ZONE_BALANCED: "dense_rank() OVER (ORDER BY zl.used_cpus) + random()",
+}
+
+
+def resolve(strategy: PlacementStrategy | None) -> PlacementStrategy:
+    """Return the strategy a claim uses: the requested one or the default."""
+    return PlacementStrategy(strategy) if strategy else PLACEMENT_STRATEGY
+
+
+def candidate_hosts_ctes(
+    strategy: PlacementStrategy,
+    server_where: str,
+    cpu_count: int | None = None,
+    unit_where: str | None = None,
+) -> tuple[str, tuple]:
+    """CTEs ending in `candidate_hosts`, the ranked hosts a claim may use.
+
+    `server_where` filters servers `s`. `unit_where`, when given, filters
+    compute units `c` that a host must have; pass it when capacity_counters
+    cannot tell (a specific compute_id, NUMA locality). Returns the SQL and
+    the parameters it binds before those of `server_where` and `unit_where`.
+    """
+    free_units = f"status = {_FREE}"
+    params: tuple = ()
+    if cpu_count is not None:
+        free_units += " AND cpu_count = %s"
+        params = (cpu_count,)
+
+    ctes = [
+        f"""
+    host_load AS (
+        SELECT hostname,
+            sum(CASE WHEN status = {_FREE}
+                THEN units * cpu_count ELSE 0 END) AS free_cpus,
+            sum(CASE WHEN status IN ({_USED_STATUSES})
+                THEN units * cpu_count ELSE 0 END) AS used_cpus,
+            sum(CASE WHEN {free_units} THEN units ELSE 0 END) AS free_units
+        FROM capacity_counters
+        GROUP BY hostname
+    )"""
+    ]
+    joins = "JOIN host_load hl ON hl.hostname = s.hostname"
+    if strategy == PlacementStrategy.ZONE_BALANCED:
+        ctes.append(_ZONE_LOAD)
+        joins += " JOIN zone_load zl ON zl.region = s.region AND zl.zone = s.zone"
+
+    has_unit = ""
+    if unit_where is not None:
+        has_unit = f"""
+            AND EXISTS (
+                SELECT 1 FROM compute_units c
+                WHERE c.hostname = s.hostname AND {unit_where}
+            )"""
+
+    order_by = _ORDER_BY[strategy]
+    ctes.append(
+        f"""
+    candidate_hosts AS (
+        SELECT
+            s.hostname,
+            s.private_ip,
+            s.public_ip,
+            s.server_admin_user,
+            s.region,
+            s.zone,
+            {_RANK[strategy].format(order_by=order_by)} AS rank
+        FROM servers s {joins}
+        WHERE {server_where}
+            AND hl.free_units > 0{has_unit}
+        ORDER BY {order_by}, s.hostname
+        LIMIT {PLACEMENT_CANDIDATE_HOSTS}
+    )"""
+    )
+    return ",".join(ctes), params
+
+
+def order_by() -> str:
+    """ORDER BY for the compute units `c` on candidate hosts `ch`."""
+    return "c.numa_node_count ASC NULLS LAST, ch.rank, c.ordinal"
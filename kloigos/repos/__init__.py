@@ -1,8 +1,13 @@
 from .postgres import PostgresRepo
+from .postgres_async import AsyncPostgresRepo
 
 
 class Repo(PostgresRepo):
     pass
 
 
-__all__ = ["Repo"]
+class AsyncRepo(AsyncPostgresRepo):
+    pass
+
+
+__all__ = ["AsyncRepo", "Repo"]
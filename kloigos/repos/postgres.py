@@ -1,25 +1,133 @@
+import datetime as dt
 import json
+import os
+import time
+from collections.abc import Callable
+from typing import Any, TypeVar
 
 from cpkit import CPKitRepo
 from cpkit.db import execute_stmt, fetch_all, fetch_one, fetch_scalar
+from psycopg import Connection
+from psycopg.errors import DeadlockDetected, SerializationFailure, UniqueViolation
+from psycopg.rows import class_row
 from psycopg_pool import ConnectionPool
 
+from .. import placement
 from ..models import (
     AlertSeverity,
     AlertStatus,
     AlertType,
     AllocationInDB,
     AllocationStatus,
+    CapacitySummary,
     ComputeUnitInDB,
+    ComputeUnitOperationError,
     ComputeUnitOverview,
     ComputeUnitStatus,
     IpAddressStatus,
     IpPoolAddressInDB,
+    NoFreeComputeUnitError,
+    NoFreeIpAddressError,
+    PlacementStrategy,
     ServerHealthStatus,
     ServerInDB,
     ServerInitRequest,
     ServerStatus,
 )
+from .queries import (
+    allocations_query,
+    capacity_query,
+    compute_units_query,
+    ip_pool_addresses_query,
+    job_task_timings_query,
+    servers_query,
+)
+
+T = TypeVar("T")
+
+# Bounded retries for contended compute unit claims.
+CLAIM_ATTEMPTS = 3
+CLAIM_RETRY_DELAY_SECONDS = 0.02
+
+# Reservation failures that a retry of the whole transaction can clear:
+# serializable databases (CockroachDB) abort one side of a conflicting claim
+# instead of blocking, and a batch that claims on several hosts can deadlock
+# with another batch on their capacity_counters rows.
+RETRYABLE_RESERVATION_ERRORS = (SerializationFailure, DeadlockDetected)
+
+# When > 0, placement skips servers whose last health check is older than
+# this, so a HEALTHY status that is no longer being refreshed is not trusted.
+# Off by default: with it on, allocations fail once the health worker stops,
+# and servers the cycle deadline skips drop out of placement. Keep it above
+# the health heartbeat (KLOIGOS_HEALTH_HEARTBEAT_SECONDS).
+PLACEMENT_MAX_HEALTH_AGE_SECONDS = int(
+    os.getenv("KLOIGOS_PLACEMENT_MAX_HEALTH_AGE_SECONDS", "0")
+)
+
+
+def _capacity_counters_ctes(changes: str) -> str:
+    """CTEs applying the compute unit transitions in `changes` to
+    capacity_counters, within the statement that makes them.
+
+    `changes` names a CTE with one (hostname, cpu_count, old_status,
+    new_status) row per written unit; old_status is NULL for inserts and
+    new_status is NULL for deletes. Every statement that writes
+    compute_units.status must include these. Counter rows are upserted in
+    key order, so concurrent statements lock them in the same order.
+    """
+    return f"""
+        capacity_deltas AS (
+            SELECT hostname, cpu_count, status, sum(delta) AS delta
+            FROM (
+                SELECT hostname, cpu_count, old_status AS status, -1 AS delta
+                FROM {changes}
+                WHERE old_status IS NOT NULL
+                UNION ALL
+                SELECT hostname, cpu_count, new_status, 1
+                FROM {changes}
+                WHERE new_status IS NOT NULL
+            ) AS d
+            GROUP BY hostname, cpu_count, status
+            HAVING sum(delta) <> 0
+        ),
+        capacity_applied AS (
+            INSERT INTO capacity_counters (hostname, cpu_count, status, units)
+            SELECT hostname, cpu_count, status, delta
+            FROM capacity_deltas
+            ORDER BY hostname, cpu_count, status
+            ON CONFLICT (hostname, cpu_count, status)
+            DO UPDATE SET units = capacity_counters.units + excluded.units
+            RETURNING 1
+        )"""
+
+
+def _set_compute_unit_status_stmt(where: str) -> str:
+    """UPDATE of the compute units matching `where` (on `compute_units`) to
+    status %(status)s, releasing their allocation, with counters applied."""
+    return f"""
+        WITH old_cu AS (
+            SELECT compute_id, hostname, cpu_count, status
+            FROM compute_units
+            WHERE {where}
+            FOR UPDATE
+        ),
+        cu_changes AS (
+            UPDATE compute_units
+            SET
+                status = %(status)s,
+                allocation_id = NULL,
+                tags = '{{}}'
+            FROM old_cu
+            WHERE compute_units.compute_id = old_cu.compute_id
+            RETURNING
+                old_cu.hostname,
+                old_cu.cpu_count,
+                old_cu.status AS old_status,
+                compute_units.status AS new_status
+        ),
+        {_capacity_counters_ctes("cu_changes")}
+        SELECT count(*) FROM capacity_applied
+    """
 
 
 class PostgresRepo(CPKitRepo):
@@ -69,6 +177,7 @@ class PostgresRepo(CPKitRepo):
                 last_health_check_at = NULL,
                 last_health_error = NULL,
                 last_healthy_at = NULL,
+                cpu_topology = NULL,
                 tags = EXCLUDED.tags
             """,
             (
@@ -124,50 +233,75 @@ class PostgresRepo(CPKitRepo):
             ),
         )
 
-    def update_server_health(
+    def server_update_topology(self, hostname: str, topology: dict) -> None:
+        execute_stmt(
+            """
+            UPDATE servers
+            SET cpu_topology = %s::JSONB
+            WHERE hostname = %s
+            """,
+            (json.dumps(topology), hostname),
+        )
+
+    def get_server_topology(self, hostname: str) -> dict | None:
+        return fetch_scalar(
+            """
+            SELECT cpu_topology
+            FROM servers
+            WHERE hostname = %s
+            """,
+            (hostname,),
+        )
+
+    def update_servers_health(
         self,
-        hostname: str,
-        health_status: ServerHealthStatus,
-        error: str | None = None,
+        updates: list[tuple[str, ServerHealthStatus, str | None]],
     ) -> None:
+        """Write one health check cycle's (hostname, status, error) results."""
+        if not updates:
+            return
+        hostnames, statuses, errors = (list(column) for column in zip(*updates))
         execute_stmt(
             """
-            UPDATE servers
+            UPDATE servers AS s
             SET
-                health_status = %s,
+                health_status = v.health_status,
                 last_health_check_at = now(),
-                last_health_error = %s,
+                last_health_error = v.error,
                 last_healthy_at = CASE
-                    WHEN %s = 'HEALTHY' THEN now()
-                    ELSE last_healthy_at
+                    WHEN v.health_status = 'HEALTHY' THEN now()
+                    ELSE s.last_healthy_at
                 END
-            WHERE hostname = %s
+            FROM unnest(%s::TEXT[], %s::TEXT[], %s::TEXT[])
+                AS v(hostname, health_status, error)
+            WHERE s.hostname = v.hostname
             """,
-            (
-                health_status,
-                error,
-                health_status,
-                hostname,
-            ),
+            (hostnames, statuses, errors),
         )
 
-    def open_or_touch_alert(
+    def open_or_touch_alerts(
         self,
         *,
         alert_type: AlertType,
-        severity: AlertSeverity,
         resource_type: str,
-        resource_id: str,
-        message: str,
-        details: dict | None = None,
+        alerts: list[tuple[str, AlertSeverity, str, dict | None]],
     ) -> None:
+        """Open, or refresh the open, alert for each (resource_id, severity,
+        message, details)."""
+        if not alerts:
+            return
+        resource_ids, severities, messages, details = (
+            list(column) for column in zip(*alerts)
+        )
         execute_stmt(
             """
             INSERT INTO alerts (
                 alert_type, severity, status, resource_type, resource_id,
                 message, details
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            SELECT %s, v.severity, %s, %s, v.resource_id, v.message, v.details::JSONB
+            FROM unnest(%s::TEXT[], %s::TEXT[], %s::TEXT[], %s::TEXT[])
+                AS v(resource_id, severity, message, details)
             ON CONFLICT (alert_type, resource_type, resource_id)
             WHERE status = 'OPEN'
             DO UPDATE SET
@@ -178,45 +312,50 @@ class PostgresRepo(CPKitRepo):
             """,
             (
                 alert_type,
-                severity,
                 AlertStatus.OPEN,
                 resource_type,
-                resource_id,
-                message,
-                json.dumps(details) if details is not None else None,
+                resource_ids,
+                severities,
+                messages,
+                [json.dumps(d) if d is not None else None for d in details],
             ),
         )
 
-    def resolve_alert(
+    def resolve_alerts(
         self,
         *,
         alert_type: AlertType,
         resource_type: str,
-        resource_id: str,
-        message: str,
-        details: dict | None = None,
+        alerts: list[tuple[str, str, dict | None]],
     ) -> None:
+        """Resolve the open alert, if any, for each (resource_id, message,
+        details)."""
+        if not alerts:
+            return
+        resource_ids, messages, details = (list(column) for column in zip(*alerts))
         execute_stmt(
             """
-            UPDATE alerts
+            UPDATE alerts AS a
             SET
                 status = %s,
                 resolved_at = now(),
                 last_seen_at = now(),
-                message = %s,
-                details = coalesce(%s, details)
-            WHERE alert_type = %s
-              AND resource_type = %s
-              AND resource_id = %s
-              AND status = %s
+                message = v.message,
+                details = coalesce(v.details::JSONB, a.details)
+            FROM unnest(%s::TEXT[], %s::TEXT[], %s::TEXT[])
+                AS v(resource_id, message, details)
+            WHERE a.alert_type = %s
+              AND a.resource_type = %s
+              AND a.resource_id = v.resource_id
+              AND a.status = %s
             """,
             (
                 AlertStatus.RESOLVED,
-                message,
-                json.dumps(details) if details is not None else None,
+                resource_ids,
+                messages,
+                [json.dumps(d) if d is not None else None for d in details],
                 alert_type,
                 resource_type,
-                resource_id,
                 AlertStatus.OPEN,
             ),
         )
@@ -225,21 +364,8 @@ class PostgresRepo(CPKitRepo):
         self,
         hostname: str | None = None,
     ) -> list[ServerInDB]:
-
-        # Prepare the WHERE clause
-        conditions = []
-        params = []
-
-        if hostname is not None:
-            conditions.append("hostname = %s")
-            params.append(hostname)
-
-        sql = "SELECT * FROM servers "
-
-        if conditions:
-            sql += " WHERE " + " AND ".join(conditions)
-
-        return fetch_all(sql, tuple(params), ServerInDB)
+        sql, params = servers_query(hostname)
+        return fetch_all(sql, params, ServerInDB)
 
     def delete_server(self, hostname: str) -> None:
         execute_stmt(
@@ -332,90 +458,301 @@ class PostgresRepo(CPKitRepo):
         current_host: str | None = None,
         ip_address: str | None = None,
         status: str | None = None,
+        limit: int | None = None,
+        after: list | None = None,
     ) -> list[AllocationInDB]:
-        conditions = []
-        params = []
-
-        if allocation_id is not None:
-            conditions.append("a.allocation_id = %s")
-            params.append(allocation_id)
+        sql, params = allocations_query(
+            allocation_id=allocation_id,
+            login_user=login_user,
+            compute_id=compute_id,
+            current_host=current_host,
+            ip_address=ip_address,
+            status=status,
+            limit=limit,
+            after=after,
+        )
+        return fetch_all(sql, params, AllocationInDB)
 
-        if login_user is not None:
-            conditions.append("a.login_user = %s")
-            params.append(login_user)
+    def reserve_allocation(
+        self,
+        *,
+        identity: Callable[[ComputeUnitOverview], tuple[str, str]],
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        numa_local: bool = False,
+        placement_strategy: PlacementStrategy | None = None,
+        tags: dict | None = None,
+    ) -> tuple[AllocationInDB, ComputeUnitOverview]:
+        """Reserve a compute unit and IP and insert the allocation atomically.
 
-        if compute_id is not None:
-            conditions.append("a.compute_id = %s")
-            params.append(compute_id)
+        `identity` maps the claimed compute unit to `(allocation_id, login_user)`
+        and may raise to abort the reservation. Nothing is left behind unless
+        the whole reservation commits.
+        """
+        return self._retry_reservation(
+            lambda conn: self._reserve_allocation(
+                conn,
+                identity=identity,
+                region=region,
+                zone=zone,
+                cpu_count=cpu_count,
+                numa_local=numa_local,
+                placement_strategy=placement_strategy,
+                tags=tags,
+            )
+        )
 
-        if current_host is not None:
-            conditions.append("a.current_host = %s")
-            params.append(current_host)
+    def reserve_allocations(
+        self,
+        reservations: list[dict[str, Any]],
+    ) -> list[tuple[AllocationInDB, ComputeUnitOverview]]:
+        """Reserve several allocations in one transaction: all or none.
 
-        if ip_address is not None:
-            conditions.append("a.ip_address = %s")
-            params.append(ip_address)
+        Each entry holds the keyword arguments of `reserve_allocation`.
+        """
+        return self._retry_reservation(
+            lambda conn: [
+                self._reserve_allocation(conn, **reservation)
+                for reservation in reservations
+            ]
+        )
 
-        if status is not None:
-            conditions.append("a.status = %s")
-            params.append(status)
+    def _retry_reservation(self, reserve: Callable[[Connection], T]) -> T:
+        """Run `reserve` in a transaction, retrying RETRYABLE_RESERVATION_ERRORS.
 
-        sql = """
-            SELECT
-                a.*,
-                c.cpu_count,
-                c.cpu_range,
-                c.cpu_set,
-                CASE
-                    WHEN s.mem_gb IS NOT NULL
-                         AND s.cpu_count IS NOT NULL
-                         AND s.cpu_count > 0
-                         AND c.cpu_count IS NOT NULL
-                    THEN round(
-                        s.mem_gb::numeric * c.cpu_count::numeric / s.cpu_count::numeric,
-                        1
-                    )
-                    ELSE NULL
-                END::float AS memory_gb,
-                s.disk_size_gb,
-                s.region,
-                s.zone,
-                s.runtime_profile
-            FROM allocations a
-            LEFT JOIN compute_units c
-              ON a.compute_id = c.compute_id
-            LEFT JOIN servers s
-              ON c.hostname = s.hostname
+        The final attempt runs outside the handler, so its error propagates.
         """
-        if conditions:
-            sql += " WHERE " + " AND ".join(conditions)
-        sql += " ORDER BY a.created_at DESC, a.allocation_id"
+        for attempt in range(1, CLAIM_ATTEMPTS):
+            try:
+                with self.pool.connection() as conn, conn.transaction():
+                    return reserve(conn)
+            except RETRYABLE_RESERVATION_ERRORS:
+                time.sleep(CLAIM_RETRY_DELAY_SECONDS * attempt)
+        with self.pool.connection() as conn, conn.transaction():
+            return reserve(conn)
+
+    def _reserve_allocation(
+        self,
+        conn: Connection,
+        *,
+        identity: Callable[[ComputeUnitOverview], tuple[str, str]],
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        numa_local: bool = False,
+        placement_strategy: PlacementStrategy | None = None,
+        tags: dict | None = None,
+    ) -> tuple[AllocationInDB, ComputeUnitOverview]:
+        cu = self._claim_compute_unit(
+            conn,
+            ComputeUnitStatus.FREE,
+            ComputeUnitStatus.ALLOCATING,
+            region=region,
+            zone=zone,
+            cpu_count=cpu_count,
+            numa_local=numa_local,
+            placement_strategy=placement_strategy,
+        )
+        if cu is None:
+            raise NoFreeComputeUnitError()
+
+        allocation_id, login_user = identity(cu)
+        try:
+            allocation = (
+                conn.cursor(row_factory=class_row(AllocationInDB))
+                .execute(
+                    """
+                    WITH available_ip AS (
+                        SELECT ip_address
+                        FROM ip_pool
+                        WHERE status = %(free_ip_status)s
+                        ORDER BY ip_address
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    ),
+                    new_allocation AS (
+                        INSERT INTO allocations (
+                            allocation_id, login_user, ip_address, compute_id,
+                            current_host, status, tags
+                        )
+                        SELECT
+                            %(allocation_id)s, %(login_user)s, host(ip_address),
+                            %(compute_id)s, %(hostname)s, %(status)s, %(tags)s
+                        FROM available_ip
+                        RETURNING *
+                    ),
+                    reserved_ip AS (
+                        UPDATE ip_pool
+                        SET
+                            status = %(reserved_ip_status)s,
+                            allocation_id = new_allocation.allocation_id,
+                            current_host = new_allocation.current_host,
+                            updated_at = now()
+                        FROM new_allocation
+                        WHERE ip_pool.ip_address = new_allocation.ip_address::inet
+                        RETURNING ip_pool.ip_address
+                    ),
+                    assigned_cu AS (
+                        UPDATE compute_units
+                        SET
+                            allocation_id = new_allocation.allocation_id,
+                            tags = %(cu_tags)s
+                        FROM new_allocation
+                        WHERE compute_units.compute_id = new_allocation.compute_id
+                        RETURNING compute_units.compute_id
+                    )
+                    SELECT * FROM new_allocation
+                    """,
+                    {
+                        "free_ip_status": IpAddressStatus.FREE,
+                        "reserved_ip_status": IpAddressStatus.RESERVED,
+                        "allocation_id": allocation_id,
+                        "login_user": login_user,
+                        "compute_id": cu.compute_id,
+                        "hostname": cu.hostname,
+                        "status": AllocationStatus.ALLOCATING,
+                        "tags": json.dumps(tags) if tags is not None else None,
+                        "cu_tags": json.dumps(tags or {}),
+                    },
+                )
+                .fetchone()
+            )
+        except UniqueViolation as exc:
+            constraint = exc.diag.constraint_name
+            if constraint == "pk_allocations":
+                raise ComputeUnitOperationError(
+                    f"allocation_id '{allocation_id}' already exists."
+                ) from exc
+            if constraint == "uq_allocations_active_login_user":
+                raise ComputeUnitOperationError(
+                    f"login_user '{login_user}' is already in use."
+                ) from exc
+            raise
+
+        if allocation is None:
+            raise NoFreeIpAddressError()
+
+        return allocation, cu
+
+    def release_allocation_reservation(self, allocation: AllocationInDB) -> None:
+        """Undo a committed reservation in one transaction."""
+        with self.pool.connection() as conn, conn.transaction():
+            conn.execute(
+                """
+                UPDATE allocations
+                SET
+                    status = %s,
+                    compute_id = NULL,
+                    current_host = NULL,
+                    updated_at = now()
+                WHERE allocation_id = %s
+                """,
+                (
+                    AllocationStatus.ALLOCATION_FAIL,
+                    allocation.allocation_id,
+                ),
+            )
+            conn.execute(
+                """
+                UPDATE ip_pool
+                SET
+                    status = %s,
+                    allocation_id = NULL,
+                    current_host = NULL,
+                    updated_at = now()
+                WHERE ip_address = %s
+                """,
+                (
+                    IpAddressStatus.FREE,
+                    allocation.ip_address,
+                ),
+            )
+            conn.execute(
+                _set_compute_unit_status_stmt("compute_id = %(compute_id)s"),
+                {
+                    "status": ComputeUnitStatus.FREE,
+                    "compute_id": allocation.compute_id,
+                },
+            )
+
+    def discard_allocation_reservations(
+        self, allocations: list[AllocationInDB]
+    ) -> None:
+        """Undo reservations no job has acted on, in one transaction.
 
-        return fetch_all(sql, tuple(params), AllocationInDB)
+        Unlike `release_allocation_reservation`, the allocation rows are
+        deleted, so a retry can reserve the same allocation ids. Allocations
+        that have left ALLOCATING are not touched.
+        """
+        with self.pool.connection() as conn, conn.transaction():
+            discarded = conn.execute(
+                """
+                DELETE FROM allocations
+                WHERE allocation_id = ANY(%s)
+                    AND status = %s
+                RETURNING ip_address, compute_id
+                """,
+                (
+                    [allocation.allocation_id for allocation in allocations],
+                    AllocationStatus.ALLOCATING,
+                ),
+            ).fetchall()
+            if not discarded:
+                return
+            conn.execute(
+                """
+                UPDATE ip_pool
+                SET
+                    status = %s,
+                    allocation_id = NULL,
+                    current_host = NULL,
+                    updated_at = now()
+                WHERE ip_address = ANY(%s::INET[])
+                """,
+                (
+                    IpAddressStatus.FREE,
+                    [ip_address for ip_address, _ in discarded],
+                ),
+            )
+            conn.execute(
+                _set_compute_unit_status_stmt("compute_id = ANY(%(compute_ids)s)"),
+                {
+                    "status": ComputeUnitStatus.FREE,
+                    "compute_ids": [
+                        compute_id for _, compute_id in discarded if compute_id
+                    ],
+                },
+            )
 
     #
     # IP POOL
     #
-    def insert_ip_pool_address(
+    def insert_ip_pool_addresses(
         self,
-        ip_address: str,
+        ip_addresses: list[str],
         status: IpAddressStatus = IpAddressStatus.FREE,
-        allocation_id: str | None = None,
-        current_host: str | None = None,
-    ) -> None:
-        execute_stmt(
+    ) -> list[IpPoolAddressInDB]:
+        """Insert addresses in one statement, skipping ones already pooled.
+
+        Returns only the rows actually inserted; callers derive conflicts
+        from what is missing.
+        """
+        return fetch_all(
             """
-            INSERT INTO ip_pool (
-                ip_address, status, allocation_id, current_host
-            )
-            VALUES (%s, %s, %s, %s)
-            """,
-            (
-                ip_address,
+            INSERT INTO ip_pool (ip_address, status)
+            SELECT unnest(%s::INET[]), %s
+            ON CONFLICT (ip_address) DO NOTHING
+            RETURNING
+                host(ip_address) AS ip_address,
                 status,
                 allocation_id,
                 current_host,
-            ),
+                created_at,
+                updated_at
+            """,
+            (ip_addresses, status),
+            IpPoolAddressInDB,
         )
 
     def delete_ip_pool_address(self, ip_address: str) -> bool:
@@ -503,32 +840,18 @@ class PostgresRepo(CPKitRepo):
         status: str | None = None,
         allocation_id: str | None = None,
         current_host: str | None = None,
+        limit: int | None = None,
+        after: list | None = None,
     ) -> list[IpPoolAddressInDB]:
-        conditions = []
-        params = []
-
-        if ip_address is not None:
-            conditions.append("ip_address = %s")
-            params.append(ip_address)
-
-        if status is not None:
-            conditions.append("status = %s")
-            params.append(status)
-
-        if allocation_id is not None:
-            conditions.append("allocation_id = %s")
-            params.append(allocation_id)
-
-        if current_host is not None:
-            conditions.append("current_host = %s")
-            params.append(current_host)
-
-        sql = "SELECT * FROM ip_pool"
-        if conditions:
-            sql += " WHERE " + " AND ".join(conditions)
-        sql += " ORDER BY ip_address"
-
-        return fetch_all(sql, tuple(params), IpPoolAddressInDB)
+        sql, params = ip_pool_addresses_query(
+            ip_address=ip_address,
+            status=status,
+            allocation_id=allocation_id,
+            current_host=current_host,
+            limit=limit,
+            after=after,
+        )
+        return fetch_all(sql, params, IpPoolAddressInDB)
 
     def lock_ip_pool_address(
         self,
@@ -553,6 +876,7 @@ class PostgresRepo(CPKitRepo):
                 WHERE {" AND ".join(conditions)}
                 ORDER BY ip_address
                 LIMIT 1
+                FOR UPDATE SKIP LOCKED
             )
             UPDATE ip_pool
             SET status = %s,
@@ -561,7 +885,7 @@ class PostgresRepo(CPKitRepo):
             WHERE ip_pool.ip_address = available_ip.ip_address
               AND ip_pool.status = %s
             RETURNING
-                ip_pool.ip_address,
+                host(ip_pool.ip_address) AS ip_address,
                 ip_pool.status,
                 ip_pool.allocation_id,
                 ip_pool.current_host,
@@ -576,17 +900,26 @@ class PostgresRepo(CPKitRepo):
     #
     def insert_new_compute_unit(self, cudb: ComputeUnitInDB):
         execute_stmt(
-            """
-            INSERT INTO compute_units (
-                hostname, ordinal, cpu_range, cpu_count,
-                cpu_set,
-                status, allocation_id, started_at, tags
-            )
-            VALUES (
-                %s, %s, %s, %s,
-                %s, %s, %s, %s, %s
-            )
-            ON CONFLICT DO NOTHING
+            f"""
+            WITH cu_changes AS (
+                INSERT INTO compute_units (
+                    hostname, ordinal, cpu_range, cpu_count,
+                    cpu_set,
+                    status, allocation_id, started_at, tags, numa_node_count
+                )
+                VALUES (
+                    %s, %s, %s, %s,
+                    %s, %s, %s, %s, %s, %s
+                )
+                ON CONFLICT DO NOTHING
+                RETURNING
+                    hostname,
+                    cpu_count,
+                    NULL::TEXT AS old_status,
+                    status AS new_status
+            ),
+            {_capacity_counters_ctes("cu_changes")}
+            SELECT count(*) FROM capacity_applied
             """,
             (
                 cudb.hostname,
@@ -598,6 +931,7 @@ class PostgresRepo(CPKitRepo):
                 cudb.allocation_id,
                 cudb.started_at,
                 cudb.tags,
+                cudb.numa_node_count,
             ),
         )
 
@@ -610,32 +944,57 @@ class PostgresRepo(CPKitRepo):
         tags: dict | None = None,
     ) -> None:
         execute_stmt(
-            """
-            UPDATE compute_units
-            SET
-                status = coalesce(%s, status),
-                allocation_id = CASE
-                    WHEN %s THEN NULL
-                    ELSE coalesce(%s, allocation_id)
-                END,
-                tags = coalesce(%s, tags)
-            WHERE compute_id = %s
+            f"""
+            WITH old_cu AS (
+                SELECT compute_id, hostname, cpu_count, status
+                FROM compute_units
+                WHERE compute_id = %s
+                FOR UPDATE
+            ),
+            cu_changes AS (
+                UPDATE compute_units
+                SET
+                    status = coalesce(%s, compute_units.status),
+                    allocation_id = CASE
+                        WHEN %s THEN NULL
+                        ELSE coalesce(%s, compute_units.allocation_id)
+                    END,
+                    tags = coalesce(%s, compute_units.tags)
+                FROM old_cu
+                WHERE compute_units.compute_id = old_cu.compute_id
+                RETURNING
+                    old_cu.hostname,
+                    old_cu.cpu_count,
+                    old_cu.status AS old_status,
+                    compute_units.status AS new_status
+            ),
+            {_capacity_counters_ctes("cu_changes")}
+            SELECT count(*) FROM capacity_applied
             """,
             (
+                compute_unit,
                 status,
                 clear_allocation_id,
                 allocation_id,
                 json.dumps(tags) if tags is not None else None,
-                compute_unit,
             ),
         )
 
     def delete_compute_units(self, hostname: str) -> None:
         execute_stmt(
-            """
-            DELETE
-            FROM compute_units
-            WHERE hostname = %s
+            f"""
+            WITH cu_changes AS (
+                DELETE
+                FROM compute_units
+                WHERE hostname = %s
+                RETURNING
+                    hostname,
+                    cpu_count,
+                    status AS old_status,
+                    NULL::TEXT AS new_status
+            ),
+            {_capacity_counters_ctes("cu_changes")}
+            SELECT count(*) FROM capacity_applied
             """,
             (hostname,),
         )
@@ -648,110 +1007,241 @@ class PostgresRepo(CPKitRepo):
         region: str | None = None,
         zone: str | None = None,
         cpu_count: int | None = None,
+        numa_local: bool = False,
+        placement_strategy: PlacementStrategy | None = None,
     ) -> ComputeUnitOverview:
+        with self.pool.connection() as conn:
+            return self._claim_compute_unit(
+                conn,
+                free_status,
+                allocated_status,
+                compute_id=compute_id,
+                region=region,
+                zone=zone,
+                cpu_count=cpu_count,
+                numa_local=numa_local,
+                placement_strategy=placement_strategy,
+            )
 
-        # Prepare the WHERE clause
-        conditions = []
-        params = []
-
-        params.append(free_status)
-
-        if compute_id is not None:
-            conditions.append("c.compute_id = %s")
-            params.append(compute_id)
-
-        if region is not None:
-            conditions.append("s.region = %s")
-            params.append(region)
-
-        if zone is not None:
-            conditions.append("s.zone = %s")
-            params.append(zone)
+    def _claim_compute_unit(
+        self,
+        conn: Connection,
+        free_status: ComputeUnitStatus,
+        allocated_status: ComputeUnitStatus,
+        compute_id: str | None = None,
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        numa_local: bool = False,
+        placement_strategy: PlacementStrategy | None = None,
+    ) -> ComputeUnitOverview | None:
+        sql, params = self._claim_compute_unit_query(
+            free_status,
+            allocated_status,
+            compute_id=compute_id,
+            region=region,
+            zone=zone,
+            cpu_count=cpu_count,
+            numa_local=numa_local,
+            placement_strategy=placement_strategy,
+        )
 
-        if cpu_count is not None:
-            conditions.append("c.cpu_count = %s")
-            params.append(cpu_count)
+        for attempt in range(1, CLAIM_ATTEMPTS + 1):
+            cu = (
+                conn.cursor(row_factory=class_row(ComputeUnitOverview))
+                .execute(sql, params)
+                .fetchone()
+            )
+            if cu is not None or attempt == CLAIM_ATTEMPTS:
+                return cu
+
+            # SKIP LOCKED returns nothing when every candidate is held by a
+            # concurrent claim. Those claims may still roll back, so only
+            # give up once no free candidate is left at all.
+            where, where_params = self._free_compute_unit_filter(
+                free_status,
+                compute_id=compute_id,
+                region=region,
+                zone=zone,
+                cpu_count=cpu_count,
+                numa_local=numa_local,
+            )
+            candidates_left = conn.execute(
+                f"""
+                SELECT EXISTS (
+                    SELECT 1
+                    FROM compute_units c JOIN servers s
+                        ON c.hostname = s.hostname
+                    WHERE {where}
+                )
+                """,
+                where_params,
+            ).fetchone()[0]
+            if not candidates_left:
+                return None
+            time.sleep(CLAIM_RETRY_DELAY_SECONDS * attempt)
+
+        return None
+
+    def _claim_compute_unit_query(
+        self,
+        free_status: ComputeUnitStatus,
+        allocated_status: ComputeUnitStatus,
+        compute_id: str | None = None,
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        numa_local: bool = False,
+        placement_strategy: PlacementStrategy | None = None,
+    ) -> tuple[str, tuple]:
+        server_where, server_params = self._placeable_server_filter(
+            region=region,
+            zone=zone,
+        )
+        unit_where, unit_params = self._free_unit_filter(
+            free_status,
+            compute_id=compute_id,
+            cpu_count=cpu_count,
+            numa_local=numa_local,
+        )
 
-        params.append(allocated_status)
-        params.append(free_status)
+        # Counters show whether a host has free units of a size, but not
+        # which unit or on how many NUMA nodes; probe the units for those.
+        probe_units = compute_id is not None or numa_local
+        ctes, cte_params = placement.candidate_hosts_ctes(
+            placement.resolve(placement_strategy),
+            server_where,
+            cpu_count=cpu_count,
+            unit_where=unit_where if probe_units else None,
+        )
 
-        sql = """
-            WITH 
+        sql = f"""
+            WITH {ctes},
             available_cu AS (
                 SELECT 
                     c.compute_id,
                     c.hostname,
                     c.ordinal,
                     c.cpu_range,
-                    s.private_ip AS server_private_ip,
-                    s.public_ip AS server_public_ip,
-                    s.server_admin_user,
-                    s.region,
-                    s.zone,
+                    ch.private_ip AS server_private_ip,
+                    ch.public_ip AS server_public_ip,
+                    ch.server_admin_user,
+                    ch.region,
+                    ch.zone,
                     c.cpu_set,
                     c.cpu_count,
                     c.status,
                     c.allocation_id,
                     c.started_at,
-                    c.tags 
-                FROM compute_units c JOIN servers s 
-                    ON c.hostname = s.hostname 
-                WHERE c.status = %s
-                  AND s.status = 'READY'
-                  AND s.health_status = 'HEALTHY' """
-
-        if conditions:
-            sql += " AND " + " AND ".join(conditions)
-
-        sql += """ ORDER BY c.hostname, c.ordinal LIMIT 1)
-        UPDATE compute_units
-        SET status = %s
-        FROM available_cu
-        WHERE compute_units.compute_id = available_cu.compute_id
-          AND compute_units.status = %s
-        RETURNING 
-            compute_units.compute_id,
-            compute_units.hostname,
-            compute_units.ordinal,
-            compute_units.cpu_range,
-            available_cu.server_private_ip,
-            available_cu.server_public_ip,
-            available_cu.server_admin_user,
-            available_cu.region,
-            available_cu.zone,
-            compute_units.cpu_set,
-            compute_units.cpu_count,
-            compute_units.status,
-            compute_units.allocation_id AS allocation_id,
-            compute_units.started_at,
-            compute_units.tags 
+                    c.tags,
+                    c.numa_node_count
+                FROM candidate_hosts ch JOIN compute_units c
+                    ON c.hostname = ch.hostname
+                WHERE {unit_where}
+                ORDER BY {placement.order_by()}
+                LIMIT 1
+                FOR UPDATE OF c SKIP LOCKED
+            ),
+            claimed_cu AS (
+                UPDATE compute_units
+                SET status = %s
+                FROM available_cu
+                WHERE compute_units.compute_id = available_cu.compute_id
+                  AND compute_units.status = %s
+                RETURNING
+                    available_cu.status AS old_status,
+                    compute_units.compute_id,
+                    compute_units.hostname,
+                    compute_units.ordinal,
+                    compute_units.cpu_range,
+                    available_cu.server_private_ip,
+                    available_cu.server_public_ip,
+                    available_cu.server_admin_user,
+                    available_cu.region,
+                    available_cu.zone,
+                    compute_units.cpu_set,
+                    compute_units.cpu_count,
+                    compute_units.status,
+                    compute_units.allocation_id AS allocation_id,
+                    compute_units.started_at,
+                    compute_units.tags,
+                    compute_units.numa_node_count,
+                    compute_units.numa_node_count = 1 AS numa_local
+            ),
+            cu_changes AS (
+                SELECT hostname, cpu_count, old_status, status AS new_status
+                FROM claimed_cu
+            ),
+            {_capacity_counters_ctes("cu_changes")}
+            SELECT
+                compute_id,
+                hostname,
+                ordinal,
+                cpu_range,
+                server_private_ip,
+                server_public_ip,
+                server_admin_user,
+                region,
+                zone,
+                cpu_set,
+                cpu_count,
+                status,
+                allocation_id,
+                started_at,
+                tags,
+                numa_node_count,
+                numa_local
+            FROM claimed_cu
         """
 
-        return fetch_one(sql, tuple(params), ComputeUnitOverview)
+        params = (
+            *cte_params,
+            *server_params,
+            *(unit_params if probe_units else ()),
+            *unit_params,
+            allocated_status,
+            free_status,
+        )
+        return sql, params
 
-    def get_compute_units(
+    def _free_compute_unit_filter(
         self,
+        free_status: ComputeUnitStatus,
         compute_id: str | None = None,
-        hostname: str | None = None,
         region: str | None = None,
         zone: str | None = None,
         cpu_count: int | None = None,
-        deployment_id: str | None = None,
-        status: str | None = None,
-        limit: int | None = None,
-    ) -> list[ComputeUnitOverview]:
+        numa_local: bool = False,
+    ) -> tuple[str, tuple]:
+        server_where, server_params = self._placeable_server_filter(
+            region=region,
+            zone=zone,
+        )
+        unit_where, unit_params = self._free_unit_filter(
+            free_status,
+            compute_id=compute_id,
+            cpu_count=cpu_count,
+            numa_local=numa_local,
+        )
+        return f"{server_where} AND {unit_where}", (*server_params, *unit_params)
 
-        # Prepare the WHERE clause
-        conditions = []
+    def _placeable_server_filter(
+        self,
+        region: str | None = None,
+        zone: str | None = None,
+    ) -> tuple[str, tuple]:
+        """Filter on servers `s` that may receive new compute unit claims."""
+        conditions = [
+            "s.status = 'READY'",
+            "s.health_status = 'HEALTHY'",
+        ]
         params = []
 
-        if compute_id is not None:
-            conditions.append("c.compute_id = %s")
-            params.append(compute_id)
-
-        if hostname is not None:
-            conditions.append("s.hostname = %s")
-            params.append(hostname)
+        if PLACEMENT_MAX_HEALTH_AGE_SECONDS > 0:
+            conditions.append(
+                "s.last_health_check_at > now() - %s * INTERVAL '1 second'"
+            )
+            params.append(PLACEMENT_MAX_HEALTH_AGE_SECONDS)
 
         if region is not None:
             conditions.append("s.region = %s")
@@ -761,43 +1251,172 @@ class PostgresRepo(CPKitRepo):
             conditions.append("s.zone = %s")
             params.append(zone)
 
+        return " AND ".join(conditions), tuple(params)
+
+    def _free_unit_filter(
+        self,
+        free_status: ComputeUnitStatus,
+        compute_id: str | None = None,
+        cpu_count: int | None = None,
+        numa_local: bool = False,
+    ) -> tuple[str, tuple]:
+        """Filter on compute units `c` that a claim may take."""
+        # The status is inlined rather than bound so the planner can match
+        # the partial placement index in ddl.sql for every execution,
+        # including generic plans of prepared statements.
+        conditions = [f"c.status = '{ComputeUnitStatus(free_status).value}'"]
+        params = []
+
+        if compute_id is not None:
+            conditions.append("c.compute_id = %s")
+            params.append(compute_id)
+
         if cpu_count is not None:
             conditions.append("c.cpu_count = %s")
             params.append(cpu_count)
 
-        if deployment_id is not None:
-            conditions.append("c.tags ->> 'deployment_id' = %s")
-            params.append(deployment_id)
-
-        if status is not None:
-            conditions.append("c.status = %s")
-            params.append(status)
-
-        sql = """
-            SELECT c.compute_id,
-                c.hostname,
-                c.ordinal,
-                c.cpu_range,
-                s.private_ip AS server_private_ip,
-                s.public_ip AS server_public_ip,
-                s.server_admin_user,
-                s.region,
-                s.zone,
-                c.cpu_set,
-                c.cpu_count,
-                c.status,
-                c.allocation_id AS allocation_id,
-                c.started_at,
-                c.tags 
-            FROM compute_units c JOIN servers s 
-              ON c.hostname = s.hostname """
-
-        if conditions:
-            sql += " WHERE " + " AND ".join(conditions)
-
-        sql += " ORDER BY c.hostname, c.ordinal"
-
-        if limit:
-            sql += f" LIMIT {limit}"
-
-        return fetch_all(sql, tuple(params), ComputeUnitOverview)
+        if numa_local:
+            conditions.append("c.numa_node_count = 1")
+
+        return " AND ".join(conditions), tuple(params)
+
+    def get_compute_units(
+        self,
+        compute_id: str | None = None,
+        hostname: str | None = None,
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        deployment_id: str | None = None,
+        status: str | None = None,
+        limit: int | None = None,
+        after: list | None = None,
+    ) -> list[ComputeUnitOverview]:
+        sql, params = compute_units_query(
+            compute_id,
+            hostname,
+            region,
+            zone,
+            cpu_count,
+            deployment_id,
+            status,
+            limit=limit,
+            after=after,
+        )
+        return fetch_all(sql, params, ComputeUnitOverview)
+
+    def get_capacity(
+        self,
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        runtime_profile: str | None = None,
+    ) -> list[CapacitySummary]:
+        """Aggregate compute unit counts from the capacity counters."""
+        sql, params = capacity_query(region, zone, cpu_count, runtime_profile)
+        return fetch_all(sql, params, CapacitySummary)
+
+    def insert_job_task_timings(
+        self,
+        job_id: int,
+        playbook: str,
+        timings: list[dict],
+        rollups: list[dict],
+    ) -> None:
+        """Store the task timings of one playbook run, in the order recorded,
+        and add them to the daily rollups, in one transaction."""
+        if not timings:
+            return
+        with self.pool.connection() as conn, conn.transaction():
+            conn.execute(
+                """
+                INSERT INTO job_task_timings (
+                    job_id, seq, playbook, phase, task, host, status, started_at,
+                    duration_ms
+                )
+                SELECT %s, v.seq, %s, v.phase, v.task, v.host, v.status,
+                    v.started_at, v.duration_ms
+                FROM unnest(
+                    %s::INT4[], %s::TEXT[], %s::TEXT[], %s::TEXT[], %s::TEXT[],
+                    %s::TIMESTAMPTZ[], %s::INT8[]
+                ) AS v(seq, phase, task, host, status, started_at, duration_ms)
+                ON CONFLICT (job_id, seq)
+                DO UPDATE SET
+                    playbook = EXCLUDED.playbook,
+                    phase = EXCLUDED.phase,
+                    task = EXCLUDED.task,
+                    host = EXCLUDED.host,
+                    status = EXCLUDED.status,
+                    started_at = EXCLUDED.started_at,
+                    duration_ms = EXCLUDED.duration_ms
+                """,
+                (
+                    job_id,
+                    playbook,
+                    list(range(1, len(timings) + 1)),
+                    [row["phase"] for row in timings],
+                    [row["task"] for row in timings],
+                    [row["host"] for row in timings],
+                    [row["status"] for row in timings],
+                    [row["started_at"] for row in timings],
+                    [row["duration_ms"] for row in timings],
+                ),
+            )
+            # Histograms are added bucket by bucket; every row has the same
+            # number of buckets.
+            with conn.cursor() as cur:
+                cur.executemany(
+                    """
+                    INSERT INTO task_timing_rollups (
+                        day, playbook, phase, task, host, runs, total_ms, max_ms,
+                        histogram
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s::INT8[])
+                    ON CONFLICT (day, playbook, phase, task, host)
+                    DO UPDATE SET
+                        runs = task_timing_rollups.runs + EXCLUDED.runs,
+                        total_ms = task_timing_rollups.total_ms + EXCLUDED.total_ms,
+                        max_ms = greatest(task_timing_rollups.max_ms, EXCLUDED.max_ms),
+                        histogram = ARRAY(
+                            SELECT a + b
+                            FROM unnest(
+                                task_timing_rollups.histogram, EXCLUDED.histogram
+                            ) WITH ORDINALITY AS h(a, b, i)
+                            ORDER BY i
+                        )
+                    """,
+                    [
+                        (
+                            rollup["day"],
+                            playbook,
+                            rollup["phase"],
+                            rollup["task"],
+                            rollup["host"],
+                            rollup["runs"],
+                            rollup["total_ms"],
+                            rollup["max_ms"],
+                            rollup["histogram"],
+                        )
+                        for rollup in rollups
+                    ],
+                )
+
+    def delete_job_task_timings(self, playbook: str, before: dt.datetime) -> None:
+        execute_stmt(
+            """
+            DELETE FROM job_task_timings
+            WHERE playbook = %s
+              AND started_at < %s
+            """,
+            (playbook, before),
+        )
+
+    def delete_task_timing_rollups(self, playbook: str, before: dt.date) -> None:
+        execute_stmt(
+            """
+            DELETE FROM task_timing_rollups
+            WHERE playbook = %s
+              AND day < %s
+            """,
+            (playbook, before),
+        )
@@ -0,0 +1,245 @@
+import datetime as dt
+from collections.abc import AsyncIterator
+from typing import Any, TypeVar
+
+from psycopg.rows import class_row, dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from ..models import (
+    AllocationInDB,
+    CapacitySummary,
+    ComputeUnitOverview,
+    ServerInDB,
+    TaskTimingSummary,
+)
+from .queries import (
+    allocations_query,
+    capacity_query,
+    compute_units_query,
+    ip_pool_addresses_query,
+    job_task_timings_query,
+    servers_query,
+    task_timing_summary_query,
+)
+
+T = TypeVar("T")
+
+# Rows fetched per round trip by streaming (server-side cursor) reads.
+STREAM_FETCH_SIZE = 1000
+
+
+class AsyncPostgresRepo:
+    """Inventory reads on an asyncio connection pool.
+
+    API handlers await these directly instead of holding the event loop while
+    a synchronous query runs. Writes stay on PostgresRepo, which owns the
+    transactional reservation logic and the cpkit audit/queue integration.
+    """
+
+    def __init__(self, pool: AsyncConnectionPool) -> None:
+        self.pool: AsyncConnectionPool = pool
+
+    async def get_servers(
+        self,
+        hostname: str | None = None,
+    ) -> list[ServerInDB]:
+        sql, params = servers_query(hostname)
+        return await self._fetch_all(sql, params, ServerInDB)
+
+    async def get_allocations(
+        self,
+        allocation_id: str | None = None,
+        login_user: str | None = None,
+        compute_id: str | None = None,
+        current_host: str | None = None,
+        ip_address: str | None = None,
+        status: str | None = None,
+        limit: int | None = None,
+        after: list | None = None,
+    ) -> list[AllocationInDB]:
+        sql, params = allocations_query(
+            allocation_id=allocation_id,
+            login_user=login_user,
+            compute_id=compute_id,
+            current_host=current_host,
+            ip_address=ip_address,
+            status=status,
+            limit=limit,
+            after=after,
+        )
+        return await self._fetch_all(sql, params, AllocationInDB)
+
+    async def get_allocation_rows(
+        self,
+        allocation_id: str | None = None,
+        login_user: str | None = None,
+        compute_id: str | None = None,
+        current_host: str | None = None,
+        ip_address: str | None = None,
+        status: str | None = None,
+        limit: int | None = None,
+        after: list | None = None,
+    ) -> list[dict[str, Any]]:
+        sql, params = allocations_query(
+            allocation_id=allocation_id,
+            login_user=login_user,
+            compute_id=compute_id,
+            current_host=current_host,
+            ip_address=ip_address,
+            status=status,
+            limit=limit,
+            after=after,
+        )
+        return await self._fetch_rows(sql, params)
+
+    def stream_allocations(
+        self,
+        allocation_id: str | None = None,
+        login_user: str | None = None,
+        compute_id: str | None = None,
+        current_host: str | None = None,
+        ip_address: str | None = None,
+        status: str | None = None,
+    ) -> AsyncIterator[AllocationInDB]:
+        sql, params = allocations_query(
+            allocation_id=allocation_id,
+            login_user=login_user,
+            compute_id=compute_id,
+            current_host=current_host,
+            ip_address=ip_address,
+            status=status,
+        )
+        return self._stream_rows(sql, params, AllocationInDB)
+
+    async def get_ip_pool_address_rows(
+        self,
+        ip_address: str | None = None,
+        status: str | None = None,
+        allocation_id: str | None = None,
+        current_host: str | None = None,
+        limit: int | None = None,
+        after: list | None = None,
+    ) -> list[dict[str, Any]]:
+        sql, params = ip_pool_addresses_query(
+            ip_address=ip_address,
+            status=status,
+            allocation_id=allocation_id,
+            current_host=current_host,
+            limit=limit,
+            after=after,
+        )
+        return await self._fetch_rows(sql, params)
+
+    async def get_compute_unit_rows(
+        self,
+        compute_id: str | None = None,
+        hostname: str | None = None,
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        deployment_id: str | None = None,
+        status: str | None = None,
+        limit: int | None = None,
+        after: list | None = None,
+    ) -> list[dict[str, Any]]:
+        sql, params = compute_units_query(
+            compute_id,
+            hostname,
+            region,
+            zone,
+            cpu_count,
+            deployment_id,
+            status,
+            limit=limit,
+            after=after,
+        )
+        return await self._fetch_rows(sql, params)
+
+    def stream_compute_units(
+        self,
+        compute_id: str | None = None,
+        hostname: str | None = None,
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        deployment_id: str | None = None,
+        status: str | None = None,
+    ) -> AsyncIterator[ComputeUnitOverview]:
+        sql, params = compute_units_query(
+            compute_id,
+            hostname,
+            region,
+            zone,
+            cpu_count,
+            deployment_id,
+            status,
+        )
+        return self._stream_rows(sql, params, ComputeUnitOverview)
+
+    async def get_capacity(
+        self,
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        runtime_profile: str | None = None,
+    ) -> list[CapacitySummary]:
+        sql, params = capacity_query(region, zone, cpu_count, runtime_profile)
+        return await self._fetch_all(sql, params, CapacitySummary)
+
+    async def get_job_task_timing_rows(self, job_id: int) -> list[dict[str, Any]]:
+        sql, params = job_task_timings_query(job_id)
+        return await self._fetch_rows(sql, params)
+
+    async def get_task_timing_summary(
+        self,
+        since: dt.datetime,
+        until: dt.datetime | None = None,
+        playbook: str | None = None,
+        host: str | None = None,
+        by_host: bool = False,
+        limit: int | None = None,
+    ) -> list[TaskTimingSummary]:
+        sql, params = task_timing_summary_query(
+            since, until, playbook, host, by_host, limit
+        )
+        return await self._fetch_all(sql, params, TaskTimingSummary)
+
+    async def _fetch_all(
+        self,
+        sql: str,
+        params: tuple,
+        model: type[T],
+    ) -> list[T]:
+        async with self.pool.connection() as conn:
+            cur = conn.cursor(row_factory=class_row(model))
+            await cur.execute(sql, params)
+            return await cur.fetchall()
+
+    async def _fetch_rows(self, sql: str, params: tuple) -> list[dict[str, Any]]:
+        # Plain dicts for list routes that encode rows straight to JSON. The
+        # queries select exactly the response model's fields, so validating
+        # each row into a model would only cost CPU.
+        async with self.pool.connection() as conn:
+            cur = conn.cursor(row_factory=dict_row)
+            await cur.execute(sql, params)
+            return await cur.fetchall()
+
+    async def _stream_rows(
+        self,
+        sql: str,
+        params: tuple,
+        model: type[T],
+    ) -> AsyncIterator[T]:
+        # Named cursors only live inside a transaction. Rows are pulled
+        # STREAM_FETCH_SIZE at a time, so memory stays flat however large the
+        # result is, and the connection returns to the pool once the consumer
+        # finishes or closes the generator.
+        async with self.pool.connection() as conn, conn.transaction():
+            async with conn.cursor(
+                name="kloigos_stream",
+                row_factory=class_row(model),
+            ) as cur:
+                cur.itersize = STREAM_FETCH_SIZE
+                await cur.execute(sql, params)
+                async for row in cur:
+                    yield row
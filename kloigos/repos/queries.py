@@ -0,0 +1,472 @@
+"""SQL for inventory reads, shared by the sync and async repositories."""
+
+import datetime as dt
+
+from ..models import (
+    ComputeUnitStatus,
+    InvalidCursorError,
+    ServerHealthStatus,
+    ServerStatus,
+)
+from ..task_timings import TASK_TIMING_BUCKETS_MS
+from ..util import is_ip_address
+
+
+def servers_query(
+    hostname: str | None = None,
+) -> tuple[str, tuple]:
+
+    # Prepare the WHERE clause
+    conditions = []
+    params = []
+
+    if hostname is not None:
+        conditions.append("hostname = %s")
+        params.append(hostname)
+
+    sql = "SELECT * FROM servers "
+
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+
+    return sql, tuple(params)
+
+
+def allocations_query(
+    allocation_id: str | None = None,
+    login_user: str | None = None,
+    compute_id: str | None = None,
+    current_host: str | None = None,
+    ip_address: str | None = None,
+    status: str | None = None,
+    limit: int | None = None,
+    after: list | None = None,
+) -> tuple[str, tuple]:
+    conditions = []
+    params = []
+
+    if allocation_id is not None:
+        conditions.append("a.allocation_id = %s")
+        params.append(allocation_id)
+
+    if login_user is not None:
+        conditions.append("a.login_user = %s")
+        params.append(login_user)
+
+    if compute_id is not None:
+        conditions.append("a.compute_id = %s")
+        params.append(compute_id)
+
+    if current_host is not None:
+        conditions.append("a.current_host = %s")
+        params.append(current_host)
+
+    if ip_address is not None:
+        conditions.append("a.ip_address = %s")
+        params.append(ip_address)
+
+    if status is not None:
+        conditions.append("a.status = %s")
+        params.append(status)
+
+    # Keyset pagination on (created_at DESC, allocation_id). The mixed sort
+    # direction rules out a row comparison; the leading `<=` gives the
+    # index scan its start point.
+    if after is not None:
+        conditions.append(
+            "a.created_at <= %s AND (a.created_at < %s OR a.allocation_id > %s)"
+        )
+        params.extend([after[0], after[0], after[1]])
+
+    # Columns follow AllocationInDB field order so the list route can encode
+    # rows straight to JSON without building models.
+    sql = """
+        SELECT
+            a.allocation_id,
+            a.login_user,
+            a.ip_address,
+            a.compute_id,
+            a.current_host,
+            a.status,
+            a.tags,
+            c.cpu_count,
+            c.cpu_range,
+            c.cpu_set,
+            CASE
+                WHEN s.mem_gb IS NOT NULL
+                     AND s.cpu_count IS NOT NULL
+                     AND s.cpu_count > 0
+                     AND c.cpu_count IS NOT NULL
+                THEN round(
+                    s.mem_gb::numeric * c.cpu_count::numeric / s.cpu_count::numeric,
+                    1
+                )
+                ELSE NULL
+            END::float AS memory_gb,
+            s.disk_size_gb,
+            s.region,
+            s.zone,
+            s.runtime_profile,
+            a.created_at,
+            a.updated_at
+        FROM allocations a
+        LEFT JOIN compute_units c
+          ON a.compute_id = c.compute_id
+        LEFT JOIN servers s
+          ON c.hostname = s.hostname
+    """
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY a.created_at DESC, a.allocation_id"
+
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    return sql, tuple(params)
+
+
+def ip_pool_addresses_query(
+    ip_address: str | None = None,
+    status: str | None = None,
+    allocation_id: str | None = None,
+    current_host: str | None = None,
+    limit: int | None = None,
+    after: list | None = None,
+) -> tuple[str, tuple]:
+    conditions = []
+    params = []
+
+    # ip_address is INET: a value that is not an address would fail the cast
+    # in the database, so it matches nothing instead. This is the one place
+    # that checks the filter and cursor addresses; callers pass them through.
+    if ip_address is not None:
+        if is_ip_address(ip_address):
+            conditions.append("ip_address = %s::INET")
+            params.append(ip_address)
+        else:
+            conditions.append("FALSE")
+
+    if status is not None:
+        conditions.append("status = %s")
+        params.append(status)
+
+    if allocation_id is not None:
+        conditions.append("allocation_id = %s")
+        params.append(allocation_id)
+
+    if current_host is not None:
+        conditions.append("current_host = %s")
+        params.append(current_host)
+
+    if after is not None:
+        if not isinstance(after[0], str) or not is_ip_address(after[0]):
+            raise InvalidCursorError("cursor is malformed")
+        conditions.append("ip_pool.ip_address > %s::INET")
+        params.append(after[0])
+
+    sql = """
+        SELECT
+            host(ip_address) AS ip_address,
+            status,
+            allocation_id,
+            current_host,
+            created_at,
+            updated_at
+        FROM ip_pool
+    """
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY ip_pool.ip_address"
+
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    return sql, tuple(params)
+
+
+def compute_units_query(
+    compute_id: str | None = None,
+    hostname: str | None = None,
+    region: str | None = None,
+    zone: str | None = None,
+    cpu_count: int | None = None,
+    deployment_id: str | None = None,
+    status: str | None = None,
+    limit: int | None = None,
+    after: list | None = None,
+) -> tuple[str, tuple]:
+
+    # Prepare the WHERE clause
+    conditions = []
+    params = []
+
+    if compute_id is not None:
+        conditions.append("c.compute_id = %s")
+        params.append(compute_id)
+
+    if hostname is not None:
+        conditions.append("s.hostname = %s")
+        params.append(hostname)
+
+    if region is not None:
+        conditions.append("s.region = %s")
+        params.append(region)
+
+    if zone is not None:
+        conditions.append("s.zone = %s")
+        params.append(zone)
+
+    if cpu_count is not None:
+        conditions.append("c.cpu_count = %s")
+        params.append(cpu_count)
+
+    if deployment_id is not None:
+        conditions.append("c.tags ->> 'deployment_id' = %s")
+        params.append(deployment_id)
+
+    if status is not None:
+        conditions.append("c.status = %s")
+        params.append(status)
+
+    if after is not None:
+        conditions.append("(c.hostname, c.ordinal) > (%s, %s)")
+        params.extend(after)
+
+    # Columns follow ComputeUnitOverview field order so the list route can
+    # encode rows straight to JSON without building models.
+    sql = """
+        SELECT c.compute_id,
+            c.hostname,
+            c.ordinal,
+            c.cpu_range,
+            c.cpu_count,
+            c.cpu_set,
+            c.status,
+            c.allocation_id AS allocation_id,
+            c.started_at,
+            c.tags,
+            c.numa_node_count,
+            s.private_ip AS server_private_ip,
+            s.public_ip AS server_public_ip,
+            s.server_admin_user,
+            s.region,
+            s.zone,
+            c.numa_node_count = 1 AS numa_local
+        FROM compute_units c JOIN servers s 
+          ON c.hostname = s.hostname """
+
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+
+    sql += " ORDER BY c.hostname, c.ordinal"
+
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    return sql, tuple(params)
+
+
+def capacity_query(
+    region: str | None = None,
+    zone: str | None = None,
+    cpu_count: int | None = None,
+    runtime_profile: str | None = None,
+) -> tuple[str, tuple]:
+    # Reads the per-host counters compute unit writes maintain, so the
+    # cost scales with servers x sizes x statuses rather than compute units.
+    conditions = ["cc.units > 0"]
+    params = []
+
+    if region is not None:
+        conditions.append("s.region = %s")
+        params.append(region)
+
+    if zone is not None:
+        conditions.append("s.zone = %s")
+        params.append(zone)
+
+    if cpu_count is not None:
+        conditions.append("cc.cpu_count = %s")
+        params.append(cpu_count)
+
+    if runtime_profile is not None:
+        conditions.append("s.runtime_profile = %s")
+        params.append(runtime_profile)
+
+    free = f"'{ComputeUnitStatus.FREE.value}'"
+    allocated = ", ".join(
+        f"'{status.value}'"
+        for status in (
+            ComputeUnitStatus.ALLOCATING,
+            ComputeUnitStatus.ALLOCATED,
+            ComputeUnitStatus.DEALLOCATING,
+        )
+    )
+    failed = ", ".join(
+        f"'{status.value}'"
+        for status in (
+            ComputeUnitStatus.ALLOCATION_FAIL,
+            ComputeUnitStatus.DEALLOCATION_FAIL,
+        )
+    )
+    placeable = (
+        f"s.status = '{ServerStatus.READY.value}' "
+        f"AND s.health_status = '{ServerHealthStatus.HEALTHY.value}'"
+    )
+
+    sql = f"""
+        SELECT s.region,
+            s.zone,
+            cc.cpu_count,
+            s.runtime_profile,
+            sum(CASE WHEN cc.status = {free} THEN cc.units ELSE 0 END) AS free,
+            sum(CASE WHEN cc.status = {free} AND {placeable}
+                THEN cc.units ELSE 0 END) AS placeable_free,
+            sum(CASE WHEN cc.status IN ({allocated})
+                THEN cc.units ELSE 0 END) AS allocated,
+            sum(CASE WHEN cc.status IN ({failed})
+                THEN cc.units ELSE 0 END) AS failed,
+            sum(CASE WHEN cc.status = '{ComputeUnitStatus.UNAVAILABLE.value}'
+                THEN cc.units ELSE 0 END) AS unavailable
+        FROM capacity_counters cc JOIN servers s
+          ON cc.hostname = s.hostname
+        WHERE {" AND ".join(conditions)}
+        GROUP BY s.region, s.zone, cc.cpu_count, s.runtime_profile
+        ORDER BY s.region, s.zone, cc.cpu_count, s.runtime_profile"""
+
+    return sql, tuple(params)
+
+
+def job_task_timings_query(job_id: int) -> tuple[str, tuple]:
+    sql = """
+        SELECT
+            seq,
+            playbook,
+            phase,
+            task,
+            host,
+            status,
+            started_at,
+            duration_ms
+        FROM job_task_timings
+        WHERE job_id = %s
+        ORDER BY seq
+    """
+    return sql, (job_id,)
+
+
+def _utc_date(value: dt.datetime) -> dt.date:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt.UTC)
+    return value.astimezone(dt.UTC).date()
+
+
+def task_timing_summary_query(
+    since: dt.datetime,
+    until: dt.datetime | None = None,
+    playbook: str | None = None,
+    host: str | None = None,
+    by_host: bool = False,
+    limit: int | None = None,
+) -> tuple[str, tuple]:
+    # Rollups are daily, so the window covers every UTC day it touches.
+    conditions = ["day >= %s"]
+    params: list = [list(TASK_TIMING_BUCKETS_MS), _utc_date(since)]
+
+    if until is not None:
+        conditions.append("day <= %s")
+        params.append(_utc_date(until))
+
+    if playbook is not None:
+        conditions.append("playbook = %s")
+        params.append(playbook)
+
+    if host is not None:
+        conditions.append("host = %s")
+        params.append(host)
+
+    # Without by_host every host folds into '' so the CTEs can join on the
+    # key; it is returned as NULL.
+    key = "playbook, phase, task, host"
+    sql = f"""
+        WITH bounds AS (
+            SELECT %s::INT8[] AS ms
+        ),
+        rollups AS (
+            SELECT
+                playbook,
+                phase,
+                task,
+                {"host" if by_host else "''::TEXT AS host"},
+                runs,
+                total_ms,
+                max_ms,
+                histogram
+            FROM task_timing_rollups
+            WHERE {" AND ".join(conditions)}
+        ),
+        totals AS (
+            SELECT {key},
+                sum(runs) AS runs,
+                sum(total_ms) AS total_ms,
+                max(max_ms) AS max_ms
+            FROM rollups
+            GROUP BY {key}
+        ),
+        buckets AS (
+            SELECT r.playbook, r.phase, r.task, r.host, b.i, sum(b.n) AS n
+            FROM rollups r, unnest(r.histogram) WITH ORDINALITY AS b(n, i)
+            GROUP BY r.playbook, r.phase, r.task, r.host, b.i
+        ),
+        cumulative AS (
+            SELECT
+                bk.playbook, bk.phase, bk.task, bk.host, bk.n,
+                sum(bk.n) OVER (
+                    PARTITION BY bk.playbook, bk.phase, bk.task, bk.host
+                    ORDER BY bk.i
+                ) AS through,
+                t.runs,
+                coalesce(bounds.ms[bk.i - 1], 0) AS low_ms,
+                least(coalesce(bounds.ms[bk.i], t.max_ms), t.max_ms) AS high_ms
+            FROM buckets bk
+            JOIN totals t USING (playbook, phase, task, host)
+            CROSS JOIN bounds
+        ),
+        percentiles AS (
+            -- Linear interpolation inside the bucket holding the percentile.
+            SELECT {key},
+                min(low_ms + (high_ms - low_ms)
+                    * (0.5 * runs - (through - n)) / n)
+                    FILTER (WHERE through >= 0.5 * runs AND through - n < 0.5 * runs)
+                    AS p50_ms,
+                min(low_ms + (high_ms - low_ms)
+                    * (0.95 * runs - (through - n)) / n)
+                    FILTER (WHERE through >= 0.95 * runs AND through - n < 0.95 * runs)
+                    AS p95_ms
+            FROM cumulative
+            WHERE n > 0
+            GROUP BY {key}
+        )
+        SELECT
+            t.playbook,
+            t.phase,
+            t.task,
+            nullif(t.host, '') AS host,
+            t.runs,
+            greatest(p.p50_ms, 0)::FLOAT8 AS p50_ms,
+            greatest(p.p95_ms, 0)::FLOAT8 AS p95_ms,
+            t.max_ms,
+            t.total_ms
+        FROM totals t
+        JOIN percentiles p USING (playbook, phase, task, host)
+        ORDER BY t.total_ms DESC, t.playbook, t.phase, t.task, t.host
+    """
+
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    return sql, tuple(params)
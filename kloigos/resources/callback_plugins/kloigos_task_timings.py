@@ -0,0 +1,79 @@
+"""Ansible callback that records per-task, per-host durations for Kloigos jobs."""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+DOCUMENTATION = """
+    name: kloigos_task_timings
+    type: aggregate
+    short_description: Record task durations for Kloigos jobs
+    description:
+      - Appends one JSON line per task result (phase, task, host,
+        inventory_host, status, started_at, duration_ms) to the file named by
+        the kloigos_task_timings_path extra var. Skipped tasks are not
+        recorded.
+      - host is the server's public_hostname host var when the inventory host
+        has one (Kloigos names compute unit hosts by compute_id), otherwise
+        the inventory name.
+      - Does nothing when the extra var is not set.
+    requirements:
+      - enable in ANSIBLE_CALLBACKS_ENABLED
+"""
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "aggregate"
+    CALLBACK_NAME = "kloigos_task_timings"
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super().__init__()
+        self._path = None
+        self._phase = ""
+        # (task uuid, host) -> (wall clock start, monotonic start)
+        self._started = {}
+
+    def v2_playbook_on_play_start(self, play):
+        self._phase = play.get_name().strip()
+        if self._path is None:
+            extra_vars = play.get_variable_manager().extra_vars
+            self._path = extra_vars.get("kloigos_task_timings_path")
+
+    def v2_runner_on_start(self, host, task):
+        self._started[(task._uuid, host.get_name())] = (time.time(), time.monotonic())
+
+    def _record(self, result, status):
+        started = self._started.pop((result._task._uuid, result._host.get_name()), None)
+        if self._path is None or started is None or status is None:
+            return
+        wall, monotonic = started
+        inventory_host = result._host.get_name()
+        row = {
+            "phase": self._phase,
+            "task": result._task.get_name().strip(),
+            "host": result._host.get_vars().get("public_hostname") or inventory_host,
+            "inventory_host": inventory_host,
+            "status": status,
+            "started_at": dt.datetime.fromtimestamp(wall, dt.timezone.utc).isoformat(),
+            "duration_ms": round((time.monotonic() - monotonic) * 1000),
+        }
+        with open(self._path, "a") as timings_file:
+            timings_file.write(json.dumps(row) + "\n")
+
+    def v2_runner_on_ok(self, result):
+        self._record(result, "ok")
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record(result, "ignored" if ignore_errors else "failed")
+
+    def v2_runner_on_unreachable(self, result):
+        self._record(result, "unreachable")
+
+    def v2_runner_on_skipped(self, result):
+        self._record(result, None)
@@ -16,10 +16,15 @@ CREATE TABLE IF NOT EXISTS servers (
     last_health_check_at TIMESTAMPTZ NULL,
     last_health_error TEXT NULL,
     last_healthy_at TIMESTAMPTZ NULL,
+    cpu_topology JSONB NULL,
     tags JSONB NULL,
     CONSTRAINT pk_servers PRIMARY KEY (hostname)
 );
 
+-- CPU/NUMA topology recorded by SERVER_INIT; NULL for servers initialized
+-- before it was recorded, whose allocation playbooks probe the host instead.
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS cpu_topology JSONB NULL;
+
 CREATE TABLE IF NOT EXISTS alerts (
     alert_id BIGSERIAL NOT NULL,
     alert_type TEXT NOT NULL,
@@ -50,13 +55,31 @@ CREATE TABLE IF NOT EXISTS compute_units (
     allocation_id TEXT NULL,
     started_at TIMESTAMPTZ NULL,
     tags JSONB NULL,
+    numa_node_count INT2 NULL,
     CONSTRAINT pk_compute_units PRIMARY KEY (compute_id),
     CONSTRAINT uq_compute_units_hostname_ordinal UNIQUE (hostname, ordinal),
     CONSTRAINT hostname_in_servers FOREIGN KEY (hostname) REFERENCES servers(hostname) ON UPDATE CASCADE ON DELETE CASCADE
 );
 
+-- NUMA nodes the compute unit's cpu_set spans, from the topology SERVER_INIT
+-- records; NULL when the server has none.
+ALTER TABLE compute_units ADD COLUMN IF NOT EXISTS numa_node_count INT2 NULL;
+
+-- Placement: lock_compute_unit ranks READY, HEALTHY servers by the placement
+-- strategy's load (capacity_counters, kloigos/placement.py), then takes a FREE
+-- compute unit on the few best hosts, ordered by NUMA locality and ordinal.
+-- This partial index only holds placeable rows and leads with hostname, so the
+-- unit lookup reads a handful of rows per candidate host, whatever the fleet size.
+CREATE INDEX IF NOT EXISTS ix_compute_units_free_host_numa
+ON compute_units (hostname, numa_node_count, ordinal)
+WHERE status = 'FREE';
+
+CREATE INDEX IF NOT EXISTS ix_servers_placeable
+ON servers (region, zone, hostname)
+WHERE status = 'READY' AND health_status = 'HEALTHY';
+
 CREATE TABLE IF NOT EXISTS ip_pool (
-    ip_address TEXT NOT NULL,
+    ip_address INET NOT NULL,
     status TEXT NOT NULL,
     allocation_id TEXT NULL,
     current_host TEXT NULL,
@@ -66,6 +89,13 @@ CREATE TABLE IF NOT EXISTS ip_pool (
     CONSTRAINT current_host_in_servers FOREIGN KEY (current_host) REFERENCES servers(hostname) ON UPDATE CASCADE ON DELETE SET NULL
 );
 
+-- Pools created before ip_address was INET stored it as TEXT; convert them
+-- once with migrations/ip_pool_inet.sql.
+
+CREATE INDEX IF NOT EXISTS ix_ip_pool_free
+ON ip_pool (ip_address)
+WHERE status = 'FREE';
+
 CREATE TABLE IF NOT EXISTS allocations (
     allocation_id TEXT NOT NULL,
     login_user TEXT NOT NULL,
@@ -93,6 +123,10 @@ CREATE UNIQUE INDEX IF NOT EXISTS uq_allocations_allocated_ip_address
 ON allocations (ip_address)
 WHERE status = 'ALLOCATED';
 
+-- Matches the /allocations list order so keyset pages are index range scans.
+CREATE INDEX IF NOT EXISTS ix_allocations_created_at
+ON allocations (created_at DESC, allocation_id);
+
 ALTER TABLE compute_units DROP CONSTRAINT IF EXISTS compute_unit_allocation;
 
 ALTER TABLE compute_units
@@ -102,3 +136,81 @@ ALTER TABLE ip_pool DROP CONSTRAINT IF EXISTS ip_pool_allocation;
 
 ALTER TABLE ip_pool
 ADD CONSTRAINT ip_pool_allocation FOREIGN KEY (allocation_id) REFERENCES allocations(allocation_id) ON UPDATE CASCADE ON DELETE SET NULL;
+
+-- Capacity counters: compute units per (hostname, cpu_count, status). Every
+-- repository statement that inserts, deletes or changes the status of compute
+-- units applies its deltas here in the same statement, so the counters move
+-- in the same transaction as the units. /capacity aggregates these per
+-- region/zone instead of scanning compute_units. Counting per host keeps
+-- concurrent claims on different servers off a shared hot row, and lets
+-- server status/health and placement attributes be joined in at read time.
+CREATE TABLE IF NOT EXISTS capacity_counters (
+    hostname TEXT NOT NULL,
+    cpu_count INT2 NOT NULL,
+    status TEXT NOT NULL,
+    units INT8 NOT NULL DEFAULT 0,
+    CONSTRAINT pk_capacity_counters PRIMARY KEY (hostname, cpu_count, status),
+    CONSTRAINT capacity_counters_server FOREIGN KEY (hostname) REFERENCES servers(hostname) ON UPDATE CASCADE ON DELETE CASCADE
+);
+
+-- Backfill, and repair any drift (e.g. from compute_units edited by hand), on
+-- every init. Counters written concurrently can be overwritten, so run init
+-- while Kloigos is stopped.
+INSERT INTO capacity_counters (hostname, cpu_count, status, units)
+SELECT hostname, cpu_count, status, count(*)
+FROM compute_units
+GROUP BY hostname, cpu_count, status
+ON CONFLICT (hostname, cpu_count, status)
+DO UPDATE SET units = excluded.units;
+
+UPDATE capacity_counters AS cc
+SET units = 0
+WHERE units <> 0
+  AND NOT EXISTS (
+      SELECT 1
+      FROM compute_units AS c
+      WHERE c.hostname = cc.hostname
+        AND c.cpu_count = cc.cpu_count
+        AND c.status = cc.status
+  );
+
+-- Per-task playbook timings: one row per (task, host) result recorded by the
+-- kloigos_task_timings Ansible callback during a job. phase is the play name,
+-- so a job's phases are its plays in run order (seq). host is the server
+-- hostname (the inventory host's public_hostname), or the inventory name for
+-- tasks that run on the controller.
+CREATE TABLE IF NOT EXISTS job_task_timings (
+    job_id INT8 NOT NULL,
+    seq INT4 NOT NULL,
+    playbook TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    task TEXT NOT NULL,
+    host TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TIMESTAMPTZ NOT NULL,
+    duration_ms INT8 NOT NULL,
+    CONSTRAINT pk_job_task_timings PRIMARY KEY (job_id, seq)
+);
+
+CREATE INDEX IF NOT EXISTS ix_job_task_timings_playbook_started_at
+ON job_task_timings (playbook, started_at);
+
+-- Daily rollup of job_task_timings per playbook, play, task and server, for
+-- the fleet-wide timing report. histogram counts runs per duration bucket
+-- (TASK_TIMING_BUCKETS_MS in kloigos/task_timings.py, plus an overflow bucket),
+-- so percentiles over any range of days come from a few rows per task.
+CREATE TABLE IF NOT EXISTS task_timing_rollups (
+    day DATE NOT NULL,
+    playbook TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    task TEXT NOT NULL,
+    host TEXT NOT NULL,
+    runs INT8 NOT NULL,
+    total_ms INT8 NOT NULL,
+    max_ms INT8 NOT NULL,
+    histogram INT8[] NOT NULL,
+    CONSTRAINT pk_task_timing_rollups PRIMARY KEY (day, playbook, phase, task, host)
+);
+
+CREATE INDEX IF NOT EXISTS ix_task_timing_rollups_playbook_day
+ON task_timing_rollups (playbook, day);
@@ -0,0 +1,14 @@
+-- One-off migration for PostgreSQL databases initialized while
+-- capacity_counters was maintained by a trigger on compute_units.
+--
+-- The repository now applies the counter deltas itself, so the trigger would
+-- count every change twice. Run this once, before `kloigos init` (which then
+-- repairs the counters), on databases where
+--
+--   SELECT tgname FROM pg_trigger
+--   WHERE tgname = 'trg_compute_units_capacity';
+--
+-- returns a row. CockroachDB databases never had the trigger.
+
+DROP TRIGGER IF EXISTS trg_compute_units_capacity ON compute_units;
+DROP FUNCTION IF EXISTS capacity_counters_apply();
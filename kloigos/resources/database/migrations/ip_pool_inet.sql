@@ -0,0 +1,17 @@
+-- One-off migration for IP pools created before ip_pool.ip_address was INET.
+--
+-- Those pools stored addresses as TEXT, which sorts lexically; the current
+-- queries compare the column against INET values. Run this once, before
+-- `kloigos init`, on databases where
+--
+--   SELECT data_type FROM information_schema.columns
+--   WHERE table_name = 'ip_pool' AND column_name = 'ip_address';
+--
+-- still returns `text`. It rewrites ip_pool under an ACCESS EXCLUSIVE lock.
+--
+-- CockroachDB only supports this column type change as an experimental
+-- feature; enable it for the session first:
+--
+--   SET enable_experimental_alter_column_type_general = true;
+
+ALTER TABLE ip_pool ALTER COLUMN ip_address TYPE INET USING ip_address::INET;
@@ -0,0 +1,71 @@
+-- One-off migration for databases that recorded playbook task timings before
+-- the daily rollups existed.
+--
+-- Older runs stored the inventory name in job_task_timings.host, which is the
+-- compute_id for allocation playbooks; this maps those rows to the server
+-- hostname, then builds task_timing_rollups from the raw rows still kept.
+-- Run it once, after `kloigos init` has created task_timing_rollups and
+-- before Kloigos records new timings; it does nothing if rollups exist. The
+-- bucket bounds must match TASK_TIMING_BUCKETS_MS in kloigos/task_timings.py.
+
+UPDATE job_task_timings AS t
+SET host = cu.hostname
+FROM compute_units AS cu
+WHERE t.host = cu.compute_id;
+
+INSERT INTO task_timing_rollups (
+    day, playbook, phase, task, host, runs, total_ms, max_ms, histogram
+)
+WITH timings AS (
+    SELECT
+        (started_at AT TIME ZONE 'UTC')::DATE AS day,
+        playbook,
+        phase,
+        task,
+        host,
+        duration_ms,
+        (
+            SELECT count(*)
+            FROM unnest(ARRAY[
+                10, 15, 20, 30, 50, 70,
+                100, 150, 200, 300, 500, 700,
+                1000, 1500, 2000, 3000, 5000, 7000,
+                10000, 15000, 20000, 30000, 50000, 70000,
+                100000, 150000, 200000, 300000, 500000, 700000,
+                1000000, 1500000, 2000000, 3000000, 5000000
+            ]::INT8[]) AS bound
+            WHERE bound < duration_ms
+        ) AS bucket
+    FROM job_task_timings
+),
+bucket_counts AS (
+    SELECT k.day, k.playbook, k.phase, k.task, k.host, b.bucket,
+        count(t.duration_ms) AS runs
+    FROM (SELECT DISTINCT day, playbook, phase, task, host FROM timings) AS k
+    CROSS JOIN generate_series(0, 35) AS b(bucket)
+    LEFT JOIN timings AS t
+        ON t.day = k.day
+        AND t.playbook = k.playbook
+        AND t.phase = k.phase
+        AND t.task = k.task
+        AND t.host = k.host
+        AND t.bucket = b.bucket
+    GROUP BY k.day, k.playbook, k.phase, k.task, k.host, b.bucket
+)
+SELECT
+    g.day, g.playbook, g.phase, g.task, g.host,
+    g.runs, g.total_ms, g.max_ms, h.histogram
+FROM (
+    SELECT day, playbook, phase, task, host,
+        count(*) AS runs, sum(duration_ms) AS total_ms, max(duration_ms) AS max_ms
+    FROM timings
+    GROUP BY day, playbook, phase, task, host
+) AS g
+JOIN (
+    SELECT day, playbook, phase, task, host,
+        array_agg(runs ORDER BY bucket) AS histogram
+    FROM bucket_counts
+    GROUP BY day, playbook, phase, task, host
+) AS h
+    USING (day, playbook, phase, task, host)
+WHERE NOT EXISTS (SELECT 1 FROM task_timing_rollups);
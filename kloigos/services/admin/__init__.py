@@ -1,5 +1,6 @@
-from .ip_pool import IpPoolAdminService
-from .servers import ServersAdminService
+from .ip_pool import AsyncIpPoolAdminService, IpPoolAdminService
+from .playbook_timings import AsyncPlaybookTimingsAdminService
+from .servers import AsyncServersAdminService, ServersAdminService
 
 
 class AdminService(
@@ -7,3 +8,11 @@ class AdminService(
     ServersAdminService,
 ):
     pass
+
+
+class AsyncAdminService(
+    AsyncIpPoolAdminService,
+    AsyncPlaybookTimingsAdminService,
+    AsyncServersAdminService,
+):
+    pass
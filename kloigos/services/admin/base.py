@@ -1,6 +1,12 @@
-from ...repos import Repo
+from ...repos import AsyncRepo, Repo
 
 
 class AdminServiceBase:
     def __init__(self, repo: Repo):
         self.repo = repo
+
+
+class AsyncAdminServiceBase:
+    def __init__(self, repo: Repo, async_repo: AsyncRepo):
+        self.repo = repo
+        self.async_repo = async_repo
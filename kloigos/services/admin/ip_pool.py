@@ -1,69 +1,61 @@
+from typing import Any
+
 from cpkit.audit import log_event
+from fastapi.concurrency import run_in_threadpool
 
 from ...models import (
     ComputeUnitOperationError,
     Event,
+    InvalidCursorError,
     IpAddressStatus,
-    IpPoolAddressInDB,
     IpPoolInsertRequest,
+    IpPoolInsertResponse,
 )
-from .base import AdminServiceBase
+from ...util import decode_cursor, paginate
+from .base import AdminServiceBase, AsyncAdminServiceBase
 
 
 def _model_details(model) -> dict:
     return model.model_dump(mode="json")
 
 
-class IpPoolAdminService(AdminServiceBase):
-    def list_ip_pool_addresses(
-        self,
-        ip_address: str | None = None,
-        status: str | None = None,
-        allocation_id: str | None = None,
-        current_host: str | None = None,
-    ) -> list[IpPoolAddressInDB]:
-        return self.repo.get_ip_pool_addresses(
-            ip_address=ip_address,
-            status=status,
-            allocation_id=allocation_id,
-            current_host=current_host,
-        )
+def _ip_pool_after(cursor: str | None) -> list | None:
+    try:
+        return decode_cursor(cursor, str) if cursor else None
+    except ValueError as exc:
+        raise InvalidCursorError(str(exc)) from exc
+
 
+class IpPoolAdminService(AdminServiceBase):
     def insert_ip_pool_addresses(
         self,
         actor_id: str,
         req: IpPoolInsertRequest,
-    ) -> list[IpPoolAddressInDB]:
+    ) -> IpPoolInsertResponse:
         # Floating IPs are durable allocation resources, so admins manage them
-        # independently from server/CU initialization.
-        requested = set()
-        for ip_address in req.ip_addresses:
-            if ip_address in requested:
-                raise ComputeUnitOperationError(
-                    f"IP address {ip_address} is duplicated in the request."
-                )
-            requested.add(ip_address)
-
-            existing = self.repo.get_ip_pool_addresses(ip_address=ip_address)
-            if existing:
-                raise ComputeUnitOperationError(
-                    f"IP address {ip_address} already exists in the pool."
-                )
-
-        for ip_address in req.ip_addresses:
-            self.repo.insert_ip_pool_address(
-                ip_address=ip_address,
-                status=IpAddressStatus.FREE,
-            )
+        # independently from server/CU initialization. Addresses already in
+        # the pool are reported back as conflicts rather than failing the
+        # whole batch.
+        requested = req.expand()
+        inserted = self.repo.insert_ip_pool_addresses(
+            requested,
+            status=IpAddressStatus.FREE,
+        )
+        inserted_addresses = {address.ip_address for address in inserted}
+        conflicts = [ip for ip in requested if ip not in inserted_addresses]
 
         log_event(
             self.repo,
             actor_id,
             Event.IP_POOL_INSERT,
-            _model_details(req),
+            {
+                **_model_details(req),
+                "inserted_count": len(inserted),
+                "conflict_count": len(conflicts),
+            },
         )
 
-        return self.repo.get_ip_pool_addresses()
+        return IpPoolInsertResponse(inserted=inserted, conflicts=conflicts)
 
     def delete_ip_pool_address(
         self,
@@ -93,3 +85,46 @@ class IpPoolAdminService(AdminServiceBase):
                 _model_details(existing),
             )
         return deleted
+
+
+class AsyncIpPoolAdminService(AsyncAdminServiceBase):
+    async def list_ip_pool_addresses(
+        self,
+        ip_address: str | None = None,
+        status: str | None = None,
+        allocation_id: str | None = None,
+        current_host: str | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        rows = await self.async_repo.get_ip_pool_address_rows(
+            ip_address=ip_address,
+            status=status,
+            allocation_id=allocation_id,
+            current_host=current_host,
+            limit=limit + 1 if limit else None,
+            after=_ip_pool_after(cursor),
+        )
+        return paginate(rows, limit, lambda row: [row["ip_address"]])
+
+    async def insert_ip_pool_addresses(
+        self,
+        actor_id: str,
+        req: IpPoolInsertRequest,
+    ) -> IpPoolInsertResponse:
+        return await run_in_threadpool(
+            IpPoolAdminService(self.repo).insert_ip_pool_addresses,
+            actor_id,
+            req,
+        )
+
+    async def delete_ip_pool_address(
+        self,
+        actor_id: str,
+        ip_address: str,
+    ) -> bool:
+        return await run_in_threadpool(
+            IpPoolAdminService(self.repo).delete_ip_pool_address,
+            actor_id,
+            ip_address,
+        )
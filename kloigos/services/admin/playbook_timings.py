@@ -0,0 +1,59 @@
+import datetime as dt
+import os
+
+from ...models import (
+    JobPhaseTiming,
+    JobTaskTiming,
+    JobTimings,
+    TaskTimingSummary,
+)
+from ...task_timings import phase_timings
+from .base import AsyncAdminServiceBase
+
+# Window the task timing report covers when the caller gives no `since`.
+TASK_TIMINGS_REPORT_DEFAULT_HOURS = int(
+    os.getenv("KLOIGOS_TASK_TIMINGS_REPORT_DEFAULT_HOURS", "168")
+)
+
+
+class AsyncPlaybookTimingsAdminService(AsyncAdminServiceBase):
+    async def get_job_timings(self, job_id: int) -> JobTimings | None:
+        rows = await self.async_repo.get_job_task_timing_rows(job_id)
+        if not rows:
+            return None
+
+        phases = phase_timings(rows)
+        started_at = min(phase["started_at"] for phase in phases)
+        ended_at = max(
+            phase["started_at"] + dt.timedelta(milliseconds=phase["duration_ms"])
+            for phase in phases
+        )
+        return JobTimings(
+            job_id=job_id,
+            playbook=rows[0]["playbook"],
+            duration_ms=round((ended_at - started_at).total_seconds() * 1000),
+            phases=[JobPhaseTiming(**phase) for phase in phases],
+            tasks=[JobTaskTiming(**row) for row in rows],
+        )
+
+    async def list_task_timing_summary(
+        self,
+        since: dt.datetime | None = None,
+        until: dt.datetime | None = None,
+        playbook: str | None = None,
+        host: str | None = None,
+        by_host: bool = False,
+        limit: int | None = None,
+    ) -> list[TaskTimingSummary]:
+        if since is None:
+            since = (until or dt.datetime.now(dt.UTC)) - dt.timedelta(
+                hours=TASK_TIMINGS_REPORT_DEFAULT_HOURS
+            )
+        return await self.async_repo.get_task_timing_summary(
+            since=since,
+            until=until,
+            playbook=playbook,
+            host=host,
+            by_host=by_host,
+            limit=limit,
+        )
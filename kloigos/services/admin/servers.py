@@ -1,5 +1,6 @@
 from cpkit.audit import log_event
 from cpkit.jobs.types import JobID
+from fastapi.concurrency import run_in_threadpool
 
 from ...models import (
     AllocationStatus,
@@ -12,7 +13,7 @@ from ...models import (
     ServerStateError,
     ServerStatus,
 )
-from .base import AdminServiceBase
+from .base import AdminServiceBase, AsyncAdminServiceBase
 
 
 def _model_details(model) -> dict:
@@ -98,3 +99,36 @@ class ServersAdminService(AdminServiceBase):
         )
 
         self.repo.delete_server(hostname)
+
+
+class AsyncServersAdminService(AsyncAdminServiceBase):
+    async def init_server(self, actor_id: str, sir: ServerInitRequest) -> JobID:
+        return await run_in_threadpool(
+            ServersAdminService(self.repo).init_server,
+            actor_id,
+            sir,
+        )
+
+    async def list_servers(
+        self,
+        hostname: str | None = None,
+    ) -> list[ServerInDB]:
+        return await self.async_repo.get_servers(hostname)
+
+    async def decommission_server(
+        self,
+        actor_id: str,
+        sdr: ServerDecommRequest,
+    ) -> JobID:
+        return await run_in_threadpool(
+            ServersAdminService(self.repo).decommission_server,
+            actor_id,
+            sdr,
+        )
+
+    async def delete_server(self, actor_id: str, hostname: str) -> None:
+        await run_in_threadpool(
+            ServersAdminService(self.repo).delete_server,
+            actor_id,
+            hostname,
+        )
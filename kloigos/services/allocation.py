@@ -1,10 +1,18 @@
+import datetime as dt
 import logging
 import re
+from collections.abc import AsyncIterator, Callable
+from typing import Any
 
 from cpkit.audit import log_event
 from cpkit.jobs.types import JobID
+from fastapi.concurrency import run_in_threadpool
 
 from kloigos.models import (
+    AllocationBatchCreateCommand,
+    AllocationBatchCreateRequest,
+    AllocationBatchCreateResponse,
+    AllocationBatchItem,
     AllocationCreateCommand,
     AllocationCreateRequest,
     AllocationCreateResponse,
@@ -19,14 +27,15 @@ from kloigos.models import (
     ComputeUnitStateError,
     ComputeUnitStatus,
     Event,
+    InvalidCursorError,
     IpAddressStatus,
-    IpPoolAddressInDB,
     NoFreeComputeUnitError,
     NoFreeIpAddressError,
     QueueCommand,
 )
 
-from ..repos import Repo
+from ..repos import AsyncRepo, Repo
+from ..util import decode_cursor, paginate
 
 
 def _model_details(model) -> dict:
@@ -102,114 +111,88 @@ def _validate_login_user(login_user: str) -> None:
         raise ComputeUnitOperationError(f"login_user '{login_user}' is reserved.")
 
 
+def _validated_allocation_identity(
+    req: AllocationCreateRequest,
+    cu: ComputeUnitOverview,
+) -> tuple[str, str]:
+    allocation_id, login_user = _request_allocation_identity(req, cu)
+    _validate_login_user(login_user)
+    return allocation_id, login_user
+
+
+def _allocation_identity_for(
+    req: AllocationCreateRequest,
+) -> Callable[[ComputeUnitOverview], tuple[str, str]]:
+    return lambda cu: _validated_allocation_identity(req, cu)
+
+
+def _allocations_after(cursor: str | None) -> list | None:
+    try:
+        return decode_cursor(cursor, dt.datetime, str) if cursor else None
+    except ValueError as exc:
+        raise InvalidCursorError(str(exc)) from exc
+
+
+def _allocation_not_found(allocation_id: str) -> ComputeUnitNotFoundError:
+    return ComputeUnitNotFoundError(f"Allocation '{allocation_id}' does not exist.")
+
+
 class AllocationService:
     """Coordinate durable allocation operations and cpkit job scheduling."""
 
     def __init__(self, repo: Repo):
         self.repo = repo
 
-    def list_allocations(
-        self,
-        *,
-        allocation_id: str | None = None,
-        login_user: str | None = None,
-        compute_id: str | None = None,
-        current_host: str | None = None,
-        ip_address: str | None = None,
-        status: str | None = None,
-    ) -> list[AllocationInDB]:
-        """Return allocations filtered by durable identity, placement, IP, or status."""
-        return self.repo.get_allocations(
-            allocation_id=allocation_id,
-            login_user=login_user,
-            compute_id=compute_id,
-            current_host=current_host,
-            ip_address=ip_address,
-            status=status,
-        )
-
-    def get_allocation(self, allocation_id: str) -> AllocationInDB:
-        """Return one allocation by durable allocation id."""
-        return self._get_allocation(allocation_id)
-
     def allocate(
         self,
         actor_id: str,
         req: AllocationCreateRequest,
     ) -> AllocationCreateResponse:
         """Reserve capacity, create allocation metadata, and queue preparation."""
-        cu: ComputeUnitOverview = self.repo.lock_compute_unit(
-            compute_id=None,
-            region=req.region,
-            zone=req.zone,
-            cpu_count=req.cpu_count,
-            free_status=ComputeUnitStatus.FREE,
-            allocated_status=ComputeUnitStatus.ALLOCATING,
-        )
-        if not cu:
-            raise NoFreeComputeUnitError()
-
-        allocation: AllocationInDB | None = None
-        allocation_inserted = False
-        ip_address: IpPoolAddressInDB | None = None
         try:
-            allocation_id, login_user = _request_allocation_identity(req, cu)
-            if self.repo.get_allocations(allocation_id=allocation_id):
-                raise ComputeUnitOperationError(
-                    f"allocation_id '{allocation_id}' already exists."
-                )
-            _validate_login_user(login_user)
-            login_user_matches = self.repo.get_allocations(login_user=login_user)
-            if any(
-                match.status != AllocationStatus.DEALLOCATED
-                for match in login_user_matches
-            ):
-                raise ComputeUnitOperationError(
-                    f"login_user '{login_user}' is already in use."
-                )
-
-            ip_address = self.repo.lock_ip_pool_address(
-                free_status=IpAddressStatus.FREE,
-                reserved_status=IpAddressStatus.RESERVED,
-                ip_address=None,
-            )
-            if not ip_address:
-                self.repo.update_compute_unit(
-                    cu.compute_id,
-                    status=ComputeUnitStatus.FREE,
-                    clear_allocation_id=True,
-                    tags={},
-                )
-                raise NoFreeIpAddressError()
-
-            allocation = AllocationInDB(
-                allocation_id=allocation_id,
-                login_user=login_user,
-                ip_address=ip_address.ip_address,
-                compute_id=cu.compute_id,
-                current_host=cu.hostname,
-                status=AllocationStatus.ALLOCATING,
+            allocation, cu = self.repo.reserve_allocation(
+                identity=_allocation_identity_for(req),
+                region=req.region,
+                zone=req.zone,
+                cpu_count=req.cpu_count,
+                numa_local=req.numa_local,
+                placement_strategy=req.placement_strategy,
                 tags=req.tags,
             )
+        except (
+            NoFreeComputeUnitError,
+            NoFreeIpAddressError,
+            ComputeUnitOperationError,
+        ):
+            raise
+        except Exception as exc:
             log_event(
                 self.repo,
                 actor_id,
-                Event.ALLOCATION_CREATE_REQUEST,
-                _allocation_request_audit_details(allocation, cu),
-            )
-            self.repo.insert_allocation(allocation)
-            allocation_inserted = True
-            self.repo.update_ip_pool_address(
-                ip_address.ip_address,
-                status=IpAddressStatus.RESERVED,
-                allocation_id=allocation.allocation_id,
-                current_host=cu.hostname,
-            )
-            self.repo.update_compute_unit(
-                cu.compute_id,
-                allocation_id=allocation.allocation_id,
-                tags=req.tags or {},
+                Event.ALLOCATION_CREATE_FAILED,
+                {
+                    "allocation_id": req.allocation_id,
+                    "login_user": req.login_user,
+                    "cpu_count": req.cpu_count,
+                    "region": req.region,
+                    "zone": req.zone,
+                    "numa_local": req.numa_local,
+                    "placement_strategy": req.placement_strategy,
+                    "tags": req.tags or {},
+                    "error": "Failed to persist allocation metadata before scheduling the allocation job.",
+                },
             )
+            raise ComputeUnitOperationError(
+                "Unable to prepare compute unit allocation."
+            ) from exc
+
+        log_event(
+            self.repo,
+            actor_id,
+            Event.ALLOCATION_CREATE_REQUEST,
+            _allocation_request_audit_details(allocation, cu),
+        )
+        try:
             job: JobID = self.repo.enqueue_command(
                 QueueCommand.ALLOCATION_CREATE,
                 AllocationCreateCommand(
@@ -219,40 +202,9 @@ class AllocationService:
                 ),
                 actor_id,
             )
-        except NoFreeIpAddressError:
-            raise
-        except ComputeUnitOperationError:
-            try:
-                if ip_address:
-                    self.repo.release_ip_pool_address(ip_address.ip_address)
-                self.repo.update_compute_unit(
-                    cu.compute_id,
-                    status=ComputeUnitStatus.FREE,
-                    clear_allocation_id=True,
-                    tags={},
-                )
-            except Exception:
-                logging.exception(
-                    "Failed to release compute unit %s after allocation validation failed",
-                    cu.compute_id,
-                )
-            raise
         except Exception as exc:
             try:
-                if allocation and allocation_inserted:
-                    self.repo.clear_allocation_placement(
-                        allocation.allocation_id,
-                        status=AllocationStatus.ALLOCATION_FAIL,
-                    )
-                    self.repo.release_ip_pool_address(allocation.ip_address)
-                elif ip_address:
-                    self.repo.release_ip_pool_address(ip_address.ip_address)
-                self.repo.update_compute_unit(
-                    cu.compute_id,
-                    status=ComputeUnitStatus.FREE,
-                    clear_allocation_id=True,
-                    tags={},
-                )
+                self.repo.release_allocation_reservation(allocation)
             except Exception:
                 logging.exception(
                     "Failed to release compute unit %s after allocation preparation failed",
@@ -264,20 +216,8 @@ class AllocationService:
                 actor_id,
                 Event.ALLOCATION_CREATE_FAILED,
                 {
-                    "allocation_id": (
-                        allocation.allocation_id if allocation else req.allocation_id
-                    ),
-                    "login_user": (
-                        allocation.login_user if allocation else req.login_user
-                    ),
-                    "ip_address": ip_address.ip_address if ip_address else None,
-                    "compute_id": cu.compute_id,
-                    "hostname": cu.hostname,
-                    "cpu_count": cu.cpu_count,
-                    "region": cu.region,
-                    "zone": cu.zone,
-                    "tags": req.tags or {},
-                    "error": "Failed to persist allocation metadata before scheduling the allocation job.",
+                    **_allocation_request_audit_details(allocation, cu),
+                    "error": "Failed to schedule the allocation job.",
                 },
             )
             raise ComputeUnitOperationError(
@@ -289,6 +229,141 @@ class AllocationService:
             job_id=job.job_id,
         )
 
+    def allocate_batch(
+        self,
+        actor_id: str,
+        req: AllocationBatchCreateRequest,
+    ) -> AllocationBatchCreateResponse:
+        """Reserve every requested allocation atomically and queue one
+        preparation job per target host.
+
+        If a job cannot be queued, the reservations on that host and on the
+        hosts not queued yet are discarded, so they can be retried. Hosts
+        whose jobs were already queued keep their allocations; the error
+        names them.
+        """
+        try:
+            reserved = self.repo.reserve_allocations(
+                [
+                    {
+                        "identity": _allocation_identity_for(item),
+                        "region": item.region,
+                        "zone": item.zone,
+                        "cpu_count": item.cpu_count,
+                        "numa_local": item.numa_local,
+                        "placement_strategy": item.placement_strategy,
+                        "tags": item.tags,
+                    }
+                    for item in req.allocations
+                ]
+            )
+        except (
+            NoFreeComputeUnitError,
+            NoFreeIpAddressError,
+            ComputeUnitOperationError,
+        ):
+            raise
+        except Exception as exc:
+            log_event(
+                self.repo,
+                actor_id,
+                Event.ALLOCATION_CREATE_FAILED,
+                {
+                    "batch_size": len(req.allocations),
+                    "error": "Failed to persist allocation metadata before scheduling the allocation jobs.",
+                },
+            )
+            raise ComputeUnitOperationError(
+                "Unable to prepare compute unit allocations."
+            ) from exc
+
+        by_host: dict[str, list[tuple[AllocationInDB, ComputeUnitOverview, str]]] = {}
+        for (allocation, cu), item in zip(reserved, req.allocations):
+            log_event(
+                self.repo,
+                actor_id,
+                Event.ALLOCATION_CREATE_REQUEST,
+                {
+                    **_allocation_request_audit_details(allocation, cu),
+                    "batch_size": len(req.allocations),
+                },
+            )
+            by_host.setdefault(cu.hostname, []).append(
+                (allocation, cu, item.ssh_public_key)
+            )
+
+        job_ids: dict[str, int] = {}
+        for hostname, placements in by_host.items():
+            try:
+                job: JobID = self.repo.enqueue_command(
+                    QueueCommand.ALLOCATION_CREATE_BATCH,
+                    AllocationBatchCreateCommand(
+                        allocations=[
+                            AllocationCreateCommand(
+                                allocation_id=allocation.allocation_id,
+                                compute_id=cu.compute_id,
+                                ssh_public_key=ssh_public_key,
+                                reserved_at=allocation.created_at,
+                            )
+                            for allocation, cu, ssh_public_key in placements
+                        ]
+                    ),
+                    actor_id,
+                )
+            except Exception as exc:
+                # Jobs already queued own their allocations, so only the hosts
+                # without a job are discarded.
+                unqueued = [
+                    (allocation, cu)
+                    for allocation, cu in reserved
+                    if cu.hostname not in job_ids
+                ]
+                try:
+                    self.repo.discard_allocation_reservations(
+                        [allocation for allocation, _ in unqueued]
+                    )
+                except Exception:
+                    logging.exception(
+                        "Failed to release compute units after batch allocation preparation failed"
+                    )
+                for allocation, cu in unqueued:
+                    log_event(
+                        self.repo,
+                        actor_id,
+                        Event.ALLOCATION_CREATE_FAILED,
+                        {
+                            **_allocation_request_audit_details(allocation, cu),
+                            "error": "Failed to schedule the allocation jobs.",
+                        },
+                    )
+                queued = [
+                    f"{allocation.allocation_id} (job {job_ids[cu.hostname]})"
+                    for allocation, cu in reserved
+                    if cu.hostname in job_ids
+                ]
+                message = (
+                    f"Unable to prepare {len(unqueued)} of {len(reserved)} "
+                    "compute unit allocations; their reservations were discarded."
+                )
+                if queued:
+                    message += " Already queued: " + ", ".join(queued) + "."
+                raise ComputeUnitOperationError(message) from exc
+
+            job_ids[hostname] = job.job_id
+
+        return AllocationBatchCreateResponse(
+            allocations=[
+                AllocationBatchItem(
+                    allocation_id=allocation.allocation_id,
+                    compute_id=cu.compute_id,
+                    hostname=cu.hostname,
+                    ip_address=allocation.ip_address,
+                    job_id=job_ids[cu.hostname],
+                )
+                for allocation, cu in reserved
+            ]
+        )
+
     def deallocate(
         self,
         actor_id: str,
@@ -406,9 +481,7 @@ class AllocationService:
     def _get_allocation(self, allocation_id: str) -> AllocationInDB:
         matches = self.repo.get_allocations(allocation_id=allocation_id)
         if not matches:
-            raise ComputeUnitNotFoundError(
-                f"Allocation '{allocation_id}' does not exist."
-            )
+            raise _allocation_not_found(allocation_id)
         return matches[0]
 
     def _get_active_compute_unit(
@@ -425,3 +498,97 @@ class AllocationService:
                 f"Compute unit '{allocation.compute_id}' does not exist."
             )
         return matches[0]
+
+
+class AsyncAllocationService:
+    """Serve allocation reads without blocking the event loop.
+
+    Reads go through the async repo. Writes delegate to AllocationService in a
+    worker thread, since reservation, audit, and job enqueueing are synchronous.
+    """
+
+    def __init__(self, repo: Repo, async_repo: AsyncRepo):
+        self.async_repo = async_repo
+        self.sync = AllocationService(repo)
+
+    async def list_allocations(
+        self,
+        *,
+        allocation_id: str | None = None,
+        login_user: str | None = None,
+        compute_id: str | None = None,
+        current_host: str | None = None,
+        ip_address: str | None = None,
+        status: str | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        """Return one page of allocation rows, newest first, and the next-page cursor.
+
+        Rows are plain dicts shaped like AllocationInDB, for direct JSON encoding.
+        """
+        rows = await self.async_repo.get_allocation_rows(
+            allocation_id=allocation_id,
+            login_user=login_user,
+            compute_id=compute_id,
+            current_host=current_host,
+            ip_address=ip_address,
+            status=status,
+            limit=limit + 1 if limit else None,
+            after=_allocations_after(cursor),
+        )
+        return paginate(
+            rows, limit, lambda row: [row["created_at"], row["allocation_id"]]
+        )
+
+    def stream_allocations(
+        self,
+        *,
+        allocation_id: str | None = None,
+        login_user: str | None = None,
+        compute_id: str | None = None,
+        current_host: str | None = None,
+        ip_address: str | None = None,
+        status: str | None = None,
+    ) -> AsyncIterator[AllocationInDB]:
+        """Yield every matching allocation without loading the full list."""
+        return self.async_repo.stream_allocations(
+            allocation_id=allocation_id,
+            login_user=login_user,
+            compute_id=compute_id,
+            current_host=current_host,
+            ip_address=ip_address,
+            status=status,
+        )
+
+    async def get_allocation(self, allocation_id: str) -> AllocationInDB:
+        """Return one allocation by durable allocation id."""
+        matches = await self.async_repo.get_allocations(allocation_id=allocation_id)
+        if not matches:
+            raise _allocation_not_found(allocation_id)
+        return matches[0]
+
+    async def allocate(
+        self,
+        actor_id: str,
+        req: AllocationCreateRequest,
+    ) -> AllocationCreateResponse:
+        return await run_in_threadpool(self.sync.allocate, actor_id, req)
+
+    async def allocate_batch(
+        self,
+        actor_id: str,
+        req: AllocationBatchCreateRequest,
+    ) -> AllocationBatchCreateResponse:
+        return await run_in_threadpool(self.sync.allocate_batch, actor_id, req)
+
+    async def deallocate(self, actor_id: str, allocation_id: str) -> JobID:
+        return await run_in_threadpool(self.sync.deallocate, actor_id, allocation_id)
+
+    async def scale(
+        self,
+        actor_id: str,
+        allocation_id: str,
+        req: AllocationScaleRequest,
+    ) -> JobID:
+        return await run_in_threadpool(self.sync.scale, actor_id, allocation_id, req)
@@ -1,6 +1,17 @@
-from kloigos.models import ComputeUnitOverview
+from collections.abc import AsyncIterator
+from typing import Any
 
-from ..repos import Repo
+from kloigos.models import CapacitySummary, ComputeUnitOverview, InvalidCursorError
+
+from ..repos import AsyncRepo, Repo
+from ..util import decode_cursor, paginate
+
+
+def _compute_units_after(cursor: str | None) -> list | None:
+    try:
+        return decode_cursor(cursor, str, int) if cursor else None
+    except ValueError as exc:
+        raise InvalidCursorError(str(exc)) from exc
 
 
 class ComputeUnitService:
@@ -9,7 +20,24 @@ class ComputeUnitService:
     def __init__(self, repo: Repo):
         self.repo = repo
 
-    def list_compute_units(
+    def get_capacity(
+        self,
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        runtime_profile: str | None = None,
+    ) -> list[CapacitySummary]:
+        """Return compute unit counts by location, size and runtime profile."""
+        return self.repo.get_capacity(region, zone, cpu_count, runtime_profile)
+
+
+class AsyncComputeUnitService:
+    """Serve compute-unit inventory queries on the async repo."""
+
+    def __init__(self, async_repo: AsyncRepo):
+        self.async_repo = async_repo
+
+    async def list_compute_units(
         self,
         compute_id: str | None = None,
         hostname: str | None = None,
@@ -18,9 +46,15 @@ class ComputeUnitService:
         cpu_count: int | None = None,
         deployment_id: str | None = None,
         status: str | None = None,
-    ) -> list[ComputeUnitOverview]:
-        """Return compute units filtered by the provided query parameters."""
-        return self.repo.get_compute_units(
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        """Return one page of compute unit rows and the cursor for the next page.
+
+        Rows are plain dicts shaped like ComputeUnitOverview, for direct JSON
+        encoding.
+        """
+        rows = await self.async_repo.get_compute_unit_rows(
             compute_id,
             hostname,
             region,
@@ -28,4 +62,40 @@ class ComputeUnitService:
             cpu_count,
             deployment_id,
             status,
+            limit=limit + 1 if limit else None,
+            after=_compute_units_after(cursor),
+        )
+        return paginate(rows, limit, lambda row: [row["hostname"], row["ordinal"]])
+
+    def stream_compute_units(
+        self,
+        compute_id: str | None = None,
+        hostname: str | None = None,
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        deployment_id: str | None = None,
+        status: str | None = None,
+    ) -> AsyncIterator[ComputeUnitOverview]:
+        """Yield every matching compute unit without loading the full list."""
+        return self.async_repo.stream_compute_units(
+            compute_id,
+            hostname,
+            region,
+            zone,
+            cpu_count,
+            deployment_id,
+            status,
+        )
+
+    async def get_capacity(
+        self,
+        region: str | None = None,
+        zone: str | None = None,
+        cpu_count: int | None = None,
+        runtime_profile: str | None = None,
+    ) -> list[CapacitySummary]:
+        """Return compute unit counts by location, size and runtime profile."""
+        return await self.async_repo.get_capacity(
+            region, zone, cpu_count, runtime_profile
         )
@@ -0,0 +1,87 @@
+"""Shared, multiplexed SSH connections to managed servers.
+
+Health probes and playbook runs reach the same servers over and over. They
+all use one OpenSSH ControlMaster socket per (local user, host, port, remote
+user), kept open for KLOIGOS_SSH_CONTROL_PERSIST_SECONDS after its last use,
+so repeat connections skip the TCP and key exchange handshakes.
+"""
+
+import logging
+import os
+import shlex
+import subprocess
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SSH_CONTROL_DIR = Path(
+    os.getenv("KLOIGOS_SSH_CONTROL_DIR", "~/.kloigos/ssh")
+).expanduser()
+SSH_CONTROL_PERSIST_SECONDS = int(
+    os.getenv("KLOIGOS_SSH_CONTROL_PERSIST_SECONDS", "300")
+)
+# A master whose peer vanished is torn down after roughly this long, instead
+# of leaving every multiplexed session on it hanging.
+SSH_SERVER_ALIVE_INTERVAL_SECONDS = 10
+SSH_SERVER_ALIVE_COUNT_MAX = 3
+
+
+def target_host(public_ip: str | None, private_ip: str) -> str:
+    """Return the address Kloigos connects to a server on.
+
+    Health probes and playbooks (as `ansible_host`) must both use it: the
+    control socket is keyed on the remote host, so different addresses for
+    the same server would open separate masters.
+    """
+    return public_ip or private_ip
+
+
+def control_options() -> list[str]:
+    """Return ssh `-o` arguments that share a ControlMaster socket per target."""
+    SSH_CONTROL_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+    return [
+        "-o",
+        "ControlMaster=auto",
+        "-o",
+        # %C hashes local host, remote host, port and user, which keeps the
+        # socket path short enough for AF_UNIX.
+        f"ControlPath={SSH_CONTROL_DIR}/%C",
+        "-o",
+        f"ControlPersist={SSH_CONTROL_PERSIST_SECONDS}s",
+        "-o",
+        f"ServerAliveInterval={SSH_SERVER_ALIVE_INTERVAL_SECONDS}",
+        "-o",
+        f"ServerAliveCountMax={SSH_SERVER_ALIVE_COUNT_MAX}",
+    ]
+
+
+def playbook_vars() -> dict[str, str]:
+    """Return extra vars that put Ansible on the shared control sockets.
+
+    `ansible_ssh_args` replaces Ansible's default `-C -o ControlMaster=auto
+    -o ControlPersist=60s`; since it carries its own ControlPath, Ansible uses
+    it as-is. `kloigos_ssh_control_opts` is for playbooks that shell out to
+    ssh/rsync from the controller.
+    """
+    options = shlex.join(control_options())
+    return {
+        "ansible_ssh_args": f"-C {options}",
+        "kloigos_ssh_control_opts": options,
+    }
+
+
+def close_master(target: str) -> None:
+    """Ask the control master for `target` (user@host) to exit, if one is up.
+
+    Used after a failed probe, so a wedged connection is not reused, and
+    when a server leaves the fleet.
+    """
+    try:
+        subprocess.run(
+            ["ssh", *control_options(), "-O", "exit", target],
+            capture_output=True,
+            check=False,
+            timeout=5,
+        )
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        logger.warning("Unable to close SSH control master for %s: %s", target, exc)
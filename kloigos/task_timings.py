@@ -0,0 +1,198 @@
+"""Per-task playbook timings for remote jobs.
+
+The kloigos_task_timings Ansible callback (resources/callback_plugins) appends
+one JSON line per (task, host) result to the file named by the
+`kloigos_task_timings_path` extra var. Workers hand each playbook run a fresh
+file, then store its rows in job_task_timings so a job's seconds can be broken
+down by play (phase), task and host. Each run is also folded into
+task_timing_rollups, one row per UTC day, playbook, phase, task and host, which
+the fleet-wide report reads instead of raw rows.
+"""
+
+import bisect
+import datetime as dt
+import json
+import logging
+import os
+import tempfile
+from importlib.resources import files
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+CALLBACK_NAME = "kloigos_task_timings"
+CALLBACK_DIR = Path(str(files("kloigos").joinpath("resources/callback_plugins")))
+# Timings older than this are pruned, per playbook, as new runs are stored;
+# 0 keeps them forever.
+TASK_TIMINGS_RETENTION_DAYS = int(
+    os.getenv("KLOIGOS_TASK_TIMINGS_RETENTION_DAYS", "30")
+)
+# Daily rollups older than this are pruned the same way; 0 keeps them forever.
+TASK_TIMING_ROLLUP_RETENTION_DAYS = int(
+    os.getenv("KLOIGOS_TASK_TIMING_ROLLUP_RETENTION_DAYS", "400")
+)
+# Upper bounds (inclusive) of the rollup histogram buckets; a last bucket holds
+# longer durations. Percentiles are interpolated within a bucket.
+TASK_TIMING_BUCKETS_MS = (
+    10, 15, 20, 30, 50, 70,
+    100, 150, 200, 300, 500, 700,
+    1_000, 1_500, 2_000, 3_000, 5_000, 7_000,
+    10_000, 15_000, 20_000, 30_000, 50_000, 70_000,
+    100_000, 150_000, 200_000, 300_000, 500_000, 700_000,
+    1_000_000, 1_500_000, 2_000_000, 3_000_000, 5_000_000,
+)  # fmt: skip
+
+
+def _enable_callback() -> None:
+    # ansible-runner starts ansible-playbook with a copy of os.environ, so the
+    # callback is picked up without touching the runner's own settings.
+    for name, value in (
+        ("ANSIBLE_CALLBACK_PLUGINS", str(CALLBACK_DIR)),
+        ("ANSIBLE_CALLBACKS_ENABLED", CALLBACK_NAME),
+    ):
+        current = [item for item in os.getenv(name, "").split(",") if item]
+        if value not in current:
+            os.environ[name] = ",".join([value, *current])
+
+
+def phase_timings(rows: list[dict]) -> list[dict]:
+    """Group task rows by phase, in run order, with each phase's wall time."""
+    phases: dict[str, dict] = {}
+    for row in rows:
+        ended_at = row["started_at"] + dt.timedelta(milliseconds=row["duration_ms"])
+        phase = phases.get(row["phase"])
+        if phase is None:
+            phases[row["phase"]] = {
+                "phase": row["phase"],
+                "started_at": row["started_at"],
+                "ended_at": ended_at,
+                "task_count": 1,
+            }
+            continue
+        phase["started_at"] = min(phase["started_at"], row["started_at"])
+        phase["ended_at"] = max(phase["ended_at"], ended_at)
+        phase["task_count"] += 1
+
+    return [
+        {
+            "phase": phase["phase"],
+            "started_at": phase["started_at"],
+            "duration_ms": round(
+                (phase["ended_at"] - phase["started_at"]).total_seconds() * 1000
+            ),
+            "task_count": phase["task_count"],
+        }
+        for phase in phases.values()
+    ]
+
+
+def timing_rollups(rows: list[dict]) -> list[dict]:
+    """Fold task rows into one rollup per (UTC day, phase, task, host)."""
+    rollups: dict[tuple, dict] = {}
+    for row in rows:
+        key = (
+            row["started_at"].astimezone(dt.UTC).date(),
+            row["phase"],
+            row["task"],
+            row["host"],
+        )
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollup = rollups[key] = {
+                "day": key[0],
+                "phase": key[1],
+                "task": key[2],
+                "host": key[3],
+                "runs": 0,
+                "total_ms": 0,
+                "max_ms": 0,
+                "histogram": [0] * (len(TASK_TIMING_BUCKETS_MS) + 1),
+            }
+        duration_ms = row["duration_ms"]
+        rollup["runs"] += 1
+        rollup["total_ms"] += duration_ms
+        rollup["max_ms"] = max(rollup["max_ms"], duration_ms)
+        bucket = bisect.bisect_left(TASK_TIMING_BUCKETS_MS, duration_ms)
+        rollup["histogram"][bucket] += 1
+    return list(rollups.values())
+
+
+class TaskTimings:
+    """Collects the task timings of one playbook run of a job."""
+
+    def __init__(self, repo, job_id: int, playbook: str) -> None:
+        self.repo = repo
+        self.job_id = job_id
+        self.playbook = playbook
+        fd, path = tempfile.mkstemp(
+            prefix=f"kloigos-timings-{job_id}-", suffix=".jsonl"
+        )
+        os.close(fd)
+        self.path = Path(path)
+        self.rows: list[dict] = []
+
+    def playbook_vars(self) -> dict[str, str]:
+        """Return extra vars that turn on the timings callback for this run."""
+        _enable_callback()
+        return {"kloigos_task_timings_path": str(self.path)}
+
+    def record(self) -> dict[str, float]:
+        """Store the run's task timings and return seconds per phase.
+
+        Timings are diagnostics: a missing file or a failed insert is logged
+        and never fails the job.
+        """
+        rows = []
+        try:
+            with self.path.open() as timings_file:
+                for line in timings_file:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    row["started_at"] = dt.datetime.fromisoformat(row["started_at"])
+                    rows.append(row)
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning(
+                "Unable to read task timings for job %s: %s", self.job_id, exc
+            )
+        finally:
+            self.path.unlink(missing_ok=True)
+
+        self.rows = rows
+        if not rows:
+            return {}
+
+        try:
+            self.repo.insert_job_task_timings(
+                self.job_id, self.playbook, rows, timing_rollups(rows)
+            )
+            now = dt.datetime.now(dt.UTC)
+            if TASK_TIMINGS_RETENTION_DAYS > 0:
+                self.repo.delete_job_task_timings(
+                    self.playbook,
+                    before=now - dt.timedelta(days=TASK_TIMINGS_RETENTION_DAYS),
+                )
+            if TASK_TIMING_ROLLUP_RETENTION_DAYS > 0:
+                self.repo.delete_task_timing_rollups(
+                    self.playbook,
+                    before=(
+                        now - dt.timedelta(days=TASK_TIMING_ROLLUP_RETENTION_DAYS)
+                    ).date(),
+                )
+        except Exception:
+            logger.exception("Unable to store task timings for job %s", self.job_id)
+
+        return {
+            phase["phase"]: round(phase["duration_ms"] / 1000, 3)
+            for phase in phase_timings(rows)
+        }
+
+    def host_succeeded(self, host: str) -> bool:
+        """Whether inventory `host` ran tasks in the recorded run and none of
+        them failed or was unreachable. Call after record()."""
+        statuses = {
+            row["status"]
+            for row in self.rows
+            if row.get("inventory_host", row["host"]) == host
+        }
+        return bool(statuses) and not statuses & {"failed", "unreachable"}
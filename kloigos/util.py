@@ -1,3 +1,13 @@
+import base64
+import binascii
+import datetime as dt
+import ipaddress
+import json
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
 def to_cpu_set(cpu_range: str) -> str:
     """
     Returns the CPU set represented by cpu_range.
@@ -33,3 +43,114 @@ def parse_cpu_range(cpu_range: str) -> tuple[int, int, int]:
         raise ValueError(f"Invalid cpu_range (end < start): {cpu_range}")
 
     return start, end, step
+
+
+def parse_cpu_topology(
+    lscpu_lines: list[str],
+    mem_total_kb: int | None = None,
+) -> dict[str, Any]:
+    """
+    Returns the host topology recorded at server init.
+
+    lscpu_lines is `lscpu -p=CPU,CORE,SOCKET,NODE` output. Hosts without NUMA
+    report an empty node, which is recorded as node 0. CPUs sharing a core are
+    SMT siblings.
+    """
+    cpus: dict[str, dict[str, int]] = {}
+    for line in lscpu_lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        cpu, core, socket, node = (line.split(",") + ["", "", ""])[:4]
+        cpus[str(int(cpu))] = {
+            "core": int(core or cpu),
+            "socket": int(socket or 0),
+            "node": int(node or 0),
+        }
+    if not cpus:
+        raise ValueError("lscpu output lists no CPUs")
+
+    cores = {(cpu["socket"], cpu["core"]) for cpu in cpus.values()}
+    return {
+        "cpus": cpus,
+        "sockets": len({cpu["socket"] for cpu in cpus.values()}),
+        "cores": len(cores),
+        "threads_per_core": len(cpus) // len(cores),
+        "numa_node_count": len({cpu["node"] for cpu in cpus.values()}),
+        "mem_total_kb": mem_total_kb,
+    }
+
+
+def cpu_set_numa_nodes(topology: dict[str, Any] | None, cpu_set: str) -> list[int]:
+    """Returns the NUMA nodes cpu_set runs on, or [] when unknown."""
+    if not topology:
+        return []
+    cpus = topology.get("cpus") or {}
+    nodes = set()
+    for cpu in cpu_set.split(","):
+        if cpu.strip() not in cpus:
+            return []
+        nodes.add(cpus[cpu.strip()]["node"])
+    return sorted(nodes)
+
+
+def is_ip_address(value: str) -> bool:
+    """Whether value is a single IPv4 or IPv6 address."""
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
+
+
+def encode_cursor(values: list[Any]) -> str:
+    """
+    Returns an opaque pagination cursor for the sort key of the last row.
+
+    Datetimes are stored as ISO 8601 strings; everything else must be JSON
+    serializable.
+    """
+    payload = [v.isoformat() if isinstance(v, dt.datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> list[Any]:
+    """
+    Decode a cursor produced by encode_cursor, checking it holds one value of
+    each of the given types. Raises ValueError for anything else.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("cursor is malformed") from exc
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("cursor is malformed")
+
+    decoded = []
+    for value, expected in zip(values, types):
+        if expected is dt.datetime and isinstance(value, str):
+            value = dt.datetime.fromisoformat(value)
+        # bool is an int subclass; never accept it as a sort key.
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise ValueError("cursor is malformed")
+        decoded.append(value)
+    return decoded
+
+
+def paginate(
+    rows: list[T],
+    limit: int | None,
+    sort_key: Callable[[T], list[Any]],
+) -> tuple[list[T], str | None]:
+    """
+    Trim rows fetched with LIMIT limit + 1 to one page.
+
+    Returns the page and the cursor for the next one, or None on the last page.
+    """
+    if not limit or len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(sort_key(page[-1]))
@@ -95,6 +95,7 @@ window.cpkitWebappExtension = {
     serversAutoRefreshEnabled: true,
     _serversAutoTimer: null,
     computeUnits: [],
+    capacity: [],
     computeVisibleRows: [],
     computeFilterQuery: "",
     computeLastUpdatedUtc: null,
@@ -145,6 +146,8 @@ window.cpkitWebappExtension = {
         login_user: "",
         cpu_count: "",
         location: "",
+        placement_strategy: "",
+        numa_local: false,
         tagPairs: [{ key: "", value: "" }],
         ssh_public_key: "",
       },
@@ -155,6 +158,10 @@ window.cpkitWebappExtension = {
         current_cpu_count: null,
         cpu_count: null,
         location: "",
+        placement_strategy: "",
+        numa_local: false,
+        transfer_mode: "DIRECT",
+        iterative_precopy: false,
       },
       deallocateConfirm: { open: false, allocation_id: "", compute_id: "" },
       computeDetails: { open: false, row: null },
@@ -256,6 +263,24 @@ window.cpkitWebappExtension = {
     },
 
     async apiFetch(path, options = {}) {
+      return (await this.apiFetchResponse(path, options)).data;
+    },
+
+    // Follows X-Next-Cursor so each request stays bounded to one page.
+    async apiFetchAllPages(path, pageSize = 500) {
+      const rows = [];
+      let cursor = null;
+      do {
+        const params = new URLSearchParams({ limit: String(pageSize) });
+        if (cursor) params.set("cursor", cursor);
+        const { data, headers } = await this.apiFetchResponse(`${path}?${params}`, { method: "GET" });
+        if (Array.isArray(data)) rows.push(...data);
+        cursor = headers.get("x-next-cursor");
+      } while (cursor);
+      return rows;
+    },
+
+    async apiFetchResponse(path, options = {}) {
       const headers = { Accept: "application/json", ...(options.headers || {}) };
       const fetchOptions = { method: options.method || "GET", headers };
       if (options.body !== undefined) {
@@ -269,7 +294,7 @@ window.cpkitWebappExtension = {
         throw new Error("Not authenticated.");
       }
       if (!res.ok) throw new Error(this.apiErrorMessage(data, `HTTP ${res.status}`));
-      return data;
+      return { data, headers: res.headers };
     },
 
     apiErrorMessage(data, fallback) {
@@ -361,12 +386,7 @@ window.cpkitWebappExtension = {
       } else {
         this.applyAllocationsFilterSort();
       }
-      if (!this.computeLoading.list) {
-        await this.refreshComputeUnits();
-      }
-      if (this.canViewKloigosAdmin() && !this.serversLoading.list) {
-        await this.refreshServers();
-      }
+      await this.refreshCapacity();
     },
 
     async ensureComputeUnitsView() {
@@ -392,7 +412,7 @@ window.cpkitWebappExtension = {
     async refreshAllocations() {
       this.allocationsLoading.list = true;
       try {
-        const data = await this.apiFetch("/allocations/", { method: "GET" });
+        const data = await this.apiFetchAllPages("/allocations/");
         this.allocations = Array.isArray(data)
           ? data.map((row) => ({
               ...row,
@@ -411,7 +431,7 @@ window.cpkitWebappExtension = {
     async refreshIpPool() {
       this.ipPoolLoading.list = true;
       try {
-        const data = await this.apiFetch("/admin/ip_pool/", { method: "GET" });
+        const data = await this.apiFetchAllPages("/admin/ip_pool/");
         this.ipPool = Array.isArray(data)
           ? data.map((row) => ({
               ...row,
@@ -449,7 +469,7 @@ window.cpkitWebappExtension = {
     async refreshComputeUnits() {
       this.computeLoading.list = true;
       try {
-        const data = await this.apiFetch("/compute_units/", { method: "GET" });
+        const data = await this.apiFetchAllPages("/compute_units/");
         this.computeUnits = Array.isArray(data)
           ? data.map((row) => ({
               ...row,
@@ -465,6 +485,15 @@ window.cpkitWebappExtension = {
       }
     },
 
+    async refreshCapacity() {
+      try {
+        const data = await this.apiFetch("/capacity/");
+        this.capacity = Array.isArray(data) ? data : [];
+      } catch (error) {
+        this.showNotice(this.errorMessage(error, "Failed to load capacity."));
+      }
+    },
+
     canManageAllocations() {
       return this.authIsUnauthenticatedMode() || this.hasRole("CP_USER") || this.hasRole("CP_ADMIN");
     },
@@ -475,9 +504,8 @@ window.cpkitWebappExtension = {
 
     allocationCpuCountOptions() {
       const counts = new Set();
-      for (const row of this.computeUnits || []) {
-        const status = String(row.status || "").toLowerCase();
-        if (status !== "free") continue;
+      for (const row of this.capacity || []) {
+        if (!(Number(row.placeable_free) > 0)) continue;
         const count = Number(row.cpu_count);
         if (Number.isFinite(count) && count > 0) counts.add(count);
       }
@@ -486,29 +514,21 @@ window.cpkitWebappExtension = {
 
     allocationLocationOptions() {
       const options = new Map();
-      for (const server of this.servers || []) {
-        const status = String(server.status || "").toLowerCase();
-        const health = String(server.health_status || "unknown").toLowerCase();
-        const region = String(server.region || "").trim();
-        const zone = String(server.zone || "").trim();
-        if (status !== "ready" || health !== "healthy" || !region || !zone) continue;
+      for (const row of this.capacity || []) {
+        const region = String(row.region || "").trim();
+        const zone = String(row.zone || "").trim();
+        if (!(Number(row.placeable_free) > 0) || !region || !zone) continue;
         const value = `${region}|${zone}`;
         if (!options.has(value)) options.set(value, { value, label: `${region}-${zone}` });
       }
       return Array.from(options.values()).sort((left, right) => left.label.localeCompare(right.label));
     },
 
-    computeUnitById(computeId) {
-      const target = String(computeId || "");
-      return (this.computeUnits || []).find((row) => String(row.compute_id || "") === target) || null;
-    },
-
     allocationScaleCpuCountOptions() {
       const current = Number(this.modal.allocationScale.current_cpu_count);
       const counts = new Set();
-      for (const row of this.computeUnits || []) {
-        const status = String(row.status || "").toLowerCase();
-        if (status !== "free") continue;
+      for (const row of this.capacity || []) {
+        if (!(Number(row.placeable_free) > 0)) continue;
         const count = Number(row.cpu_count);
         if (!Number.isFinite(count) || count <= 0) continue;
         if (Number.isFinite(current) && count === current) continue;
@@ -955,13 +975,22 @@ window.cpkitWebappExtension = {
       this.ipPoolLoading.insert = true;
       this.modalError.ipPoolAdd = "";
       try {
-        const ipAddresses = this.buildIpPoolAddressList();
-        if (ipAddresses.length === 0) throw new Error("Enter at least one IP address.");
-        await this.apiFetch("/admin/ip_pool/", {
+        const entries = this.buildIpPoolAddressList();
+        if (entries.length === 0) throw new Error("Enter at least one IP address or CIDR range.");
+        const cidrs = entries.filter((value) => value.includes("/"));
+        const ipAddresses = entries.filter((value) => !value.includes("/"));
+        const result = await this.apiFetch("/admin/ip_pool/", {
           method: "POST",
-          body: { ip_addresses: ipAddresses },
+          body: { ip_addresses: ipAddresses, cidrs },
         });
         this.closeIpPoolAddModal();
+        const inserted = result?.inserted?.length ?? 0;
+        const conflicts = result?.conflicts?.length ?? 0;
+        this.showNotice(
+          conflicts
+            ? `Added ${inserted} IP addresses; ${conflicts} already in the pool.`
+            : `Added ${inserted} IP addresses.`,
+        );
         await this.refreshIpPool();
       } catch (error) {
         this.modalError.ipPoolAdd = this.errorMessage(error, "Failed to add IP addresses.");
@@ -1117,10 +1146,13 @@ window.cpkitWebappExtension = {
       this.modal.allocate.login_user = "";
       this.modal.allocate.cpu_count = "";
       this.modal.allocate.location = "";
+      this.modal.allocate.placement_strategy = "";
+      this.modal.allocate.numa_local = false;
       this.modal.allocate.tagPairs = [{ key: "", value: "" }];
       this.modal.allocate.ssh_public_key = "";
       this.modalError.allocate = "";
       this.modal.allocate.open = true;
+      this.refreshCapacity();
     },
 
     closeAllocateModal() {
@@ -1175,6 +1207,8 @@ window.cpkitWebappExtension = {
           cpu_count: Number.isFinite(cpuCount) ? cpuCount : null,
           region: location.region,
           zone: location.zone,
+          placement_strategy: this.modal.allocate.placement_strategy || null,
+          numa_local: Boolean(this.modal.allocate.numa_local),
           tags,
           ssh_public_key: sshPublicKey,
         };
@@ -1182,7 +1216,7 @@ window.cpkitWebappExtension = {
         this.closeAllocateModal();
         this.showNotice("Allocation queued.", { jobId: result?.job_id });
         await this.refreshAllocations();
-        await this.refreshComputeUnits();
+        await this.refreshCapacity();
       } catch (error) {
         this.modalError.allocate = this.errorMessage(error, "Allocation failed.");
       } finally {
@@ -1212,7 +1246,7 @@ window.cpkitWebappExtension = {
         this.closeDeallocateConfirm();
         this.showNotice("Deallocation queued.", { jobId: result?.job_id });
         await this.refreshAllocations();
-        await this.refreshComputeUnits();
+        await this.refreshCapacity();
       } catch (error) {
         this.modalError.deallocateConfirm = this.errorMessage(error, "Deallocate failed.");
       } finally {
@@ -1223,12 +1257,16 @@ window.cpkitWebappExtension = {
 
     openAllocationScaleModal(row) {
       this.modal.allocationScale.allocation_id = String(row?.allocation_id || "");
-      const currentComputeUnit = this.computeUnitById(row?.compute_id);
-      this.modal.allocationScale.current_cpu_count = currentComputeUnit?.cpu_count ?? null;
+      this.modal.allocationScale.current_cpu_count = row?.cpu_count ?? null;
       this.modal.allocationScale.cpu_count = null;
       this.modal.allocationScale.location = "";
+      this.modal.allocationScale.placement_strategy = "";
+      this.modal.allocationScale.numa_local = false;
+      this.modal.allocationScale.transfer_mode = "DIRECT";
+      this.modal.allocationScale.iterative_precopy = false;
       this.modalError.allocationScale = "";
       this.modal.allocationScale.open = true;
+      this.refreshCapacity();
     },
 
     closeAllocationScaleModal() {
@@ -1247,6 +1285,10 @@ window.cpkitWebappExtension = {
           cpu_count: this.modal.allocationScale.cpu_count,
           region: location.region,
           zone: location.zone,
+          placement_strategy: this.modal.allocationScale.placement_strategy || null,
+          numa_local: Boolean(this.modal.allocationScale.numa_local),
+          transfer_mode: this.modal.allocationScale.transfer_mode || "DIRECT",
+          iterative_precopy: Boolean(this.modal.allocationScale.iterative_precopy),
         };
         if (!payload.cpu_count) {
           throw new Error("Select a target CPU count.");
@@ -1258,7 +1300,7 @@ window.cpkitWebappExtension = {
         this.closeAllocationScaleModal();
         this.showNotice("Scale queued.", { jobId: result?.job_id });
         await this.refreshAllocations();
-        await this.refreshComputeUnits();
+        await this.refreshCapacity();
       } catch (error) {
         this.modalError.allocationScale = this.errorMessage(error, "Scale failed.");
       } finally {
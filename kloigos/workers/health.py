@@ -1,25 +1,50 @@
 """Server health check queue handler."""
 
+import datetime as dt
 import logging
+import os
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from dataclasses import dataclass
 from typing import Any
 
+from cpkit.audit import log_event
 from cpkit.repository import get_repo
 
 from ..models import (
     AlertSeverity,
     AlertType,
+    Event,
     ServerHealthStatus,
     ServerInDB,
     ServerStatus,
 )
+from ..ssh import close_master, control_options, target_host
 
 logger = logging.getLogger(__name__)
 
 SSH_CONNECT_TIMEOUT_SECONDS = 5
 SSH_COMMAND_TIMEOUT_SECONDS = 15
 
+# Probes run in parallel, at most this many SSH sessions at once.
+HEALTH_CHECK_CONCURRENCY = int(os.getenv("KLOIGOS_HEALTH_CHECK_CONCURRENCY", "32"))
+# A cycle stops waiting for probes after this long, so it finishes inside the
+# 60 second SERVER_HEALTH_CHECK interval. Servers not probed in time keep
+# their previous health and are reported as skipped.
+HEALTH_CHECK_DEADLINE_SECONDS = float(
+    os.getenv("KLOIGOS_HEALTH_CHECK_DEADLINE_SECONDS", "50")
+)
+# When > 0, a probe result is only written if the server's health status or
+# error changed, or its last write is at least this old. Unchanged servers
+# then cost no writes between heartbeats; last_health_check_at lags by up to
+# the heartbeat, which KLOIGOS_PLACEMENT_MAX_HEALTH_AGE_SECONDS must allow for.
+HEALTH_HEARTBEAT_SECONDS = int(os.getenv("KLOIGOS_HEALTH_HEARTBEAT_SECONDS", "0"))
+# Per-host probe results kept in the cycle's SERVER_HEALTH_CHECK_DONE event:
+# only the slowest, so the event stays the same size as the fleet grows.
+HEALTH_EVENT_SLOWEST_HOSTS = 10
+
 
 @dataclass(frozen=True)
 class HealthProbeResult:
@@ -29,62 +54,221 @@ class HealthProbeResult:
 
 
 def run_server_health_check(
-    _job_id: int,
+    job_id: int,
     _command: Any,
-    _requested_by: str,
+    requested_by: str,
 ) -> None:
     """Run one health check cycle."""
     repo = get_repo()
-    servers = [
-        server for server in repo.get_servers() if server.status == ServerStatus.READY
-    ]
+    # Least recently checked first: when hung hosts push a cycle past its
+    # deadline, the servers it missed lead the next cycle instead of the
+    # same tail of the fleet going unprobed every time.
+    servers = sorted(
+        (
+            server
+            for server in repo.get_servers()
+            if server.status == ServerStatus.READY
+        ),
+        key=lambda server: (
+            server.last_health_check_at is not None,
+            server.last_health_check_at or dt.datetime.min.replace(tzinfo=dt.UTC),
+        ),
+    )
     if not servers:
         return
 
-    logger.info("Checking health for %s ready server(s)", len(servers))
-    for server in servers:
+    started = time.monotonic()
+    concurrency = max(1, min(HEALTH_CHECK_CONCURRENCY, len(servers)))
+    logger.info(
+        "Checking health for %s ready server(s), concurrency %s",
+        len(servers),
+        concurrency,
+    )
+
+    hosts: dict[str, dict[str, Any]] = {}
+    results: list[tuple[ServerInDB, HealthProbeResult]] = []
+    executor = ThreadPoolExecutor(
+        max_workers=concurrency,
+        thread_name_prefix="kloigos-health",
+    )
+    try:
+        futures = {
+            executor.submit(_timed_probe, server): server for server in servers
+        }
         try:
-            result = _probe_server(server)
-            repo.update_server_health(
-                server.hostname,
-                result.status,
-                None if result.status == ServerHealthStatus.HEALTHY else result.message,
+            for future in as_completed(futures, timeout=HEALTH_CHECK_DEADLINE_SECONDS):
+                server = futures[future]
+                result, duration_ms = future.result()
+                hosts[server.hostname] = {
+                    "status": result.status if result else "ERROR",
+                    "duration_ms": duration_ms,
+                }
+                if result is not None:
+                    _log_probe_result(server, result)
+                    results.append((server, result))
+        except FuturesTimeoutError:
+            logger.warning(
+                "Health check cycle hit its %ss deadline with %s server(s) unprobed",
+                HEALTH_CHECK_DEADLINE_SECONDS,
+                len(servers) - len(hosts),
             )
-            if result.status == ServerHealthStatus.HEALTHY:
-                repo.resolve_alert(
-                    alert_type=AlertType.SERVER_UNHEALTHY,
-                    resource_type="server",
-                    resource_id=server.hostname,
-                    message=f"Server {server.hostname} is healthy.",
-                    details=result.details,
+    finally:
+        # Queued probes are dropped; ones already running finish on their own
+        # SSH timeout without holding up the cycle.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    now = dt.datetime.now(dt.UTC)
+    changed = [
+        (server, result)
+        for server, result in results
+        if _needs_write(server, result, now)
+    ]
+    _write_probe_results(repo, changed)
+
+    skipped = [server.hostname for server in servers if server.hostname not in hosts]
+    statuses: dict[str, int] = {}
+    for host in hosts.values():
+        statuses[host["status"]] = statuses.get(host["status"], 0) + 1
+    durations = sorted(host["duration_ms"] for host in hosts.values())
+    slowest = sorted(
+        hosts.items(),
+        key=lambda item: item[1]["duration_ms"],
+        reverse=True,
+    )[:HEALTH_EVENT_SLOWEST_HOSTS]
+    cycle_ms = round((time.monotonic() - started) * 1000)
+
+    logger.info(
+        "Health check cycle probed %s server(s) in %sms (%s skipped)",
+        len(hosts),
+        cycle_ms,
+        len(skipped),
+    )
+    log_event(
+        repo,
+        requested_by,
+        Event.SERVER_HEALTH_CHECK_DONE,
+        {
+            "job_id": job_id,
+            "server_count": len(servers),
+            "concurrency": concurrency,
+            "deadline_seconds": HEALTH_CHECK_DEADLINE_SECONDS,
+            "cycle_ms": cycle_ms,
+            "max_probe_ms": durations[-1] if durations else None,
+            "statuses": statuses,
+            "written": len(changed),
+            "skipped": skipped,
+            "slowest_hosts": dict(slowest),
+        },
+    )
+
+
+def _timed_probe(server: ServerInDB) -> tuple[HealthProbeResult | None, int]:
+    started = time.monotonic()
+    try:
+        result = _probe_server(server)
+    except Exception:
+        logger.exception("Server %s health check failed", server.hostname)
+        result = None
+    return result, round((time.monotonic() - started) * 1000)
+
+
+def _needs_write(
+    server: ServerInDB,
+    result: HealthProbeResult,
+    now: dt.datetime,
+) -> bool:
+    if HEALTH_HEARTBEAT_SECONDS <= 0:
+        return True
+    error = None if result.status == ServerHealthStatus.HEALTHY else result.message
+    if server.health_status != result.status or server.last_health_error != error:
+        return True
+    return (
+        server.last_health_check_at is None
+        or (now - server.last_health_check_at).total_seconds()
+        >= HEALTH_HEARTBEAT_SECONDS
+    )
+
+
+def _log_probe_result(server: ServerInDB, result: HealthProbeResult) -> None:
+    if result.status == ServerHealthStatus.HEALTHY:
+        logger.info("Server %s health check passed", server.hostname)
+    else:
+        logger.warning(
+            "Server %s health check reported %s: %s",
+            server.hostname,
+            result.status,
+            result.message,
+        )
+
+
+def _write_probe_results(
+    repo,
+    results: list[tuple[ServerInDB, HealthProbeResult]],
+) -> None:
+    # One statement each for server health, newly healthy alerts and
+    # unhealthy alerts, however many servers the cycle probed.
+    healthy = [
+        (server, result)
+        for server, result in results
+        if result.status == ServerHealthStatus.HEALTHY
+    ]
+    unhealthy = [
+        (server, result)
+        for server, result in results
+        if result.status != ServerHealthStatus.HEALTHY
+    ]
+    try:
+        repo.update_servers_health(
+            [
+                (
+                    server.hostname,
+                    result.status,
+                    None
+                    if result.status == ServerHealthStatus.HEALTHY
+                    else result.message,
                 )
-                logger.info("Server %s health check passed", server.hostname)
-            else:
-                repo.open_or_touch_alert(
-                    alert_type=AlertType.SERVER_UNHEALTHY,
-                    severity=(
+                for server, result in results
+            ]
+        )
+        repo.resolve_alerts(
+            alert_type=AlertType.SERVER_UNHEALTHY,
+            resource_type="server",
+            alerts=[
+                (
+                    server.hostname,
+                    f"Server {server.hostname} is healthy.",
+                    result.details,
+                )
+                for server, result in healthy
+            ],
+        )
+        repo.open_or_touch_alerts(
+            alert_type=AlertType.SERVER_UNHEALTHY,
+            resource_type="server",
+            alerts=[
+                (
+                    server.hostname,
+                    (
                         AlertSeverity.CRITICAL
                         if result.status == ServerHealthStatus.UNREACHABLE
                         else AlertSeverity.WARNING
                     ),
-                    resource_type="server",
-                    resource_id=server.hostname,
-                    message=result.message,
-                    details=result.details,
-                )
-                logger.warning(
-                    "Server %s health check reported %s: %s",
-                    server.hostname,
-                    result.status,
                     result.message,
+                    result.details,
                 )
-        except Exception:
-            logger.exception("Server %s health check failed", server.hostname)
+                for server, result in unhealthy
+            ],
+        )
+    except Exception:
+        logger.exception(
+            "Failed to record health check results for %s server(s)", len(results)
+        )
 
 
 def _probe_server(server: ServerInDB) -> HealthProbeResult:
-    target_host = server.private_ip or server.hostname
-    target = f"{server.server_admin_user}@{target_host}"
+    target = (
+        f"{server.server_admin_user}@{target_host(server.public_ip, server.private_ip)}"
+    )
     command = "sudo -n true && " "test -d /mnt/kloigos && " "command -v nft >/dev/null"
     ssh = [
         "ssh",
@@ -94,6 +278,7 @@ def _probe_server(server: ServerInDB) -> HealthProbeResult:
         f"ConnectTimeout={SSH_CONNECT_TIMEOUT_SECONDS}",
         "-o",
         "StrictHostKeyChecking=accept-new",
+        *control_options(),
         target,
         command,
     ]
@@ -107,6 +292,7 @@ def _probe_server(server: ServerInDB) -> HealthProbeResult:
             timeout=SSH_COMMAND_TIMEOUT_SECONDS,
         )
     except subprocess.TimeoutExpired:
+        close_master(target)
         return HealthProbeResult(
             status=ServerHealthStatus.UNREACHABLE,
             message=f"Server {server.hostname} health check timed out.",
@@ -141,6 +327,9 @@ def _probe_server(server: ServerInDB) -> HealthProbeResult:
             details=details,
         )
 
+    if completed.returncode == 255:
+        # ssh itself failed; do not let the next probe reuse that master.
+        close_master(target)
     return HealthProbeResult(
         status=ServerHealthStatus.UNREACHABLE,
         message=f"Server {server.hostname} failed health check.",
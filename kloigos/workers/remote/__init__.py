@@ -3,6 +3,7 @@
 from .allocation import (
     run_allocation_scale,
     run_compute_unit_allocate,
+    run_compute_unit_allocate_batch,
     run_compute_unit_deallocate,
 )
 from .server import run_server_decommission, run_server_init
@@ -10,6 +11,7 @@ from .server import run_server_decommission, run_server_init
 __all__ = [
     "run_allocation_scale",
     "run_compute_unit_allocate",
+    "run_compute_unit_allocate_batch",
     "run_compute_unit_deallocate",
     "run_server_decommission",
     "run_server_init",
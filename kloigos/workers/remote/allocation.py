@@ -1,12 +1,19 @@
 """Remote allocation worker handlers."""
 
+import json
 import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
 
 from cpkit import get_repo
 from cpkit.audit import log_event
 from cpkit.playbooks import run_playbook
 
 from ...models import (
+    AllocationBatchCreateCommand,
     AllocationCreateCommand,
     AllocationDeallocateCommand,
     AllocationInDB,
@@ -21,10 +28,37 @@ from ...models import (
     NoFreeComputeUnitError,
     Playbook,
 )
+from ...ssh import playbook_vars, target_host
+from ...task_timings import TaskTimings
+from ...util import cpu_set_numa_nodes
+
+# rsync --compress-choice for scale transfers, e.g. "zstd"; empty sends the
+# data uncompressed.
+SCALE_RSYNC_COMPRESS = os.getenv("KLOIGOS_SCALE_RSYNC_COMPRESS", "")
+# Per-host cap for scale transfers in KiB/s, shared by the parallel rsync
+# streams. 0 means unlimited.
+SCALE_RSYNC_BWLIMIT_KBPS = int(os.getenv("KLOIGOS_SCALE_RSYNC_BWLIMIT_KBPS", "0"))
+# Iterative pre-copy (AllocationScaleRequest.iterative_precopy) runs delta
+# passes before freezing the source, at most this many copies in total, and
+# stops early once a pass moves no more than the byte threshold or takes no
+# longer than the time threshold.
+SCALE_PRECOPY_MAX_PASSES = int(os.getenv("KLOIGOS_SCALE_PRECOPY_MAX_PASSES", "5"))
+SCALE_PRECOPY_DELTA_BYTES = int(
+    os.getenv("KLOIGOS_SCALE_PRECOPY_DELTA_BYTES", str(256 * 1024 * 1024))
+)
+SCALE_PRECOPY_DELTA_SECONDS = float(
+    os.getenv("KLOIGOS_SCALE_PRECOPY_DELTA_SECONDS", "30")
+)
 
-
-def _ansible_host(public_ip: str | None, private_ip: str) -> str:
-    return public_ip or private_ip
+_RSYNC_STATS_PATTERN = re.compile(
+    r"^(Total bytes sent|Total bytes received|Total transferred file size):"
+    r" ([\d,]+)",
+    re.MULTILINE,
+)
+_COPY_PASS_PATTERN = re.compile(
+    r"^=== pass (\d+) seconds=([\d.]+) file_bytes=(\d+)$",
+    re.MULTILINE,
+)
 
 
 def _get_compute_unit(repo, compute_id: str) -> ComputeUnitOverview:
@@ -41,6 +75,28 @@ def _get_allocation(repo, allocation_id: str) -> AllocationInDB:
     return matches[0]
 
 
+def _reserved_allocation(
+    repo, command: AllocationCreateCommand
+) -> AllocationInDB | None:
+    # The service discards a batch whose jobs could not all be queued; jobs
+    # it already queued must then leave those allocations alone, even if a
+    # retry has reserved the same allocation id since.
+    matches = repo.get_allocations(allocation_id=command.allocation_id)
+    if not matches:
+        return None
+    allocation = matches[0]
+    if (
+        allocation.status != AllocationStatus.ALLOCATING
+        or allocation.compute_id != command.compute_id
+        or (
+            command.reserved_at is not None
+            and allocation.created_at != command.reserved_at
+        )
+    ):
+        return None
+    return allocation
+
+
 def _storage_mount_path(cu: ComputeUnitOverview) -> str:
     return f"/mnt/kloigos/{cu.hostname}/cu{cu.ordinal:02d}"
 
@@ -81,8 +137,117 @@ def _allocation_placement_audit_details(
     }
 
 
-def _record_playbook_version(details: dict, result) -> None:
+def _record_playbook_version(details: dict, result, started: float) -> None:
     details["playbook_version"] = result.playbook_version
+    details["playbook_seconds"] = round(time.monotonic() - started, 3)
+
+
+def _delta_seconds(delta: str) -> float:
+    hours, minutes, seconds = delta.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _rsync_stream_stats(stdout: str) -> dict[str, dict[str, int]]:
+    """Sum rsync --stats per stream over every pass of one copy."""
+    streams = {}
+    for section in ("\n" + stdout).split("\n== ")[1:]:
+        name, _, text = section.partition("\n")
+        stats = {
+            key: int(value.replace(",", ""))
+            for key, value in _RSYNC_STATS_PATTERN.findall(text)
+        }
+        stream = streams.setdefault(name.strip(), {"wire_bytes": 0, "file_bytes": 0})
+        stream["wire_bytes"] += stats.get("Total bytes sent", 0) + stats.get(
+            "Total bytes received", 0
+        )
+        stream["file_bytes"] += stats.get("Total transferred file size", 0)
+    return streams
+
+
+def _copy_passes(stdout: str) -> list[dict]:
+    return [
+        {"pass": int(number), "seconds": float(seconds), "file_bytes": int(size)}
+        for number, seconds, size in _COPY_PASS_PATTERN.findall(stdout)
+    ]
+
+
+def _transfer_report(path: Path) -> dict:
+    """Summarize the copies and freeze ALLOCATION_SCALE recorded at `path`.
+
+    Each copy (phase and route) lists its passes and parallel rsync streams.
+    A failed block copy (route block_failed) also carries its error and
+    whether the target filesystem had to be recreated.
+    """
+    try:
+        recorded = json.loads(path.read_text() or "{}")
+    except (OSError, ValueError):
+        return {}
+
+    copies = []
+    for copy in recorded.get("copies", []):
+        stdout = copy.get("stdout") or ""
+        streams = _rsync_stream_stats(stdout)
+        seconds = _delta_seconds(copy["delta"])
+        wire_bytes = sum(stream["wire_bytes"] for stream in streams.values())
+        copies.append(
+            {
+                "phase": copy["phase"],
+                "route": copy["route"],
+                "seconds": round(seconds, 3),
+                "wire_bytes": wire_bytes,
+                "file_bytes": sum(
+                    stream["file_bytes"] for stream in streams.values()
+                ),
+                "bytes_per_second": round(wire_bytes / seconds) if seconds else None,
+                "passes": _copy_passes(stdout),
+                "streams": streams,
+            }
+        )
+        if "error" in copy:
+            copies[-1]["error"] = copy["error"]
+            copies[-1]["reformatted"] = copy.get("reformatted", False)
+    return {"transfer": copies, "freeze_seconds": recorded.get("freeze_seconds")}
+
+
+def _topology_playbook_vars(topology: dict | None, cpu_set: str) -> dict:
+    """Return NUMA nodes and memory per CPU for cpu_set from the host topology.
+
+    Empty for servers initialized before SERVER_INIT recorded topology; the
+    playbook then probes the host instead.
+    """
+    nodes = cpu_set_numa_nodes(topology, cpu_set)
+    if not nodes or not topology.get("mem_total_kb"):
+        return {}
+    return {
+        "numa_nodes": ",".join(str(node) for node in nodes),
+        "host_mem_kb_per_cpu": topology["mem_total_kb"] // len(topology["cpus"]),
+    }
+
+
+def _allocation_playbook_vars(
+    allocation: AllocationInDB,
+    cu: ComputeUnitOverview,
+    ssh_public_key: str,
+    topology: dict | None,
+) -> dict:
+    return {
+        "compute_id": cu.compute_id,
+        "hostname": cu.hostname,
+        "ansible_host": target_host(cu.server_public_ip, cu.server_private_ip),
+        "server_private_ip": cu.server_private_ip,
+        "server_public_ip": cu.server_public_ip,
+        "server_admin_user": cu.server_admin_user,
+        "private_ip": allocation.ip_address,
+        "allocation_id": allocation.allocation_id,
+        "login_user": allocation.login_user,
+        "allocation_ip_address": allocation.ip_address,
+        "compute_unit_storage_mount_path": _storage_mount_path(cu),
+        "cpu_range": cu.cpu_range,
+        "cpu_set": cu.cpu_set,
+        "cpu_count": cu.cpu_count,
+        "ssh_public_key": ssh_public_key,
+        **_topology_playbook_vars(topology, cu.cpu_set),
+    }
 
 
 def run_compute_unit_allocate(
@@ -96,41 +261,133 @@ def run_compute_unit_allocate(
     allocation = _get_allocation(repo, payload.allocation_id)
     details = {"job_id": job_id, **_allocation_placement_audit_details(allocation, cu)}
     job_ok = False
+    timings = TaskTimings(repo, job_id, Playbook.ALLOCATION_CREATE.value)
 
     try:
+        started = time.monotonic()
         result = run_playbook(
             repo=repo,
             job_id=job_id,
             playbook_name=Playbook.ALLOCATION_CREATE.value,
             extra_vars={
-                "compute_id": cu.compute_id,
-                "hostname": cu.hostname,
-                "ansible_host": _ansible_host(
-                    cu.server_public_ip, cu.server_private_ip
+                **playbook_vars(),
+                **timings.playbook_vars(),
+                **_allocation_playbook_vars(
+                    allocation,
+                    cu,
+                    payload.ssh_public_key,
+                    repo.get_server_topology(cu.hostname),
                 ),
-                "server_private_ip": cu.server_private_ip,
-                "server_public_ip": cu.server_public_ip,
-                "server_admin_user": cu.server_admin_user,
-                "private_ip": allocation.ip_address,
-                "allocation_id": allocation.allocation_id,
-                "login_user": allocation.login_user,
-                "allocation_ip_address": allocation.ip_address,
-                "compute_unit_storage_mount_path": _storage_mount_path(cu),
-                "cpu_range": cu.cpu_range,
-                "cpu_set": cu.cpu_set,
-                "cpu_count": cu.cpu_count,
-                "ssh_public_key": payload.ssh_public_key,
             },
         )
         job_ok = result.status == "successful"
-        _record_playbook_version(details, result)
+        _record_playbook_version(details, result, started)
     except Exception as exc:
         details["error"] = f"Unhandled exception during allocation playbook: {exc}"
         logging.exception(
             "Unhandled exception during compute unit allocation for %s",
             cu.compute_id,
         )
+    details["phase_seconds"] = timings.record()
+
+    _finish_allocation(repo, actor_id, allocation, cu, details, job_ok)
+
+
+def run_compute_unit_allocate_batch(
+    job_id: int,
+    payload: AllocationBatchCreateCommand,
+    actor_id: str,
+) -> None:
+    """Prepare several allocations with a single ALLOCATION_CREATE run.
+
+    Batches are queued per target host, so ansible-runner starts once for all
+    of a host's new compute units. Each compute unit is its own inventory
+    host, so a failed run only fails the allocations whose tasks failed, as
+    recorded by the task timings callback.
+    """
+    repo = get_repo()
+    placements = []
+    for command in payload.allocations:
+        allocation = _reserved_allocation(repo, command)
+        if allocation is None:
+            logging.warning(
+                "Skipping allocation %s in batch job %s: reservation was discarded",
+                command.allocation_id,
+                job_id,
+            )
+            continue
+        placements.append(
+            (
+                command,
+                allocation,
+                _get_compute_unit(repo, command.compute_id),
+            )
+        )
+    if not placements:
+        return
+
+    topologies = {
+        hostname: repo.get_server_topology(hostname)
+        for hostname in {cu.hostname for _, _, cu in placements}
+    }
+    batch = {"job_id": job_id, "batch_size": len(placements)}
+    job_ok = False
+    run_completed = False
+    timings = TaskTimings(repo, job_id, Playbook.ALLOCATION_CREATE.value)
 
+    try:
+        started = time.monotonic()
+        result = run_playbook(
+            repo=repo,
+            job_id=job_id,
+            playbook_name=Playbook.ALLOCATION_CREATE.value,
+            extra_vars={
+                **playbook_vars(),
+                **timings.playbook_vars(),
+                "allocations": [
+                    _allocation_playbook_vars(
+                        allocation,
+                        cu,
+                        command.ssh_public_key,
+                        topologies[cu.hostname],
+                    )
+                    for command, allocation, cu in placements
+                ],
+            },
+        )
+        job_ok = result.status == "successful"
+        # "failed" means ansible-playbook ran to the end with some hosts
+        # failing; timeouts and cancellations leave every host unfinished.
+        run_completed = result.status in ("successful", "failed")
+        _record_playbook_version(batch, result, started)
+    except Exception as exc:
+        batch["error"] = f"Unhandled exception during allocation playbook: {exc}"
+        logging.exception(
+            "Unhandled exception during batch allocation job %s",
+            job_id,
+        )
+    batch["phase_seconds"] = timings.record()
+
+    for command, allocation, cu in placements:
+        details = {**batch, **_allocation_placement_audit_details(allocation, cu)}
+        allocation_ok = job_ok or (
+            run_completed and timings.host_succeeded(cu.compute_id)
+        )
+        if _reserved_allocation(repo, command) is None:
+            details["error"] = "Reservation was discarded while the job ran."
+            log_event(repo, actor_id, Event.ALLOCATION_CREATE_FAILED, details)
+            continue
+        _finish_allocation(repo, actor_id, allocation, cu, details, allocation_ok)
+
+
+def _finish_allocation(
+    repo,
+    actor_id: str,
+    allocation: AllocationInDB,
+    cu: ComputeUnitOverview,
+    details: dict,
+    job_ok: bool,
+) -> None:
     final_status = (
         ComputeUnitStatus.ALLOCATED if job_ok else ComputeUnitStatus.ALLOCATION_FAIL
     )
@@ -180,16 +437,20 @@ def run_compute_unit_deallocate(
     allocation = _get_allocation(repo, payload.allocation_id)
     details = {"job_id": job_id, **_allocation_placement_audit_details(allocation, cu)}
     job_ok = False
+    timings = TaskTimings(repo, job_id, Playbook.ALLOCATION_DELETE.value)
 
     try:
+        started = time.monotonic()
         result = run_playbook(
             repo=repo,
             job_id=job_id,
             playbook_name=Playbook.ALLOCATION_DELETE.value,
             extra_vars={
+                **playbook_vars(),
+                **timings.playbook_vars(),
                 "compute_id": cu.compute_id,
                 "hostname": cu.hostname,
-                "ansible_host": _ansible_host(
+                "ansible_host": target_host(
                     cu.server_public_ip, cu.server_private_ip
                 ),
                 "server_private_ip": cu.server_private_ip,
@@ -204,13 +465,14 @@ def run_compute_unit_deallocate(
             },
         )
         job_ok = result.status == "successful"
-        _record_playbook_version(details, result)
+        _record_playbook_version(details, result, started)
     except Exception as exc:
         details["error"] = f"Unhandled exception during deallocation playbook: {exc}"
         logging.exception(
             "Unhandled exception during compute unit deallocation for %s",
             cu.compute_id,
         )
+    details["phase_seconds"] = timings.record()
 
     final_status = (
         ComputeUnitStatus.FREE if job_ok else ComputeUnitStatus.DEALLOCATION_FAIL
@@ -268,6 +530,8 @@ def run_allocation_scale(
             region=payload.region,
             zone=payload.zone,
             cpu_count=payload.cpu_count,
+            numa_local=payload.numa_local,
+            placement_strategy=payload.placement_strategy,
             free_status=ComputeUnitStatus.FREE,
             allocated_status=ComputeUnitStatus.ALLOCATING,
         )
@@ -298,19 +562,28 @@ def run_allocation_scale(
         "request": _model_details(payload),
     }
 
+    fd, report_file = tempfile.mkstemp(
+        prefix=f"kloigos-scale-{job_id}-", suffix=".json"
+    )
+    os.close(fd)
+    report_path = Path(report_file)
+    timings = TaskTimings(repo, job_id, Playbook.ALLOCATION_SCALE.value)
     try:
+        started = time.monotonic()
         result = run_playbook(
             repo=repo,
             job_id=job_id,
             playbook_name=Playbook.ALLOCATION_SCALE.value,
             extra_vars={
+                **playbook_vars(),
+                **timings.playbook_vars(),
                 "allocation_id": allocation.allocation_id,
                 "login_user": allocation.login_user,
                 "allocation_ip_address": allocation.ip_address,
                 "private_ip": allocation.ip_address,
                 "source_compute_id": source.compute_id,
                 "source_hostname": source.hostname,
-                "source_ansible_host": _ansible_host(
+                "source_ansible_host": target_host(
                     source.server_public_ip,
                     source.server_private_ip,
                 ),
@@ -323,7 +596,7 @@ def run_allocation_scale(
                 "same_host": source.hostname == target.hostname,
                 "target_compute_id": target.compute_id,
                 "target_hostname": target.hostname,
-                "target_ansible_host": _ansible_host(
+                "target_ansible_host": target_host(
                     target.server_public_ip,
                     target.server_private_ip,
                 ),
@@ -334,10 +607,26 @@ def run_allocation_scale(
                 "target_cpu_range": target.cpu_range,
                 "target_cpu_set": target.cpu_set,
                 "target_cpu_count": target.cpu_count,
+                **{
+                    f"target_{name}": value
+                    for name, value in _topology_playbook_vars(
+                        repo.get_server_topology(target.hostname),
+                        target.cpu_set,
+                    ).items()
+                },
+                "transfer_mode": payload.transfer_mode.value,
+                "scale_rsync_compress": SCALE_RSYNC_COMPRESS,
+                "scale_rsync_bwlimit_kbps": SCALE_RSYNC_BWLIMIT_KBPS,
+                "scale_transfer_report_path": report_file,
+                "scale_precopy_max_passes": (
+                    SCALE_PRECOPY_MAX_PASSES if payload.iterative_precopy else 1
+                ),
+                "scale_precopy_delta_bytes": SCALE_PRECOPY_DELTA_BYTES,
+                "scale_precopy_delta_seconds": SCALE_PRECOPY_DELTA_SECONDS,
             },
         )
         job_ok = result.status == "successful"
-        _record_playbook_version(details, result)
+        _record_playbook_version(details, result, started)
     except Exception as exc:
         job_ok = False
         details["error"] = f"Unhandled exception during scale playbook: {exc}"
@@ -345,6 +634,10 @@ def run_allocation_scale(
             "Unhandled exception during allocation scale for %s",
             allocation.allocation_id,
         )
+    finally:
+        details.update(_transfer_report(report_path))
+        report_path.unlink(missing_ok=True)
+        details["phase_seconds"] = timings.record()
 
     if job_ok:
         repo.update_compute_unit(
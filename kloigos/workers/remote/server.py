@@ -1,5 +1,12 @@
 """Remote server worker handlers."""
 
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
 from cpkit import get_repo
 from cpkit.audit import log_event
 from cpkit.playbooks import run_playbook
@@ -13,11 +20,14 @@ from ...models import (
     ServerNotFoundError,
     ServerStatus,
 )
-from ...util import parse_cpu_range, to_cpu_set
-
-
-def _ansible_host(public_ip: str | None, private_ip: str) -> str:
-    return public_ip or private_ip
+from ...ssh import close_master, playbook_vars, target_host
+from ...task_timings import TaskTimings
+from ...util import (
+    cpu_set_numa_nodes,
+    parse_cpu_range,
+    parse_cpu_topology,
+    to_cpu_set,
+)
 
 
 def _init_compute_units(sir: ServerInitRequest) -> list[InitComputeUnit]:
@@ -39,13 +49,29 @@ def _init_compute_units(sir: ServerInitRequest) -> list[InitComputeUnit]:
     return units
 
 
-def _playbook_audit_details(result) -> dict:
+def _playbook_audit_details(result, started: float) -> dict:
     return {
         "playbook_name": result.playbook_name,
         "playbook_version": result.playbook_version,
+        "playbook_seconds": round(time.monotonic() - started, 3),
     }
 
 
+def _host_topology(path: Path) -> dict | None:
+    """Parse the lscpu/MemTotal report SERVER_INIT wrote to `path`."""
+    try:
+        recorded = json.loads(path.read_text() or "{}")
+        if not recorded:
+            return None
+        return parse_cpu_topology(
+            recorded.get("lscpu") or [],
+            recorded.get("mem_total_kb") or None,
+        )
+    except (OSError, ValueError) as exc:
+        logging.warning("Unable to read host topology from %s: %s", path, exc)
+        return None
+
+
 def _model_details(model) -> dict:
     return model.model_dump(mode="json")
 
@@ -59,30 +85,51 @@ def run_server_init(
     repo = get_repo()
     compute_units = _init_compute_units(payload)
 
-    result = run_playbook(
-        repo=repo,
-        job_id=job_id,
-        playbook_name=Playbook.SERVER_INIT.value,
-        extra_vars={
-            "hostname": payload.hostname,
-            "server_private_ip": payload.private_ip,
-            "server_public_ip": payload.public_ip,
-            "ansible_host": _ansible_host(payload.public_ip, payload.private_ip),
-            "server_admin_user": payload.server_admin_user,
-            "runtime_profile": payload.runtime_profile,
-            "disk_size_gb": payload.disk_size_gb,
-            "compute_units": [cu.as_playbook_vars() for cu in compute_units],
-        },
+    timings = TaskTimings(repo, job_id, Playbook.SERVER_INIT.value)
+    fd, topology_file = tempfile.mkstemp(
+        prefix=f"kloigos-topology-{job_id}-", suffix=".json"
     )
+    os.close(fd)
+    topology_path = Path(topology_file)
+    started = time.monotonic()
+    try:
+        result = run_playbook(
+            repo=repo,
+            job_id=job_id,
+            playbook_name=Playbook.SERVER_INIT.value,
+            extra_vars={
+                **playbook_vars(),
+                **timings.playbook_vars(),
+                "hostname": payload.hostname,
+                "server_private_ip": payload.private_ip,
+                "server_public_ip": payload.public_ip,
+                "ansible_host": target_host(payload.public_ip, payload.private_ip),
+                "server_admin_user": payload.server_admin_user,
+                "runtime_profile": payload.runtime_profile,
+                "disk_size_gb": payload.disk_size_gb,
+                "compute_units": [cu.as_playbook_vars() for cu in compute_units],
+                "server_topology_report_path": topology_file,
+            },
+        )
+        topology = _host_topology(topology_path)
+    finally:
+        topology_path.unlink(missing_ok=True)
     job_ok = result.status == "successful"
     details = {
         **_model_details(payload),
-        "playbook": _playbook_audit_details(result),
+        "playbook": _playbook_audit_details(result, started),
+        "phase_seconds": timings.record(),
     }
 
     if job_ok:
+        if topology is not None:
+            repo.server_update_topology(payload.hostname, topology)
+            details["numa_node_count"] = topology["numa_node_count"]
         for cu in compute_units:
-            repo.insert_new_compute_unit(cu.as_compute_unit(payload.hostname))
+            numa_nodes = cpu_set_numa_nodes(topology, cu.cpu_set)
+            repo.insert_new_compute_unit(
+                cu.as_compute_unit(payload.hostname, len(numa_nodes) or None)
+            )
         repo.server_update_status(payload.hostname, ServerStatus.READY)
     else:
         repo.server_update_status(payload.hostname, ServerStatus.INIT_FAIL)
@@ -107,22 +154,27 @@ def run_server_decommission(
         raise ServerNotFoundError(f"Server {payload.hostname} was not found.")
     srv = matches[0]
 
+    timings = TaskTimings(repo, job_id, Playbook.SERVER_DECOMM.value)
+    started = time.monotonic()
     result = run_playbook(
         repo=repo,
         job_id=job_id,
         playbook_name=Playbook.SERVER_DECOMM.value,
         extra_vars={
+            **playbook_vars(),
+            **timings.playbook_vars(),
             "hostname": srv.hostname,
             "server_private_ip": srv.private_ip,
             "server_public_ip": srv.public_ip,
-            "ansible_host": _ansible_host(srv.public_ip, srv.private_ip),
+            "ansible_host": target_host(srv.public_ip, srv.private_ip),
             "server_admin_user": srv.server_admin_user,
         },
     )
     job_ok = result.status == "successful"
     details = {
         **_model_details(srv),
-        "playbook": _playbook_audit_details(result),
+        "playbook": _playbook_audit_details(result, started),
+        "phase_seconds": timings.record(),
     }
 
     repo.server_update_status(
@@ -131,6 +183,10 @@ def run_server_decommission(
     )
     if job_ok:
         repo.delete_compute_units(srv.hostname)
+        # Drop the shared SSH master used by playbooks and health probes.
+        close_master(
+            f"{srv.server_admin_user}@{target_host(srv.public_ip, srv.private_ip)}"
+        )
 
     log_event(
         repo,
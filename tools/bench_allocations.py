@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Benchmark POST /allocations latency against a running Kloigos instance.
+
+Run it against a scratch deployment with seeded servers, compute units, and IP
+pool addresses: every successful request creates an allocation and queues an
+ALLOCATION_CREATE job. Compare the printed percentiles across builds to measure
+the allocation path before and after a change.
+
+Example:
+
+    python tools/bench_allocations.py --url http://localhost:8000/api \\
+        --requests 200 --concurrency 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import datetime as dt
+import hashlib
+import hmac
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _ssh_public_key() -> str:
+    key_type = b"ssh-ed25519"
+    blob = (
+        len(key_type).to_bytes(4, "big")
+        + key_type
+        + (32).to_bytes(4, "big")
+        + os.urandom(32)
+    )
+    return f"ssh-ed25519 {base64.b64encode(blob).decode('ascii')} bench"
+
+
+def _signed_headers(method: str, url: str, body: str) -> dict[str, str]:
+    access_key = os.getenv("KLOIGOS_ACCESS_KEY")
+    secret_key = os.getenv("KLOIGOS_SECRET_ACCESS_KEY")
+    if not access_key or not secret_key:
+        return {}
+
+    parsed = urllib.parse.urlsplit(url)
+    path_and_query = parsed.path + (f"?{parsed.query}" if parsed.query else "")
+    timestamp = dt.datetime.now(dt.UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+    string_to_sign = f"{method}\n{path_and_query}\n{timestamp}\n{body}"
+    signature = hmac.new(
+        secret_key.encode(),
+        string_to_sign.encode(),
+        hashlib.sha256,
+    ).hexdigest()
+    return {
+        "X-CP-Access-Key": access_key,
+        "X-Timestamp": timestamp,
+        "X-CP-Signature": signature,
+    }
+
+
+def _request(method: str, url: str, payload: dict | None = None) -> tuple[int, dict]:
+    body = json.dumps(payload) if payload is not None else ""
+    headers = {
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+        **_signed_headers(method, url, body),
+    }
+    request = urllib.request.Request(
+        url,
+        data=body.encode() if payload is not None else None,
+        headers=headers,
+        method=method,
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status, json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read() or b"null")
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/api")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cpu-count", type=int, default=None)
+    parser.add_argument("--region", default=None)
+    parser.add_argument("--zone", default=None)
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:8]
+    base_url = args.url.rstrip("/")
+    ssh_public_key = _ssh_public_key()
+
+    def allocate(index: int) -> tuple[float, int]:
+        payload = {
+            "allocation_id": f"bench-{run_id}-{index}",
+            "cpu_count": args.cpu_count,
+            "region": args.region,
+            "zone": args.zone,
+            "tags": {"bench_run": run_id},
+            "ssh_public_key": ssh_public_key,
+        }
+        started = time.perf_counter()
+        status, _ = _request("POST", f"{base_url}/allocations/", payload)
+        return (time.perf_counter() - started) * 1000, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(allocate, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, status in results if status == 200]
+    statuses = Counter(status for _, status in results)
+
+    print(f"run: {run_id}")
+    print(f"requests: {len(results)} in {elapsed:.2f}s, concurrency {args.concurrency}")
+    print("status: " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items())))
+    if latencies:
+        print(
+            "latency ms: "
+            f"p50={statistics.median(latencies):.1f} "
+            f"p99={_percentile(latencies, 99):.1f} "
+            f"max={max(latencies):.1f}"
+        )
+
+    # Every successful allocation must own a distinct compute unit and IP.
+    status, allocations = _request("GET", f"{base_url}/allocations/")
+    if status != 200:
+        print(f"unable to verify placements: HTTP {status}", file=sys.stderr)
+        return 1
+    placed = [
+        row
+        for row in allocations
+        if (row.get("tags") or {}).get("bench_run") == run_id
+    ]
+    compute_ids = [row["compute_id"] for row in placed if row.get("compute_id")]
+    ip_addresses = [row["ip_address"] for row in placed]
+    duplicates = (len(compute_ids) - len(set(compute_ids))) + (
+        len(ip_addresses) - len(set(ip_addresses))
+    )
+    print(f"placed: {len(placed)}, duplicate placements: {duplicates}")
+
+    return 1 if duplicates else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
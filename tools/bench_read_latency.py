@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Measure GET latency while allocation writes run against the same API.
+
+Runs a read-only phase, then repeats the reads while writer threads create
+allocations. If handlers blocked the event loop, read latency in the second
+phase would track write latency; with the async repo it should stay close to
+the read-only baseline.
+
+Example:
+
+    python tools/bench_read_latency.py --url http://localhost:8000/api \\
+        --readers 16 --writers 8 --seconds 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_allocations import _percentile, _request, _ssh_public_key
+
+
+def _run_phase(
+    base_url: str,
+    read_path: str,
+    readers: int,
+    writers: int,
+    seconds: float,
+) -> tuple[list[float], list[float], Counter]:
+    stop = threading.Event()
+    read_latencies: list[float] = []
+    write_latencies: list[float] = []
+    statuses: Counter = Counter()
+    run_id = uuid.uuid4().hex[:8]
+    ssh_public_key = _ssh_public_key()
+
+    def read_loop() -> None:
+        while not stop.is_set():
+            started = time.perf_counter()
+            status, _ = _request("GET", f"{base_url}{read_path}")
+            read_latencies.append((time.perf_counter() - started) * 1000)
+            statuses[f"GET {status}"] += 1
+
+    def write_loop(worker: int) -> None:
+        index = 0
+        while not stop.is_set():
+            index += 1
+            payload = {
+                "allocation_id": f"bench-{run_id}-{worker}-{index}",
+                "tags": {"bench_run": run_id},
+                "ssh_public_key": ssh_public_key,
+            }
+            started = time.perf_counter()
+            status, _ = _request("POST", f"{base_url}/allocations/", payload)
+            write_latencies.append((time.perf_counter() - started) * 1000)
+            statuses[f"POST {status}"] += 1
+
+    with ThreadPoolExecutor(max_workers=readers + writers) as executor:
+        for _ in range(readers):
+            executor.submit(read_loop)
+        for worker in range(writers):
+            executor.submit(write_loop, worker)
+        time.sleep(seconds)
+        stop.set()
+
+    return read_latencies, write_latencies, statuses
+
+
+def _summary(latencies: list[float]) -> str:
+    if not latencies:
+        return "no samples"
+    return (
+        f"n={len(latencies)} "
+        f"p50={statistics.median(latencies):.1f} "
+        f"p99={_percentile(latencies, 99):.1f} "
+        f"max={max(latencies):.1f}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/api")
+    parser.add_argument("--read-path", default="/compute_units/?limit=100")
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip("/")
+
+    baseline, _, statuses = _run_phase(
+        base_url, args.read_path, args.readers, 0, args.seconds
+    )
+    print(f"reads only      ms: {_summary(baseline)}")
+
+    mixed, writes, mixed_statuses = _run_phase(
+        base_url, args.read_path, args.readers, args.writers, args.seconds
+    )
+    statuses.update(mixed_statuses)
+    print(f"reads w/ writes ms: {_summary(mixed)}")
+    print(f"writes          ms: {_summary(writes)}")
+    print("status: " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items())))
+
+    if baseline and mixed:
+        ratio = _percentile(mixed, 99) / _percentile(baseline, 99)
+        print(f"read p99 slowdown under writes: {ratio:.2f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
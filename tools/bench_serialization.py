@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Micro-benchmark list response serialization cost per row.
+
+Compares, in-process and without a database, the two ways a list route can
+turn fetched rows into a JSON body:
+
+- validated: each row validated into a model (psycopg class_row), then
+  returned through the route's response_model;
+- fast: each row kept as a plain dict (psycopg dict_row) and encoded once by
+  json_response, the path the list routes use.
+
+Requests are driven straight through the ASGI app, so the numbers include
+FastAPI's routing and response handling but no network. The two bodies must
+be byte-identical or the benchmark fails.
+
+Example:
+
+    python tools/bench_serialization.py --rows 1000 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime as dt
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi import FastAPI, Response  # noqa: E402
+
+from kloigos.api.responses import json_response  # noqa: E402
+from kloigos.models import AllocationInDB, ComputeUnitOverview  # noqa: E402
+
+
+def _compute_unit_row(index: int) -> dict:
+    hostname = f"host-{index // 16:05d}"
+    ordinal = index % 16 + 1
+    return {
+        "compute_id": f"{hostname}-cu{ordinal:02d}",
+        "hostname": hostname,
+        "ordinal": ordinal,
+        "cpu_range": f"{ordinal * 4}-{ordinal * 4 + 3}",
+        "server_private_ip": f"10.0.{index // 4096}.{index // 16 % 256}",
+        "server_public_ip": None,
+        "server_admin_user": "kloigos",
+        "region": "us-east-1",
+        "zone": "a",
+        "cpu_set": ",".join(str(cpu) for cpu in range(ordinal * 4, ordinal * 4 + 4)),
+        "cpu_count": 4,
+        "status": "ALLOCATED",
+        "allocation_id": f"alloc-{index}",
+        "started_at": dt.datetime(2026, 1, 1, tzinfo=dt.UTC),
+        "tags": {"deployment_id": "web_app_v1", "team": "payments"},
+    }
+
+
+def _allocation_row(index: int) -> dict:
+    return {
+        "allocation_id": f"alloc-{index}",
+        "login_user": f"u{index}",
+        "ip_address": f"172.16.{index // 256 % 256}.{index % 256}",
+        "compute_id": f"host-{index // 16:05d}-cu{index % 16 + 1:02d}",
+        "current_host": f"host-{index // 16:05d}",
+        "status": "ALLOCATED",
+        "tags": {"deployment_id": "web_app_v1"},
+        "cpu_count": 4,
+        "cpu_range": "0-3",
+        "cpu_set": "0,1,2,3",
+        "memory_gb": 15.5,
+        "disk_size_gb": 400,
+        "region": "us-east-1",
+        "zone": "a",
+        "runtime_profile": "standard",
+        "created_at": dt.datetime(2026, 1, 1, tzinfo=dt.UTC),
+        "updated_at": dt.datetime(2026, 1, 1, tzinfo=dt.UTC),
+    }
+
+
+CASES = {
+    "compute_units": (ComputeUnitOverview, _compute_unit_row),
+    "allocations": (AllocationInDB, _allocation_row),
+}
+
+
+def _app(model, rows: list[tuple], names: list[str]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/validated", response_model=list[model])
+    async def validated():
+        return [model(**dict(zip(names, values))) for values in rows]
+
+    @app.get("/fast", response_model=list[model])
+    async def fast() -> Response:
+        return json_response([dict(zip(names, values)) for values in rows])
+
+    return app
+
+
+async def _get(app: FastAPI, path: str) -> bytes:
+    body = bytearray()
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.extend(message.get("body", b""))
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        "server": ("bench", 80),
+        "client": ("bench", 1),
+    }
+    await app(scope, receive, send)
+    return bytes(body)
+
+
+async def _time(app: FastAPI, path: str, repeat: int) -> tuple[float, bytes]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = await _get(app, path)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), body
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 20000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':14} {'rows':>6} {'validated us/row':>17} {'fast us/row':>12} {'speedup':>8}")
+    for name, (model, make_row) in CASES.items():
+        for count in args.rows:
+            names = list(model.model_fields)
+            rows = [
+                tuple(make_row(index)[field] for field in names)
+                for index in range(count)
+            ]
+            app = _app(model, rows, names)
+            slow, slow_body = await _time(app, "/validated", args.repeat)
+            fast, fast_body = await _time(app, "/fast", args.repeat)
+            if slow_body != fast_body:
+                print(f"{name}: fast path output differs", file=sys.stderr)
+                return 1
+            print(
+                f"{name:14} {count:>6} {slow / count * 1e6:>17.2f} "
+                f"{fast / count * 1e6:>12.2f} {slow / fast:>7.1f}x"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
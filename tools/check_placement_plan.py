@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Check that compute unit placement does bounded work on compute_units.
+
+Seeds a fleet-sized set of servers and compute units inside a transaction,
+runs EXPLAIN ANALYZE on the exact claim query used by ``lock_compute_unit``
+for the common filter combinations and every placement strategy, and rolls
+everything back. Exits 1 if a plan does not use the placement index, scans
+``compute_units`` sequentially, or reads more compute unit rows than the
+candidate hosts hold (plus one probe per server for NUMA-local claims).
+
+Example:
+
+    KLOIGOS_DB_URL=postgres://... python tools/check_placement_plan.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+
+import psycopg
+
+from kloigos import placement
+from kloigos.models import ComputeUnitStatus, PlacementStrategy
+from kloigos.repos.postgres import PostgresRepo
+
+PLACEMENT_INDEXES = {
+    "ix_compute_units_free_host_numa",
+}
+
+CASES = {
+    "any": {},
+    "cpu_count": {"cpu_count": 4},
+    "region_zone": {"region": "region-1", "zone": "zone-1"},
+    "region_zone_cpu_count": {"region": "region-1", "zone": "zone-1", "cpu_count": 8},
+    "numa_local": {"numa_local": True},
+}
+
+
+def _seed(conn: psycopg.Connection, servers: int, units_per_server: int) -> None:
+    conn.execute(
+        """
+        INSERT INTO servers (
+            hostname, private_ip, server_admin_user, region, zone,
+            status, health_status, cpu_count, mem_gb
+        )
+        SELECT
+            format('plan-check-%%s', lpad(i::TEXT, 6, '0')),
+            format('10.%%s.%%s.%%s', i / 65536 %% 256, i / 256 %% 256, i %% 256),
+            'kloigos',
+            format('region-%%s', i %% 4),
+            format('zone-%%s', i %% 3),
+            CASE WHEN i %% 20 = 0 THEN 'DECOMMISSIONED' ELSE 'READY' END,
+            CASE WHEN i %% 25 = 0 THEN 'UNHEALTHY' ELSE 'HEALTHY' END,
+            %s * 4,
+            256
+        FROM generate_series(1, %s) AS i
+        """,
+        (units_per_server, servers),
+    )
+    # Most of a busy fleet is allocated; keep roughly 5% of units free.
+    conn.execute(
+        """
+        INSERT INTO compute_units (
+            hostname, ordinal, cpu_range, cpu_count, cpu_set, status,
+            numa_node_count
+        )
+        SELECT
+            format('plan-check-%%s', lpad(i::TEXT, 6, '0')),
+            o,
+            format('%%s-%%s', o * 4, o * 4 + 3),
+            CASE WHEN o %% 2 = 0 THEN 4 ELSE 8 END,
+            format('%%s-%%s', o * 4, o * 4 + 3),
+            CASE WHEN (i + o) %% 20 = 0 THEN 'FREE' ELSE 'ALLOCATED' END,
+            CASE WHEN o %% 3 = 0 THEN 2 ELSE 1 END
+        FROM generate_series(1, %s) AS i, generate_series(1, %s) AS o
+        """,
+        (servers, units_per_server),
+    )
+    # Placement scores hosts from capacity_counters, which the DDL backfills.
+    conn.execute(
+        """
+        INSERT INTO capacity_counters (hostname, cpu_count, status, units)
+        SELECT hostname, cpu_count, status, count(*)
+        FROM compute_units
+        WHERE hostname LIKE 'plan-check-%%'
+        GROUP BY hostname, cpu_count, status
+        """
+    )
+    conn.execute("ANALYZE servers")
+    conn.execute("ANALYZE compute_units")
+    conn.execute("ANALYZE capacity_counters")
+
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _rows_read(node: dict) -> float:
+    """Rows a scan node read, across all of its loops."""
+    per_loop = (
+        node.get("Actual Rows", 0)
+        + node.get("Rows Removed by Filter", 0)
+        + node.get("Rows Removed by Index Recheck", 0)
+    )
+    return per_loop * node.get("Actual Loops", 1)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", default=os.getenv("KLOIGOS_DB_URL", ""))
+    parser.add_argument("--servers", type=int, default=2000)
+    parser.add_argument("--units-per-server", type=int, default=15)
+    args = parser.parse_args()
+
+    if not args.db_url:
+        print("set KLOIGOS_DB_URL or pass --db-url", file=sys.stderr)
+        return 2
+
+    # Only the SQL builder is used; no pooled connections are needed.
+    repo = PostgresRepo(pool=None)  # type: ignore[arg-type]
+
+    failures = 0
+    with psycopg.connect(args.db_url) as conn:
+        _seed(conn, args.servers, args.units_per_server)
+
+        # A claim may read every unit of its candidate hosts, plus the row it
+        # updates. Filters capacity_counters cannot answer (NUMA locality)
+        # also probe one index entry per server; anything beyond that grows
+        # with the number of compute units.
+        candidate_rows = placement.PLACEMENT_CANDIDATE_HOSTS * args.units_per_server + 1
+
+        for strategy in PlacementStrategy:
+            for name, filters in CASES.items():
+                sql, params = repo._claim_compute_unit_query(
+                    ComputeUnitStatus.FREE,
+                    ComputeUnitStatus.ALLOCATED,
+                    placement_strategy=strategy,
+                    **filters,
+                )
+                # ANALYZE runs the claim; it is rolled back with the seed.
+                conn.execute("SAVEPOINT plan_check")
+                (plan,) = conn.execute(
+                    "EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params
+                ).fetchone()[0]
+                conn.execute("ROLLBACK TO SAVEPOINT plan_check")
+                nodes = list(_plan_nodes(plan["Plan"]))
+                indexes = {n["Index Name"] for n in nodes if "Index Name" in n}
+                seq_scanned = {
+                    n["Relation Name"]
+                    for n in nodes
+                    if n["Node Type"] == "Seq Scan"
+                }
+                max_rows = candidate_rows + (
+                    args.servers if filters.get("numa_local") else 0
+                )
+                units_read = sum(
+                    _rows_read(n)
+                    for n in nodes
+                    if n.get("Relation Name") == "compute_units"
+                )
+
+                ok = (
+                    bool(indexes & PLACEMENT_INDEXES)
+                    and "compute_units" not in seq_scanned
+                    and units_read <= max_rows
+                )
+                failures += not ok
+                print(
+                    f"{'ok' if ok else 'FAIL':4} {strategy.value:13} {name:22} "
+                    f"units_read={units_read:.0f}/{max_rows} "
+                    f"time={plan['Execution Time']:.1f}ms "
+                    f"indexes={','.join(sorted(indexes)) or '-'} "
+                    f"seq_scans={','.join(sorted(seq_scanned)) or '-'}"
+                )
+                if not ok:
+                    print(json.dumps(plan, indent=2), file=sys.stderr)
+
+        conn.rollback()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())